@@ -54,17 +54,38 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     *LOCAL_APPS
 ]
 
+# Session, CSRF, auth, messages and clickjacking middleware are skipped for
+# requests under API_PATH_PREFIXES, see src/core/middleware.py
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'src.core.middleware.CompressionMiddleware',
+    'src.core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'src.core.middleware.CsrfViewMiddleware',
+    'src.core.middleware.AuthenticationMiddleware',
+    'src.core.middleware.MessageMiddleware',
+    'src.core.middleware.XFrameOptionsMiddleware',
+]
+
+API_PATH_PREFIXES = ["/api/"]
+
+# Response compression, see src/core/compression.py. Encodings are listed
+# in server preference order, br and zstd need the `compression` extra.
+COMPRESSION_ENCODINGS = ["zstd", "br", "gzip"]
+COMPRESSION_LEVELS = {
+    "gzip": env.int("COMPRESSION_GZIP_LEVEL", default=5),
+    "br": env.int("COMPRESSION_BROTLI_LEVEL", default=4),
+    "zstd": env.int("COMPRESSION_ZSTD_LEVEL", default=3),
+}
+COMPRESSION_MIN_SIZE = env.int("COMPRESSION_MIN_SIZE", default=1024)
+COMPRESSION_CONTENT_TYPES = [
+    "application/json",
+    "application/vnd.oai.openapi",
+    "application/vnd.oai.openapi+json",
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -98,6 +119,9 @@ DATABASES = {
         "PASSWORD": "admin123",
         "HOST": "localhost",
         "PORT": "5432",
+        # Lower pg_trgm's word similarity threshold (default 0.6) so
+        # single-letter typos still match recipe search
+        "OPTIONS": {"options": "-c pg_trgm.word_similarity_threshold=0.5"},
     }
 }
 
@@ -121,6 +145,94 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# API tokens, src.core.authentication. Tokens expire AUTH_TOKEN_TTL seconds
+# after their last use (database tokens) or after being issued (signed
+# tokens, validated without a database query).
+
+AUTH_TOKEN_TTL = env.int("AUTH_TOKEN_TTL", default=14 * 24 * 3600)
+AUTH_TOKEN_REFRESH_INTERVAL = env.int(
+    "AUTH_TOKEN_REFRESH_INTERVAL", default=3600
+)
+AUTH_SIGNED_TOKENS = env.bool("AUTH_SIGNED_TOKENS", default=False)
+# How long a revoked signed token may keep working in another process
+TOKEN_VERSION_CACHE_TIMEOUT = env.int(
+    "TOKEN_VERSION_CACHE_TIMEOUT", default=60
+)
+
+# Throttle windows, token versions, profile payloads and similarity index
+# versions live in the default cache. Outside development it has to be
+# shared between processes, e.g. CACHE_URL=redis://localhost:6379/1, or
+# every worker keeps its own copy; `manage.py check` warns about that.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+# Cached /api/user/me/ payloads, dropped whenever the user is saved. Capped
+# at a few seconds while the cache is process local.
+USER_PROFILE_CACHE_TIMEOUT = env.int(
+    "USER_PROFILE_CACHE_TIMEOUT", default=3600
+)
+
+# Per process similarity indexes kept in memory, src.recipe.similarity
+RECIPE_SIMILARITY_MAX_INDEXES = env.int(
+    "RECIPE_SIMILARITY_MAX_INDEXES", default=100
+)
+
+# Deleting recipes through the API only flags them, a purge job removes
+# the rows and images afterwards
+RECIPE_SOFT_DELETE = env.bool("RECIPE_SOFT_DELETE", default=True)
+
+# Seconds an Idempotency-Key is remembered, src.core.idempotency
+IDEMPOTENCY_KEY_TTL = env.int("IDEMPOTENCY_KEY_TTL", default=24 * 3600)
+
+# POST /api/batch/, src.core.batch
+BATCH_MAX_REQUESTS = env.int("BATCH_MAX_REQUESTS", default=20)
+# Threads, each with its own connection, running `parallel` batches
+BATCH_MAX_WORKERS = env.int("BATCH_MAX_WORKERS", default=4)
+
+# Database job queue, src.core.jobs, run by `python manage.py runworkers`.
+# JOBS_EAGER runs jobs in process after commit instead.
+JOBS_EAGER = env.bool("JOBS_EAGER", default=False)
+# Seconds a claimed job stays hidden from other workers
+JOBS_LEASE_SECONDS = env.int("JOBS_LEASE_SECONDS", default=300)
+# Retries wait base * 2 ** (attempt - 1) seconds, up to the maximum
+JOBS_RETRY_BASE_DELAY = env.int("JOBS_RETRY_BASE_DELAY", default=10)
+JOBS_RETRY_MAX_DELAY = env.int("JOBS_RETRY_MAX_DELAY", default=3600)
+
+
+# Password hashing, src.core.hashers. The preferred hasher comes first,
+# the others stay listed so existing hashes verify and are upgraded to the
+# preferred one on the next login, as are hashes with other costs.
+# Measure candidates with `python manage.py benchmark_hashers`.
+
+PASSWORD_HASHER_CLASSES = {
+    "argon2": "src.core.hashers.Argon2PasswordHasher",
+    "scrypt": "src.core.hashers.ScryptPasswordHasher",
+    "pbkdf2": "src.core.hashers.PBKDF2PasswordHasher",
+}
+
+PASSWORD_HASHER = env("PASSWORD_HASHER", default="pbkdf2")
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CLASSES.items()
+    if name != PASSWORD_HASHER
+] + [
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+
+PASSWORD_PBKDF2_ITERATIONS = env.int(
+    "PASSWORD_PBKDF2_ITERATIONS", default=1_000_000
+)
+PASSWORD_ARGON2_TIME_COST = env.int("PASSWORD_ARGON2_TIME_COST", default=2)
+PASSWORD_ARGON2_MEMORY_COST = env.int(
+    "PASSWORD_ARGON2_MEMORY_COST", default=102400
+)
+PASSWORD_ARGON2_PARALLELISM = env.int("PASSWORD_ARGON2_PARALLELISM", default=8)
+PASSWORD_SCRYPT_WORK_FACTOR = env.int(
+    "PASSWORD_SCRYPT_WORK_FACTOR", default=2**14
+)
+PASSWORD_SCRYPT_BLOCK_SIZE = env.int("PASSWORD_SCRYPT_BLOCK_SIZE", default=8)
+PASSWORD_SCRYPT_PARALLELISM = env.int("PASSWORD_SCRYPT_PARALLELISM", default=1)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -153,9 +265,29 @@ AUTH_USER_MODEL='core.User'
 
 
 REST_FRAMEWORK= {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Reverse proxies in front of the app. Throttles identify clients by
+    # the address this many hops from the end of X-Forwarded-For, 0 uses
+    # REMOTE_ADDR; unset, DRF would trust whatever header clients send.
+    'NUM_PROXIES': env.int("NUM_PROXIES", default=0),
+    # Sliding windows kept in the default cache, see CACHES.
+    # src.core.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        # Token and sign up requests per client address and per email,
+        # rejected before any password hashing
+        'auth_ip': env("THROTTLE_AUTH_IP_RATE", default="30/min"),
+        'auth_email': env("THROTTLE_AUTH_EMAIL_RATE", default="10/min"),
+        # Recipe, tag and ingredient requests per user
+        'recipe': env("THROTTLE_RECIPE_RATE", default="600/min"),
+    },
 }
 
 SPECTACULAR_SETTINGS = {
     "COMPONENT_SPLIT_REQUESTS": True
 }
+
+# Pre-generated schema served by /api/schema/, rebuilt on every deploy with
+# `python manage.py build_schema`. Falls back to generating on first request.
+SPECTACULAR_SCHEMA_FILE = env(
+    "SPECTACULAR_SCHEMA_FILE", default=os.path.join(BASE_DIR, "schema.json")
+)
@@ -8,5 +8,24 @@ DATABASES = {
         "PASSWORD": "admin123",
         "HOST": "localhost",
         "PORT": "5432",
+        # Lower pg_trgm's word similarity threshold (default 0.6) so
+        # single-letter typos still match recipe search
+        "OPTIONS": {"options": "-c pg_trgm.word_similarity_threshold=0.5"},
     }
 }
+
+SPECTACULAR_SCHEMA_FILE = None
+
+# Throttle tests set their own rates
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": {
+        scope: None for scope in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]
+    },
+}
+
+# Hashing cost is irrelevant to the tests
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+# Run jobs after commit in process so tests see the result
+JOBS_EAGER = True
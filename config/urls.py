@@ -14,25 +14,26 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView
-)
+from drf_spectacular.views import SpectacularSwaggerView
 from django.contrib import admin
 from django.urls import (path, include)
 from django.conf.urls.static import static
 from django.conf import settings
 
+from src.core.batch import BatchView
+from src.core.schema import CachedSpectacularAPIView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name="api-schema"),
+    path('api/schema/', CachedSpectacularAPIView.as_view(), name="api-schema"),
     path(
         'api/docs/',
         SpectacularSwaggerView.as_view(url_name='api-schema'),
         name="api-docs"
     ),
     path("api/user/", include("src.user.urls") ),
-    path("api/recipe/", include("src.recipe.urls"))
+    path("api/recipe/", include("src.recipe.urls")),
+    path("api/batch/", BatchView.as_view(), name="api-batch"),
 
 ]
 
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'src.core'
+
+    def ready(self):
+        from django.db.models import CharField, TextField
+        from src.core import checks  # noqa: F401
+        from src.core.lookups import TrigramIContains
+
+        for field in (CharField, TextField):
+            field.register_lookup(TrigramIContains)
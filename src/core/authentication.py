@@ -0,0 +1,131 @@
+"""
+Expiring API tokens
+
+Two formats are accepted in the `Authorization: Token ...` header:
+
+* database tokens (`rest_framework.authtoken`), which expire
+  AUTH_TOKEN_TTL seconds after their last use. Use is recorded at most
+  every AUTH_TOKEN_REFRESH_INTERVAL seconds to keep writes off the hot
+  path.
+* signed tokens, `<user id>:<token version>:<timestamp>:<hmac>`, which
+  expire AUTH_TOKEN_TTL seconds after being issued and are validated
+  without a database query.
+
+Both are revoked by bumping `User.token_version`. The version is cached
+per user for TOKEN_VERSION_CACHE_TIMEOUT seconds, so revocation takes
+effect within that delay when the cache is not shared between processes.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+SIGNER_SALT = "src.core.authentication.signed-token"
+
+
+def _version_key(user_id):
+  return f"token-version:{user_id}"
+
+
+def get_token_state(user_id):
+  """Return (token_version, is_active) of a user, or None if missing"""
+  key = _version_key(user_id)
+  state = cache.get(key)
+  if state is None:
+    state = get_user_model().objects.filter(pk=user_id).values_list(
+      "token_version", "is_active"
+    ).first()
+    if state is None:
+      return None
+    cache.set(key, state, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+  return tuple(state)
+
+
+def revoke_tokens(user):
+  """Invalidate every token of user"""
+  get_user_model().objects.filter(pk=user.pk).update(
+    token_version=F("token_version") + 1
+  )
+  Token.objects.filter(user=user).delete()
+  user.refresh_from_db(fields=["token_version"])
+  key = _version_key(user.pk)
+  cache.delete(key)
+  # Again once committed, a concurrent request may have cached the old one
+  transaction.on_commit(lambda: cache.delete(key))
+
+
+def _signer():
+  return signing.TimestampSigner(salt=SIGNER_SALT)
+
+
+def issue_token(user, rotate=False):
+  """
+  Return (token, expires) for user in the configured format.
+
+  With `rotate` the user's database token is replaced by a new key.
+  """
+  ttl = timedelta(seconds=settings.AUTH_TOKEN_TTL)
+  if settings.AUTH_SIGNED_TOKENS:
+    token = _signer().sign(f"{user.pk}:{user.token_version}")
+    return token, timezone.now() + ttl
+
+  if rotate:
+    Token.objects.filter(user=user).delete()
+  token, created = Token.objects.get_or_create(user=user)
+  if not created and token.created + ttl <= timezone.now():
+    token.delete()
+    token = Token.objects.create(user=user)
+  return token.key, token.created + ttl
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+  """Token authentication for database and signed expiring tokens"""
+
+  def authenticate_credentials(self, key):
+    if ":" in key:
+      return self._authenticate_signed(key)
+    return self._authenticate_database(key)
+
+  def _authenticate_database(self, key):
+    user, token = super().authenticate_credentials(key)
+
+    now = timezone.now()
+    if token.created + timedelta(seconds=settings.AUTH_TOKEN_TTL) <= now:
+      raise exceptions.AuthenticationFailed(_("Token has expired."))
+
+    # Sliding expiry, recorded at most once per refresh interval
+    refresh = timedelta(seconds=settings.AUTH_TOKEN_REFRESH_INTERVAL)
+    if token.created + refresh <= now:
+      Token.objects.filter(pk=token.pk).update(created=now)
+      token.created = now
+    return user, token
+
+  def _authenticate_signed(self, key):
+    try:
+      value = _signer().unsign(key, max_age=settings.AUTH_TOKEN_TTL)
+      user_id, version = (int(part) for part in value.split(":"))
+    except signing.SignatureExpired:
+      raise exceptions.AuthenticationFailed(_("Token has expired."))
+    except (signing.BadSignature, ValueError):
+      raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+    state = get_token_state(user_id)
+    if state is None or state[0] != version:
+      raise exceptions.AuthenticationFailed(_("Invalid token."))
+    if not state[1]:
+      raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+    # Every other field is loaded on first access only
+    user = get_user_model().from_db(None, ["id"], [user_id])
+    return user, key
@@ -0,0 +1,179 @@
+"""
+Batch endpoint running several GET requests in one round trip
+
+Sub-requests are resolved against the project URL conf and call the views
+directly, skipping the middleware. They share the batch request's user,
+authenticated once, and run one after the other on the request's database
+connection. With `parallel` they run on a pool of BATCH_MAX_WORKERS
+threads instead; each thread uses its own connection, kept between
+batches as CONN_MAX_AGE allows.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from drf_spectacular.utils import extend_schema
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from src.core.authentication import ExpiringTokenAuthentication
+from src.core.middleware import is_api_request
+
+
+logger = logging.getLogger(__name__)
+
+# Conditional and body headers of the batch do not apply to its parts
+_SKIPPED_META = {
+  "CONTENT_LENGTH",
+  "CONTENT_TYPE",
+  "HTTP_IF_NONE_MATCH",
+  "HTTP_IF_MODIFIED_SINCE",
+  "HTTP_IDEMPOTENCY_KEY",
+}
+
+_executor = None
+
+
+def _get_executor():
+  global _executor
+  if _executor is None:
+    _executor = ThreadPoolExecutor(
+      max_workers=settings.BATCH_MAX_WORKERS, thread_name_prefix="batch"
+    )
+  return _executor
+
+
+class BatchItemSerializer(serializers.Serializer):
+  """A GET request of the batch"""
+  path = serializers.CharField(max_length=2048)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+  """Serializer for the requests to run in one batch"""
+  requests = BatchItemSerializer(many=True, allow_empty=False)
+  parallel = serializers.BooleanField(default=False)
+
+  def validate_requests(self, value):
+    if len(value) > settings.BATCH_MAX_REQUESTS:
+      raise serializers.ValidationError(
+        f"At most {settings.BATCH_MAX_REQUESTS} requests per batch."
+      )
+    return value
+
+
+class BatchResultSerializer(serializers.Serializer):
+  """Status and data of a request of the batch"""
+  path = serializers.CharField()
+  status = serializers.IntegerField()
+  body = serializers.JSONField(allow_null=True)
+
+
+class BatchResponseSerializer(serializers.Serializer):
+  """Serializer for the results, in request order"""
+  responses = BatchResultSerializer(many=True)
+
+
+def _sub_request(request, path):
+  """Build a GET HttpRequest for path carrying the user of request"""
+  url = urlsplit(path)
+  outer = request._request
+  sub = HttpRequest()
+  sub.method = "GET"
+  sub.path = sub.path_info = url.path
+  sub.META = {
+    key: value for key, value in outer.META.items()
+    if key not in _SKIPPED_META and not key.startswith("wsgi.")
+  }
+  sub.META.update({
+    "REQUEST_METHOD": "GET",
+    "PATH_INFO": url.path,
+    "QUERY_STRING": url.query,
+    "HTTP_ACCEPT": "application/json",
+  })
+  sub.GET = QueryDict(url.query)
+  # DRF authenticates requests carrying these as the given user and token
+  sub._force_auth_user = request.user
+  sub._force_auth_token = request.auth
+  return sub
+
+
+def _not_found(path):
+  return {"path": path, "status": 404, "body": {"detail": "Not found."}}
+
+
+def run_sub_request(request, path):
+  """Run one GET request of a batch, return its result"""
+  url = urlsplit(path)
+  if url.scheme or url.netloc:
+    return _not_found(path)
+  sub = _sub_request(request, path)
+  if not is_api_request(sub):
+    return _not_found(path)
+  try:
+    match = resolve(sub.path_info)
+  except Resolver404:
+    return _not_found(path)
+  if getattr(match.func, "view_class", None) is BatchView:
+    return _not_found(path)
+
+  try:
+    response = match.func(sub, *match.args, **match.kwargs)
+  except Http404:
+    return _not_found(path)
+  except Exception:
+    logger.exception("Batch request %s failed", path)
+    return {
+      "path": path,
+      "status": 500,
+      "body": {"detail": "Internal server error."},
+    }
+
+  # DRF responses keep their data, no need to render and parse them
+  if hasattr(response, "data"):
+    body = response.data
+  elif response.get("Content-Type", "").startswith("application/json"):
+    body = json.loads(response.content)
+  else:
+    body = None
+  return {"path": path, "status": response.status_code, "body": body}
+
+
+def _run_in_thread(request, path):
+  close_old_connections()
+  try:
+    return run_sub_request(request, path)
+  finally:
+    close_old_connections()
+
+
+class BatchView(APIView):
+  """ Run several GET requests of the API and return every response """
+  authentication_classes = [ExpiringTokenAuthentication]
+  permission_classes = [IsAuthenticated]
+
+  @extend_schema(
+    request=BatchRequestSerializer,
+    responses=BatchResponseSerializer,
+  )
+  def post(self, request):
+    serializer = BatchRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    paths = [item["path"] for item in serializer.validated_data["requests"]]
+
+    if serializer.validated_data["parallel"] and len(paths) > 1:
+      results = list(_get_executor().map(
+        lambda path: _run_in_thread(request, path), paths
+      ))
+    else:
+      results = [run_sub_request(request, path) for path in paths]
+
+    return Response({"responses": results}, status=status.HTTP_200_OK)
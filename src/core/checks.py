@@ -0,0 +1,34 @@
+"""
+System checks for the deployment settings
+"""
+from django.conf import settings
+from django.core import checks
+
+
+PROCESS_LOCAL_CACHES = (
+  "django.core.cache.backends.locmem.LocMemCache",
+  "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_process_local_cache(alias="default"):
+  """Return True when a cache is not shared between processes"""
+  return settings.CACHES.get(alias, {}).get("BACKEND") in PROCESS_LOCAL_CACHES
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+  """Warn when the default cache is not shared between processes"""
+  if settings.DEBUG:
+    return []
+  if not is_process_local_cache():
+    return []
+  return [checks.Warning(
+    "The default cache is local to each process.",
+    hint=(
+      "Throttle limits are multiplied by the number of workers and "
+      "invalidations do not reach other processes. Set CACHE_URL to a "
+      "shared cache such as Redis or Memcached."
+    ),
+    id="core.W001",
+  )]
@@ -0,0 +1,159 @@
+"""
+Response compression codecs
+
+gzip is always available, brotli and zstd are used when the optional
+`brotli` and `zstandard` packages are installed.
+"""
+import gzip
+import zlib
+
+from django.conf import settings
+
+try:
+  import brotli
+except ImportError:  # pragma: no cover
+  brotli = None
+
+try:
+  import zstandard
+except ImportError:  # pragma: no cover
+  zstandard = None
+
+
+class GzipCompressor:
+  """Incremental gzip compressor flushing after every chunk"""
+
+  def __init__(self, level):
+    self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+  def compress(self, chunk):
+    return self._obj.compress(chunk) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+  def finish(self):
+    return self._obj.flush()
+
+
+class BrotliCompressor:
+  """Incremental brotli compressor flushing after every chunk"""
+
+  def __init__(self, level):
+    self._obj = brotli.Compressor(quality=level)
+
+  def compress(self, chunk):
+    return self._obj.process(chunk) + self._obj.flush()
+
+  def finish(self):
+    return self._obj.finish()
+
+
+class ZstdCompressor:
+  """Incremental zstd compressor flushing after every chunk"""
+
+  def __init__(self, level):
+    self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+  def compress(self, chunk):
+    return (
+      self._obj.compress(chunk)
+      + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+    )
+
+  def finish(self):
+    return self._obj.flush()
+
+
+def _gzip(data, level):
+  return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+  return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+  return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+CODECS = {"gzip": (_gzip, GzipCompressor)}
+if brotli is not None:
+  CODECS["br"] = (_brotli, BrotliCompressor)
+if zstandard is not None:
+  CODECS["zstd"] = (_zstd, ZstdCompressor)
+
+
+def available_encodings():
+  """Return the configured encodings that can be produced, best first"""
+  return [e for e in settings.COMPRESSION_ENCODINGS if e in CODECS]
+
+
+def get_level(encoding):
+  return settings.COMPRESSION_LEVELS[encoding]
+
+
+def parse_accept_encoding(header):
+  """Return a mapping of content coding to its q-value"""
+  accepted = {}
+  for item in header.split(","):
+    coding, _, params = item.strip().partition(";")
+    coding = coding.strip().lower()
+    if not coding:
+      continue
+    q = 1.0
+    for param in params.split(";"):
+      name, _, value = param.strip().partition("=")
+      if name.strip().lower() == "q":
+        try:
+          q = float(value)
+        except ValueError:
+          q = 0.0
+    accepted[coding] = q
+  return accepted
+
+
+def select_encoding(header):
+  """
+  Pick the encoding to use for an Accept-Encoding header.
+
+  The client's q-values win, ties go to the server's preference order.
+  Returns None when nothing acceptable is available.
+  """
+  accepted = parse_accept_encoding(header or "")
+  wildcard = accepted.get("*", 0.0)
+  best, best_q = None, 0.0
+  for encoding in available_encodings():
+    q = accepted.get(encoding, wildcard)
+    if q > best_q:
+      best, best_q = encoding, q
+  return best
+
+
+def compress(data, encoding, level=None):
+  """Compress a complete payload"""
+  func, _ = CODECS[encoding]
+  return func(data, get_level(encoding) if level is None else level)
+
+
+def compress_sequence(sequence, encoding, level=None):
+  """Compress an iterable of chunks, yielding output as it is produced"""
+  _, compressor_class = CODECS[encoding]
+  compressor = compressor_class(
+    get_level(encoding) if level is None else level
+  )
+  for chunk in sequence:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+  yield compressor.finish()
+
+
+async def acompress_sequence(sequence, encoding, level=None):
+  """Async variant of compress_sequence"""
+  _, compressor_class = CODECS[encoding]
+  compressor = compressor_class(
+    get_level(encoding) if level is None else level
+  )
+  async for chunk in sequence:
+    data = compressor.compress(chunk)
+    if data:
+      yield data
+  yield compressor.finish()
@@ -0,0 +1,187 @@
+"""
+Set based deletion of users and recipes
+
+Django's cascade loads every related object before deleting it, which does
+not scale to users with many recipes. These helpers delete in batches of
+plain DELETE statements, one transaction per batch, and remove image
+files in background threads once their rows are gone. Whole users and
+purges run as jobs, see src.core.jobs.
+
+Recipes can also be soft deleted: a single UPDATE sets `deleted_at`, which
+hides them from the API and the recipe statistics at once, and a purge
+job removes them.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+from src.core.jobs import enqueue
+from src.core.models import (Recipe, Tag, Ingredient, Tombstone)
+
+
+logger = logging.getLogger(__name__)
+
+_file_executor = ThreadPoolExecutor(
+  max_workers=4, thread_name_prefix="file-cleanup"
+)
+_pending_files = set()
+
+
+def _delete_file(name):
+  try:
+    default_storage.delete(name)
+  except Exception:
+    logger.exception("Could not delete %s", name)
+
+
+def delete_files(names):
+  """Delete stored files in the background, return the futures"""
+  futures = [_file_executor.submit(_delete_file, name) for name in names]
+  for future in futures:
+    _pending_files.add(future)
+    future.add_done_callback(_pending_files.discard)
+  return futures
+
+
+def wait_for_files():
+  """Block until every scheduled file deletion has run"""
+  wait(list(_pending_files))
+
+
+def _through_tables(model):
+  """Yield (table, column to model) of the recipe M2M tables"""
+  for field in Recipe._meta.many_to_many:
+    if model is Recipe:
+      yield field.remote_field.through._meta.db_table, field.m2m_column_name()
+    elif field.related_model is model:
+      yield (
+        field.remote_field.through._meta.db_table,
+        field.m2m_reverse_name(),
+      )
+
+
+def _delete_batch(cursor, model, ids):
+  qn = connection.ops.quote_name
+  for table, column in _through_tables(model):
+    cursor.execute(
+      f"DELETE FROM {qn(table)} WHERE {qn(column)} = ANY(%s)", [ids]
+    )
+  cursor.execute(
+    f"DELETE FROM {qn(model._meta.db_table)} WHERE id = ANY(%s)", [ids]
+  )
+
+
+def delete_recipes(queryset, batch_size=1000, progress=None):
+  """
+  Delete the recipes of queryset with their M2M rows, `batch_size` per
+  transaction, then their image files in the background. Returns the
+  number of deleted recipes.
+  """
+  total = queryset.count()
+  done = 0
+  while True:
+    with transaction.atomic(), connection.cursor() as cursor:
+      rows = list(
+        queryset.order_by("id").select_for_update().values_list(
+          "id", "image"
+        )[:batch_size]
+      )
+      if not rows:
+        break
+      ids = [recipe_id for recipe_id, image in rows]
+      # The recipes go away, skip updating their tag and ingredient arrays
+      cursor.execute("SELECT set_config('core.recipe_purge', 'on', true)")
+      _delete_batch(cursor, Recipe, ids)
+      cursor.execute("SELECT set_config('core.recipe_purge', 'off', true)")
+      images = [image for recipe_id, image in rows if image]
+      transaction.on_commit(lambda images=images: delete_files(images))
+    done += len(rows)
+    if progress:
+      progress("recipes", done, total)
+  return done
+
+
+def soft_delete_recipes(queryset):
+  """
+  Flag the recipes of queryset as deleted and purge them after commit.
+  Returns the number of flagged recipes.
+  """
+  flagged = Recipe.objects.live().filter(
+    pk__in=queryset.order_by().values("id")
+  )
+  user_ids = list(flagged.values_list("user_id", flat=True).distinct())
+  count = flagged.update(deleted_at=timezone.now())
+  for user_id in user_ids:
+    schedule_recipe_purge(user_id)
+  return count
+
+
+def purge_deleted_recipes(user_id=None, batch_size=1000, progress=None):
+  """Delete soft deleted recipes, of one user or all, with their images"""
+  queryset = Recipe.objects.deleted()
+  if user_id is not None:
+    queryset = queryset.filter(user_id=user_id)
+  return delete_recipes(queryset, batch_size=batch_size, progress=progress)
+
+
+def _delete_all(model, queryset, batch_size, progress):
+  total = queryset.count()
+  done = 0
+  while True:
+    with transaction.atomic(), connection.cursor() as cursor:
+      ids = list(queryset.order_by("id").values_list("id", flat=True)[
+        :batch_size
+      ])
+      if not ids:
+        break
+      _delete_batch(cursor, model, ids)
+    done += len(ids)
+    if progress:
+      progress(model._meta.verbose_name_plural, done, total)
+  return done
+
+
+def delete_user(user, batch_size=1000, progress=None):
+  """
+  Delete user and everything it owns.
+
+  Recipes, tags, ingredients and tombstones go in batches, whatever is left
+  (tokens, statistics, permissions, admin log) with the user through the
+  regular cascade. `progress(stage, done, total)` is called after each
+  batch.
+  """
+  delete_recipes(
+    Recipe.objects.filter(user=user), batch_size=batch_size, progress=progress
+  )
+  for model in (Tag, Ingredient, Tombstone):
+    _delete_all(
+      model, model.objects.filter(user=user), batch_size, progress
+    )
+  get_user_model().objects.filter(pk=user.pk).delete()
+  if progress:
+    progress("user", 1, 1)
+
+
+def delete_user_by_id(user_id):
+  user = get_user_model().objects.filter(pk=user_id).first()
+  if user is not None:
+    delete_user(
+      user,
+      progress=lambda stage, done, total: logger.info(
+        "Deleting user %s: %s %d/%d", user_id, stage, done, total
+      ),
+    )
+
+
+def schedule_user_deletion(user):
+  """Delete user in a job once the current transaction commits"""
+  enqueue(delete_user_by_id, user.pk)
+
+
+def schedule_recipe_purge(user_id):
+  """Purge the soft deleted recipes of a user in a job"""
+  enqueue(purge_deleted_recipes, user_id)
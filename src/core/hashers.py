@@ -0,0 +1,53 @@
+"""
+Password hashers whose cost comes from settings
+
+Django rehashes a password on the next successful login whenever the
+stored hash used another algorithm or other cost parameters than the
+preferred hasher, so changing PASSWORD_HASHER or a cost setting upgrades
+users transparently. `manage.py benchmark_hashers` measures the costs on
+the current host.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+  @property
+  def iterations(self):
+    return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+  """Needs argon2-cffi, the `argon2` extra"""
+
+  @property
+  def time_cost(self):
+    return settings.PASSWORD_ARGON2_TIME_COST
+
+  @property
+  def memory_cost(self):
+    return settings.PASSWORD_ARGON2_MEMORY_COST
+
+  @property
+  def parallelism(self):
+    return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+  # An upper bound only, OpenSSL's 32MiB default rejects work factors
+  # above 2**14 with a block size of 8
+  maxmem = 2**30
+
+  @property
+  def work_factor(self):
+    return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+  @property
+  def block_size(self):
+    return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+  @property
+  def parallelism(self):
+    return settings.PASSWORD_SCRYPT_PARALLELISM
+
@@ -0,0 +1,150 @@
+"""
+Idempotency keys for POST endpoints
+
+A client retrying a request sends the same `Idempotency-Key` header. The
+first request with a key records a fingerprint of the request and, once
+handled, its status and data; a retry with the same fingerprint gets the
+recorded response back, marked with `Idempotent-Replayed: true`, without
+running the view again. Keys are per user and kept IDEMPOTENCY_KEY_TTL
+seconds, `purge_idempotency_keys` deletes expired ones.
+
+Server errors are not recorded so the request can be retried. A retry
+arriving while the first request is still running gets 409, a key reused
+for a different request 422.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from src.core.models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# A request running longer than this is presumed dead, its key is reused
+LOCK_TIMEOUT = timedelta(seconds=60)
+
+
+def _update_with_value(digest, value):
+  if isinstance(value, UploadedFile):
+    for chunk in value.chunks():
+      digest.update(chunk)
+    value.seek(0)
+  else:
+    digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+
+def fingerprint(request):
+  """
+  Hash of the method, path and parsed data of request.
+
+  Parsed rather than raw data so a multipart retry with a new boundary
+  still matches, uploaded files are hashed by content.
+  """
+  digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+  data = request.data
+  if hasattr(data, "lists"):
+    for name, values in sorted(data.lists(), key=lambda item: item[0]):
+      digest.update(f"\n{name}=".encode())
+      for value in values:
+        _update_with_value(digest, value)
+  else:
+    _update_with_value(digest, data)
+  return digest.hexdigest()
+
+
+def _error(message, status_code):
+  return Response({"detail": message}, status=status_code)
+
+
+def _claim(user, key, request_fingerprint):
+  """Return (record, created) for the user's key"""
+  now = timezone.now()
+  IdempotencyKey.objects.filter(user=user, key=key).filter(
+    expires_at__lte=now
+  ).delete()
+  IdempotencyKey.objects.filter(
+    user=user, key=key, status_code__isnull=True,
+    created_at__lte=now - LOCK_TIMEOUT,
+  ).delete()
+  try:
+    return IdempotencyKey.objects.get_or_create(
+      user=user,
+      key=key,
+      defaults={
+        "fingerprint": request_fingerprint,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+      },
+    )
+  except IntegrityError:
+    # Created and deleted again by concurrent requests
+    return None, False
+
+
+def idempotent(view_method):
+  """Honor the Idempotency-Key header on a DRF view method"""
+
+  @functools.wraps(view_method)
+  def wrapper(self, request, *args, **kwargs):
+    key = request.headers.get(HEADER)
+    if not key or not request.user.is_authenticated:
+      return view_method(self, request, *args, **kwargs)
+    if len(key) > MAX_KEY_LENGTH:
+      return _error(
+        f"{HEADER} is longer than {MAX_KEY_LENGTH} characters.",
+        status.HTTP_400_BAD_REQUEST,
+      )
+
+    request_fingerprint = fingerprint(request)
+    record, created = _claim(request.user, key, request_fingerprint)
+    if not created:
+      if record is not None and record.fingerprint != request_fingerprint:
+        return _error(
+          f"{HEADER} was already used for a different request.",
+          status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+      if record is None or record.status_code is None:
+        return _error(
+          f"A request with this {HEADER} is in progress.",
+          status.HTTP_409_CONFLICT,
+        )
+      return Response(
+        record.response,
+        status=record.status_code,
+        headers={"Idempotent-Replayed": "true"},
+      )
+
+    try:
+      response = view_method(self, request, *args, **kwargs)
+    except Exception:
+      IdempotencyKey.objects.filter(pk=record.pk).delete()
+      raise
+
+    if response.status_code >= 500:
+      IdempotencyKey.objects.filter(pk=record.pk).delete()
+    else:
+      IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code,
+        response=response.data,
+      )
+    return response
+
+  return wrapper
+
+
+def purge_expired_keys():
+  """Delete expired idempotency keys, return how many"""
+  deleted, _ = IdempotencyKey.objects.filter(
+    expires_at__lte=timezone.now()
+  ).delete()
+  return deleted
@@ -0,0 +1,285 @@
+"""
+Database backed job queue
+
+`enqueue(func, *args)` stores a call to a module level function in the
+Job table, inside the caller's transaction, so the job exists exactly when
+the data it works on was committed. `manage.py runworkers` runs them.
+
+Workers claim ready jobs in batches with `FOR UPDATE SKIP LOCKED`, so
+concurrent workers never wait on each other, and push their `run_at` a
+lease ahead instead of holding a transaction open while they run. A
+`LeaseKeeper` thread renews the leases of claimed jobs until they finish,
+so neither a long job nor the jobs queued behind it in a batch are
+claimed again while their worker is alive. Jobs are deleted once done; a
+worker that dies leaves its jobs to be claimed again after the lease, so
+tasks must tolerate running more than once.
+Failures are retried with exponential backoff until `max_attempts`, then
+kept with `failed_at` set.
+
+With JOBS_EAGER the call runs in process once the transaction commits,
+for tests and setups without workers.
+"""
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from src.core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between retries after the queue itself failed
+MAX_ERROR_DELAY = 30
+
+
+def task_name(func):
+  """Return the import path of a module level function"""
+  return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *args, delay=0, max_attempts=5):
+  """
+  Run func(*args) in a worker after the current transaction commits.
+
+  Arguments must be JSON serializable. Returns the Job, or None when
+  JOBS_EAGER runs it in process.
+  """
+  if settings.JOBS_EAGER:
+    transaction.on_commit(lambda: _call_eagerly(func, args))
+    return None
+  return Job.objects.create(
+    task=task_name(func),
+    args=list(args),
+    run_at=timezone.now() + timedelta(seconds=delay),
+    max_attempts=max_attempts,
+  )
+
+
+def _call_eagerly(func, args):
+  try:
+    func(*args)
+  except Exception:
+    logger.exception("Job %s%r failed", task_name(func), args)
+
+
+def backoff(attempts):
+  """Seconds to wait before retrying after the given number of attempts"""
+  delay = min(
+    settings.JOBS_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+    settings.JOBS_RETRY_MAX_DELAY,
+  )
+  # Jitter spreads out retries of jobs that failed together
+  return delay * random.uniform(0.5, 1.5)
+
+
+def claim(limit):
+  """Lease up to limit ready jobs to this worker and return them"""
+  with connection.cursor() as cursor:
+    cursor.execute(
+      """
+      UPDATE core_job SET
+        run_at = clock_timestamp() + make_interval(secs => %s),
+        attempts = attempts + 1
+      WHERE id IN (
+        SELECT id FROM core_job
+        WHERE failed_at IS NULL AND run_at <= clock_timestamp()
+        ORDER BY run_at, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+      )
+      RETURNING id, task, args, attempts, max_attempts
+      """,
+      [settings.JOBS_LEASE_SECONDS, limit],
+    )
+    rows = cursor.fetchall()
+  args_field = Job._meta.get_field("args")
+  return [
+    Job(
+      id=job_id,
+      task=task,
+      args=args_field.from_db_value(args, None, connection),
+      attempts=attempts,
+      max_attempts=max_attempts,
+    )
+    for job_id, task, args, attempts, max_attempts in sorted(rows)
+  ]
+
+
+def renew(jobs):
+  """Push the lease of jobs still held by this worker, return their ids"""
+  if not jobs:
+    return set()
+  with connection.cursor() as cursor:
+    # A job claimed again by another worker has more attempts
+    cursor.execute(
+      """
+      UPDATE core_job j SET
+        run_at = clock_timestamp() + make_interval(secs => %s)
+      FROM unnest(%s::bigint[], %s::integer[]) AS held(id, attempts)
+      WHERE j.id = held.id AND j.attempts = held.attempts
+        AND j.failed_at IS NULL
+      RETURNING j.id
+      """,
+      [
+        settings.JOBS_LEASE_SECONDS,
+        [job.pk for job in jobs],
+        [job.attempts for job in jobs],
+      ],
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+class LeaseKeeper:
+  """
+  Thread renewing the leases of the jobs held by this process every third
+  of JOBS_LEASE_SECONDS.
+  """
+
+  def __init__(self):
+    self._held = {}
+    self._lock = threading.Lock()
+    self._stop = threading.Event()
+    self._thread = None
+
+  def hold(self, jobs):
+    with self._lock:
+      self._held.update((job.pk, job) for job in jobs)
+
+  def release(self, jobs):
+    with self._lock:
+      for job in jobs:
+        self._held.pop(job.pk, None)
+
+  def start(self):
+    self._thread = threading.Thread(
+      target=self._run, name="job-lease-keeper", daemon=True
+    )
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+
+  def _run(self):
+    try:
+      while not self._stop.wait(settings.JOBS_LEASE_SECONDS / 3):
+        try:
+          # Under the lock so a released job's outcome is never overwritten
+          with self._lock:
+            renew(list(self._held.values()))
+        except Exception:
+          logger.exception("Renewing job leases failed")
+          connection.close()
+    finally:
+      connection.close()
+
+
+def _failed(job, error):
+  """Schedule a retry of job, or give up on it"""
+  if job.attempts >= job.max_attempts:
+    Job.objects.filter(pk=job.pk).update(
+      failed_at=timezone.now(), last_error=error
+    )
+  else:
+    Job.objects.filter(pk=job.pk).update(
+      run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)),
+      last_error=error,
+    )
+
+
+def run_batch(limit=10, keeper=None):
+  """
+  Claim and run up to limit jobs, return how many were claimed. The
+  keeper, if any, renews their leases until each is done.
+  """
+  jobs = claim(limit)
+  if keeper is not None:
+    keeper.hold(jobs)
+  done = []
+  try:
+    for job in jobs:
+      if job.attempts > job.max_attempts:
+        # Its workers kept dying before recording the outcome
+        error = "Lease expired"
+      else:
+        try:
+          import_string(job.task)(*job.args)
+        except Exception:
+          logger.exception("Job %s failed", job)
+          error = traceback.format_exc()
+        else:
+          # Kept leased until deleted with the rest of the batch
+          done.append(job.pk)
+          continue
+      if keeper is not None:
+        keeper.release([job])
+      _failed(job, error)
+    if done:
+      Job.objects.filter(pk__in=done).delete()
+  finally:
+    if keeper is not None:
+      keeper.release(jobs)
+  return len(jobs)
+
+
+def work(stop, batch_size=10, poll_interval=1.0, burst=False, keeper=None):
+  """
+  Run jobs until stop is set, waiting poll_interval seconds whenever the
+  queue is empty. With burst, return once nothing is ready instead.
+  Errors of the queue itself, such as a lost database connection, are
+  logged and retried with a growing delay. Returns the number of jobs
+  claimed.
+  """
+  claimed = errors = 0
+  try:
+    while not stop.is_set():
+      close_old_connections()
+      try:
+        count = run_batch(batch_size, keeper)
+      except Exception:
+        errors += 1
+        logger.exception("Job worker failed, retrying")
+        connection.close()
+        stop.wait(min(poll_interval * 2 ** errors, MAX_ERROR_DELAY))
+        continue
+      errors = 0
+      claimed += count
+      if not count:
+        if burst:
+          break
+        stop.wait(poll_interval)
+  finally:
+    connection.close()
+  return claimed
+
+
+def work_in_threads(threads, stop=None, **options):
+  """Run `work` in several threads, return the total of jobs claimed"""
+  stop = stop or threading.Event()
+  counts = [0] * threads
+  keeper = LeaseKeeper()
+  keeper.start()
+
+  def run(index):
+    counts[index] = work(stop, keeper=keeper, **options)
+
+  workers = [
+    threading.Thread(target=run, args=(index,), name=f"job-worker-{index}")
+    for index in range(threads)
+  ]
+  for worker in workers:
+    worker.start()
+  try:
+    for worker in workers:
+      worker.join()
+  finally:
+    keeper.stop()
+  return sum(counts)
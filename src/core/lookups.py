@@ -0,0 +1,19 @@
+"""
+Lookups served by the trigram indexes
+"""
+from django.db.models import lookups
+
+
+class TrigramIContains(lookups.IContains):
+  """
+  Case insensitive containment as `ILIKE`.
+
+  Django's icontains compiles to `UPPER(col) LIKE UPPER(...)`, which a
+  gin_trgm_ops index on the column cannot serve, ILIKE can.
+  """
+  lookup_name = "trigram_icontains"
+
+  def as_postgresql(self, compiler, connection):
+    lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+    rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+    return f"{lhs_sql} ILIKE {rhs_sql}", (*lhs_params, *rhs_params)
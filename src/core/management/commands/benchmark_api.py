@@ -0,0 +1,386 @@
+"""
+Benchmark every API endpoint through the Django test client
+"""
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from io import BytesIO
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from src.core.authentication import issue_token
+from src.core.models import (Recipe, Tag, Ingredient)
+
+
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+
+
+def percentile(samples, pct):
+  """Return the `pct` percentile of samples using linear interpolation"""
+  ordered = sorted(samples)
+  if len(ordered) == 1:
+    return ordered[0]
+  rank = (len(ordered) - 1) * pct / 100
+  low = int(rank)
+  high = min(low + 1, len(ordered) - 1)
+  return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _image_file():
+  buffer = BytesIO()
+  Image.new("RGB", (10, 10)).save(buffer, format="JPEG")
+  return SimpleUploadedFile("bench.jpg", buffer.getvalue(), "image/jpeg")
+
+
+class Command(BaseCommand):
+  help = (
+    "Drive every user and recipe endpoint through the test client and "
+    "report latency percentiles, query counts and memory"
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument(
+      "--user", default=None,
+      help="Email of the user to benchmark as, defaults to the user "
+           "owning the most recipes"
+    )
+    parser.add_argument(
+      "--password", default="testpass123",
+      help="Password of the benchmark user, used by the token scenario"
+    )
+    parser.add_argument(
+      "--only", default=None,
+      help="Comma separated list of scenario names to run"
+    )
+    parser.add_argument("--output", default=None,
+                        help="Write results as JSON to this path")
+    parser.add_argument(
+      "--save-baseline", nargs="?", const=DEFAULT_BASELINE, default=None,
+      help="Store results as the regression baseline"
+    )
+    parser.add_argument(
+      "--compare", nargs="?", const=DEFAULT_BASELINE, default=None,
+      help="Compare results against a baseline and fail on regressions"
+    )
+    parser.add_argument(
+      "--tolerance", type=float, default=1.25,
+      help="Allowed p95 latency ratio against the baseline"
+    )
+
+  def handle(self, *args, **options):
+    user = self._get_user(options["user"])
+    scenarios = self._scenarios(options["password"])
+    if options["only"]:
+      wanted = set(options["only"].split(","))
+      scenarios = [s for s in scenarios if s[0] in wanted]
+
+    # Writes made by the benchmark are rolled back, uploads go to a
+    # throwaway media root and throttling is off.
+    rest_framework = {
+      **settings.REST_FRAMEWORK,
+      "DEFAULT_THROTTLE_RATES": {
+        scope: None
+        for scope in settings.REST_FRAMEWORK.get("DEFAULT_THROTTLE_RATES", {})
+      },
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as media_root, \
+         override_settings(
+           MEDIA_ROOT=media_root, ALLOWED_HOSTS=["*"],
+           REST_FRAMEWORK=rest_framework,
+         ), \
+         transaction.atomic():
+      token, _ = issue_token(user)
+      # Sent per request rather than as client credentials so scenarios
+      # can authenticate as another user
+      auth = {"HTTP_AUTHORIZATION": f"Token {token}"}
+      client = APIClient()
+
+      for name, method, setup in scenarios:
+        results[name] = self._run(
+          client, user, auth, method, setup,
+          options["iterations"], options["warmup"],
+        )
+        self._report(name, results[name])
+
+      transaction.set_rollback(True)
+
+    if options["output"]:
+      self._write(options["output"], results)
+    if options["save_baseline"]:
+      self._write(options["save_baseline"], results)
+      self.stdout.write(f"Baseline written to {options['save_baseline']}")
+    if options["compare"]:
+      self._compare(options["compare"], results, options["tolerance"])
+
+  def _get_user(self, email):
+    User = get_user_model()
+    if email:
+      try:
+        return User.objects.get(email=email)
+      except User.DoesNotExist:
+        raise CommandError(f"user {email} does not exist")
+
+    recipe = (
+      Recipe.objects.values("user")
+      .annotate(count=Count("id"))
+      .order_by("-count")
+      .first()
+    )
+    if recipe is None:
+      raise CommandError("no recipes found, run `seed_data` first")
+    return User.objects.get(id=recipe["user"])
+
+  def _scenarios(self, password):
+    """
+    Return (name, method, setup) triples.
+
+    `setup(user)` runs outside the timed section and returns the url and
+    request kwargs, so destructive endpoints get a fresh object each time.
+    Endpoints ending a session run as a new user each time.
+    """
+
+    def first(model, user):
+      return model.objects.filter(user=user).order_by("id").first()
+
+    def unique(name):
+      return f"{name} {time.perf_counter_ns()}"
+
+    def new_recipe(user):
+      return Recipe.objects.create(
+        user=user, title="Bench", time_minutes=10, price=Decimal("1.00")
+      )
+
+    def new_recipes(user, count=20):
+      return Recipe.objects.bulk_create(
+        Recipe(user=user, title="Bench", time_minutes=10, price=Decimal("1.00"))
+        for _ in range(count)
+      )
+
+    def throwaway_auth():
+      other = get_user_model().objects.create_user(
+        email=f"bench-{time.perf_counter_ns()}@example.com", name="Bench"
+      )
+      token, _ = issue_token(other)
+      return {"HTTP_AUTHORIZATION": f"Token {token}"}
+
+    recipe_payload = {
+      "title": "Bench recipe",
+      "time_minutes": 20,
+      "price": "4.50",
+      "tags": [{"name": "Bench"}],
+      "ingredients": [{"name": "Salt"}, {"name": "Pepper"}],
+    }
+
+    return [
+      ("user-create", "post", lambda user: (
+        reverse("user:create"),
+        {"data": {
+          "email": f"bench-{time.perf_counter_ns()}@example.com",
+          "password": "testpass123",
+          "name": "Bench",
+        }},
+      )),
+      ("user-token", "post", lambda user: (
+        reverse("user:token"),
+        {"data": {"email": user.email, "password": password}},
+      )),
+      ("user-token-refresh", "post", lambda user: (
+        reverse("user:token-refresh"), throwaway_auth(),
+      )),
+      ("user-token-revoke", "post", lambda user: (
+        reverse("user:token-revoke"), throwaway_auth(),
+      )),
+      ("user-me", "get", lambda user: (reverse("user:me"), {})),
+      ("user-me-update", "patch", lambda user: (
+        reverse("user:me"), {"data": {"name": user.name}, "format": "json"},
+      )),
+      ("user-me-delete", "delete", lambda user: (
+        reverse("user:me"), throwaway_auth(),
+      )),
+      ("recipe-list", "get", lambda user: (
+        reverse("recipe:recipe-list"), {},
+      )),
+      ("recipe-list-filtered", "get", lambda user: (
+        reverse("recipe:recipe-list"),
+        {"data": {"tags": ",".join(
+          str(pk) for pk in Tag.objects.filter(user=user)
+          .values_list("id", flat=True)[:3]
+        ) or "0"}},
+      )),
+      ("recipe-search", "get", lambda user: (
+        reverse("recipe:recipe-list"),
+        {"data": {"q": first(Recipe, user).title.split()[0]}},
+      )),
+      ("recipe-facets", "get", lambda user: (
+        reverse("recipe:recipe-facets"), {},
+      )),
+      ("recipe-similar", "get", lambda user: (
+        reverse("recipe:recipe-similar", args=[first(Recipe, user).id]), {},
+      )),
+      ("recipe-stats", "get", lambda user: (
+        reverse("recipe:recipe-stats"), {},
+      )),
+      ("recipe-sync", "get", lambda user: (
+        reverse("recipe:sync"), {"data": {"limit": 100}},
+      )),
+      ("recipe-shopping-list", "post", lambda user: (
+        reverse("recipe:recipe-shopping-list"),
+        {"data": {"recipes": list(
+          Recipe.objects.filter(user=user).values_list("id", flat=True)[:50]
+        )}, "format": "json"},
+      )),
+      ("recipe-detail", "get", lambda user: (
+        reverse("recipe:recipe-detail", args=[first(Recipe, user).id]), {},
+      )),
+      ("recipe-create", "post", lambda user: (
+        reverse("recipe:recipe-list"),
+        {"data": recipe_payload, "format": "json"},
+      )),
+      ("recipe-update", "patch", lambda user: (
+        reverse("recipe:recipe-detail", args=[first(Recipe, user).id]),
+        {"data": {"title": "Bench update"}, "format": "json"},
+      )),
+      ("recipe-delete", "delete", lambda user: (
+        reverse("recipe:recipe-detail", args=[new_recipe(user).id]), {},
+      )),
+      ("recipe-bulk-delete", "post", lambda user: (
+        reverse("recipe:recipe-bulk-delete"),
+        {"data": {"ids": [r.id for r in new_recipes(user)]}, "format": "json"},
+      )),
+      ("recipe-upload-image", "post", lambda user: (
+        reverse("recipe:recipe-upload-image", args=[new_recipe(user).id]),
+        {"data": {"image": _image_file()}, "format": "multipart"},
+      )),
+      ("batch-screen-load", "post", lambda user: (
+        reverse("api-batch"),
+        {"data": {"requests": [
+          {"path": reverse("user:me")},
+          {"path": reverse("recipe:tag-list")},
+          {"path": reverse("recipe:ingredient-list")},
+          {"path": f"{reverse('recipe:recipe-list')}?page_size=20"},
+          {"path": reverse("recipe:recipe-facets")},
+        ]}, "format": "json"},
+      )),
+      ("tag-list", "get", lambda user: (reverse("recipe:tag-list"), {})),
+      ("tag-list-assigned", "get", lambda user: (
+        reverse("recipe:tag-list"), {"data": {"assigned_only": 1}},
+      )),
+      ("tag-update", "patch", lambda user: (
+        reverse("recipe:tag-detail", args=[first(Tag, user).id]),
+        {"data": {"name": first(Tag, user).name}, "format": "json"},
+      )),
+      ("tag-delete", "delete", lambda user: (
+        reverse("recipe:tag-detail", args=[
+          Tag.objects.create(user=user, name=unique("Bench")).id
+        ]), {},
+      )),
+      ("ingredient-list", "get", lambda user: (
+        reverse("recipe:ingredient-list"), {},
+      )),
+      ("ingredient-update", "patch", lambda user: (
+        reverse("recipe:ingredient-detail", args=[first(Ingredient, user).id]),
+        {"data": {"name": first(Ingredient, user).name}, "format": "json"},
+      )),
+      ("ingredient-delete", "delete", lambda user: (
+        reverse("recipe:ingredient-detail", args=[
+          Ingredient.objects.create(user=user, name=unique("Bench")).id
+        ]), {},
+      )),
+    ]
+
+  def _run(self, client, user, auth, method, setup, iterations, warmup):
+    request = getattr(client, method)
+    timings = []
+    queries = []
+    status_code = None
+
+    for i in range(warmup + iterations):
+      url, kwargs = setup(user)
+      with CaptureQueriesContext(connection) as captured:
+        start = time.perf_counter()
+        response = request(url, **{**auth, **kwargs})
+        elapsed = time.perf_counter() - start
+      status_code = response.status_code
+      if i >= warmup:
+        timings.append(elapsed * 1000)
+        queries.append(len(captured))
+
+    # Memory is sampled on a separate request, tracemalloc would skew
+    # the timings above.
+    url, kwargs = setup(user)
+    tracemalloc.start()
+    response = request(url, **{**auth, **kwargs})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+      "status": status_code,
+      "iterations": len(timings),
+      "p50_ms": round(percentile(timings, 50), 3),
+      "p95_ms": round(percentile(timings, 95), 3),
+      "p99_ms": round(percentile(timings, 99), 3),
+      "mean_ms": round(statistics.fmean(timings), 3),
+      "queries": max(queries),
+      "peak_kb": round(peak / 1024, 1),
+      "response_bytes": len(response.content),
+    }
+
+  def _report(self, name, result):
+    self.stdout.write(
+      f"{name:<24} {result['status']:>3} "
+      f"p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms "
+      f"p99={result['p99_ms']:>8.2f}ms queries={result['queries']:>3} "
+      f"peak={result['peak_kb']:>8.1f}KiB"
+    )
+
+  def _write(self, path, results):
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as fh:
+      json.dump(results, fh, indent=2, sort_keys=True)
+
+  def _compare(self, path, results, tolerance):
+    try:
+      with open(path) as fh:
+        baseline = json.load(fh)
+    except FileNotFoundError:
+      raise CommandError(f"baseline {path} not found")
+
+    regressions = []
+    for name, result in results.items():
+      expected = baseline.get(name)
+      if expected is None:
+        continue
+      if result["queries"] > expected["queries"]:
+        regressions.append(
+          f"{name}: queries {expected['queries']} -> {result['queries']}"
+        )
+      if result["p95_ms"] > expected["p95_ms"] * tolerance:
+        regressions.append(
+          f"{name}: p95 {expected['p95_ms']}ms -> {result['p95_ms']}ms"
+        )
+
+    if regressions:
+      raise CommandError(
+        "Performance regressions:\n  " + "\n  ".join(regressions)
+      )
+    self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
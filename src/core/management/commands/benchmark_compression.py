@@ -0,0 +1,70 @@
+"""
+Measure CPU cost against bytes saved for each compression level
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from rest_framework.renderers import JSONRenderer
+
+from src.core import compression
+from src.core.models import Recipe
+from src.recipe.serializers import RecipeSerializer
+
+
+LEVELS = {
+  "gzip": range(1, 10),
+  "br": range(0, 12),
+  "zstd": [1, 3, 6, 9, 12, 19],
+}
+
+
+class Command(BaseCommand):
+  help = "Compress a rendered recipe list at every level and report the cost"
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--user", default=None,
+      help="Email of the user whose recipe list is compressed, defaults to "
+           "the user owning the most recipes"
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+
+  def handle(self, *args, **options):
+    payload = self._payload(options["user"])
+    self.stdout.write(f"Payload: {len(payload)} bytes")
+
+    for encoding, _ in compression.CODECS.items():
+      for level in LEVELS[encoding]:
+        start = time.process_time()
+        for _ in range(options["repeat"]):
+          compressed = compression.compress(payload, encoding, level)
+        cpu = (time.process_time() - start) / options["repeat"]
+        self.stdout.write(
+          f"{encoding:<5} level={level:<3} bytes={len(compressed):>9} "
+          f"ratio={len(payload) / len(compressed):>6.2f} "
+          f"cpu={cpu * 1000:>8.3f}ms "
+          f"MB/s={len(payload) / max(cpu, 1e-9) / 1e6:>8.1f}"
+        )
+
+  def _payload(self, email):
+    User = get_user_model()
+    if email:
+      user = User.objects.filter(email=email).first()
+    else:
+      user = (
+        User.objects.annotate(count=Count("recipe"))
+        .order_by("-count")
+        .first()
+      )
+    if user is None:
+      raise CommandError("no user found, run `seed_data` first")
+
+    recipes = (
+      Recipe.objects.filter(user=user)
+      .prefetch_related("tags", "ingredients")
+      .order_by("-id")
+    )
+    return JSONRenderer().render(RecipeSerializer(recipes, many=True).data)
@@ -0,0 +1,41 @@
+"""
+Measure the time each configured password hasher takes on this host
+"""
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+  help = "Report hash and verify time per PASSWORD_HASHERS entry"
+
+  def add_arguments(self, parser):
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--password", default="correct horse battery")
+
+  def handle(self, *args, **options):
+    repeat, password = options["repeat"], options["password"]
+
+    for index, hasher in enumerate(get_hashers()):
+      label = f"{hasher.algorithm}{' (preferred)' if index == 0 else ''}"
+      try:
+        encoded = hasher.encode(password, hasher.salt())
+      except ValueError as exc:
+        # Missing optional library
+        self.stdout.write(f"{label:<26} unavailable: {exc}")
+        continue
+
+      start = time.perf_counter()
+      for _ in range(repeat):
+        hasher.verify(password, encoded)
+      elapsed = (time.perf_counter() - start) / repeat
+
+      summary = ", ".join(
+        f"{key}={value}" for key, value in hasher.safe_summary(encoded).items()
+        if key not in ("algorithm", "salt", "hash")
+      )
+      self.stdout.write(
+        f"{label:<26} {elapsed * 1000:>9.1f}ms "
+        f"{1 / elapsed:>8.1f}/s per core  {summary}"
+      )
@@ -0,0 +1,61 @@
+"""
+Measure job queue throughput for worker thread and batch sizes
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from src.core.jobs import task_name, work_in_threads
+from src.core.models import Job
+
+
+def noop():
+  pass
+
+
+def _ints(value):
+  return [int(part) for part in value.split(",")]
+
+
+class Command(BaseCommand):
+  help = (
+    "Enqueue no-op jobs and report how fast workers drain them. Run it "
+    "against an idle queue, other ready jobs are run too."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument(
+      "--threads", type=_ints, default=[1, 4],
+      help="Comma separated worker thread counts"
+    )
+    parser.add_argument(
+      "--batch-size", type=_ints, default=[1, 10, 50],
+      help="Comma separated claim sizes"
+    )
+
+  def handle(self, *args, **options):
+    task = task_name(noop)
+    try:
+      for threads in options["threads"]:
+        for batch_size in options["batch_size"]:
+          with transaction.atomic():
+            Job.objects.bulk_create(
+              [Job(task=task) for _ in range(options["jobs"])],
+              batch_size=1000,
+            )
+
+          start = time.perf_counter()
+          work_in_threads(threads, batch_size=batch_size, burst=True)
+          elapsed = time.perf_counter() - start
+
+          left = Job.objects.filter(task=task).count()
+          self.stdout.write(
+            f"threads={threads:<3} batch={batch_size:<4} "
+            f"{elapsed * 1000:>9.1f}ms "
+            f"{(options['jobs'] - left) / elapsed:>9.1f} jobs/s"
+            + (f"  {left} left" if left else "")
+          )
+    finally:
+      Job.objects.filter(task=task).delete()
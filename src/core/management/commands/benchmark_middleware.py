@@ -0,0 +1,80 @@
+"""
+Measure the per request overhead of the middleware stack
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.utils.module_loading import import_string
+
+
+DJANGO_MIDDLEWARE = {
+  "src.core.middleware.SessionMiddleware":
+    "django.contrib.sessions.middleware.SessionMiddleware",
+  "src.core.middleware.CsrfViewMiddleware":
+    "django.middleware.csrf.CsrfViewMiddleware",
+  "src.core.middleware.AuthenticationMiddleware":
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+  "src.core.middleware.MessageMiddleware":
+    "django.contrib.messages.middleware.MessageMiddleware",
+  "src.core.middleware.XFrameOptionsMiddleware":
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+}
+
+
+def build_chain(middleware):
+  """Wrap an empty view in `middleware` the way BaseHandler does"""
+  view_hooks = []
+
+  def view(request):
+    return HttpResponse(b"{}", content_type="application/json")
+
+  def get_response(request):
+    for hook in view_hooks:
+      response = hook(request, view, (), {})
+      if response is not None:
+        return response
+    return view(request)
+
+  handler = get_response
+  for path in reversed(middleware):
+    instance = import_string(path)(handler)
+    if hasattr(instance, "process_view"):
+      view_hooks.insert(0, instance.process_view)
+    handler = instance
+  return handler
+
+
+class Command(BaseCommand):
+  help = "Compare middleware overhead for API and admin paths"
+
+  def add_arguments(self, parser):
+    parser.add_argument("--iterations", type=int, default=20000)
+
+  def handle(self, *args, **options):
+    factory = RequestFactory()
+    stacks = {
+      "lean": list(settings.MIDDLEWARE),
+      "full": [DJANGO_MIDDLEWARE.get(p, p) for p in settings.MIDDLEWARE],
+    }
+
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+      self._run(factory, stacks, options["iterations"])
+
+  def _run(self, factory, stacks, iterations):
+    for path in ["/api/recipe/recipes/", "/admin/"]:
+      for name, middleware in stacks.items():
+        chain = build_chain(middleware)
+        request = factory.get(path, HTTP_AUTHORIZATION="Token bench")
+        chain(request)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+          chain(factory.get(path, HTTP_AUTHORIZATION="Token bench"))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+          f"{path:<24} {name:<5} {elapsed / iterations * 1e6:>8.1f}us/request"
+        )
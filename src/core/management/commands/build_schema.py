@@ -0,0 +1,38 @@
+"""
+Generate the OpenAPI schema file served by CachedSpectacularAPIView
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from src.core.schema import generate_schema
+
+
+class Command(BaseCommand):
+  help = "Write the OpenAPI schema to SPECTACULAR_SCHEMA_FILE, run on deploy"
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--file", default=None,
+      help="Output path, defaults to SPECTACULAR_SCHEMA_FILE"
+    )
+
+  def handle(self, *args, **options):
+    path = options["file"] or settings.SPECTACULAR_SCHEMA_FILE
+    if not path:
+      raise CommandError("no --file given and SPECTACULAR_SCHEMA_FILE unset")
+
+    start = time.perf_counter()
+    schema = generate_schema()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    with open(path, "w") as fh:
+      json.dump(schema, fh, cls=JSONEncoder)
+
+    self.stdout.write(self.style.SUCCESS(
+      f"Schema generated in {elapsed:.1f}ms and written to {path}"
+    ))
@@ -0,0 +1,47 @@
+"""
+Compare Recipe.tag_ids and Recipe.ingredient_ids with the M2M tables
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from src.core.recipe_arrays import (
+  find_inconsistent_recipes,
+  rebuild_recipe_arrays,
+)
+
+
+class Command(BaseCommand):
+  help = "Check the denormalized recipe tag and ingredient id arrays"
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--fix", action="store_true",
+      help="Rebuild the arrays of inconsistent recipes"
+    )
+    parser.add_argument(
+      "--rebuild", action="store_true",
+      help="Rebuild the arrays of every recipe"
+    )
+    parser.add_argument("--batch-size", type=int, default=10000)
+
+  def handle(self, *args, **options):
+    if options["rebuild"]:
+      updated = rebuild_recipe_arrays(batch_size=options["batch_size"])
+      self.stdout.write(self.style.SUCCESS(f"Rebuilt {updated} recipes"))
+      return
+
+    recipe_ids = find_inconsistent_recipes()
+    if not recipe_ids:
+      self.stdout.write(self.style.SUCCESS("All recipe arrays are consistent"))
+      return
+
+    shown = ", ".join(map(str, recipe_ids[:20]))
+    more = "..." if len(recipe_ids) > 20 else ""
+    message = f"{len(recipe_ids)} inconsistent recipes: {shown}{more}"
+    if not options["fix"]:
+      raise CommandError(message)
+
+    self.stdout.write(message)
+    updated = rebuild_recipe_arrays(
+      recipe_ids, batch_size=options["batch_size"]
+    )
+    self.stdout.write(self.style.SUCCESS(f"Fixed {updated} recipes"))
@@ -0,0 +1,42 @@
+"""
+Delete users and everything they own in batches
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from src.core.deletion import delete_user, wait_for_files
+
+
+class Command(BaseCommand):
+  help = "Delete users by email or id with their recipes, tags and images"
+
+  def add_arguments(self, parser):
+    parser.add_argument("users", nargs="+", help="Emails or ids")
+    parser.add_argument("--batch-size", type=int, default=1000)
+
+  def handle(self, *args, **options):
+    ids = [value for value in options["users"] if value.isdigit()]
+    emails = [value for value in options["users"] if not value.isdigit()]
+    users = list(get_user_model().objects.filter(
+      Q(pk__in=ids) | Q(email__in=emails)
+    ))
+    if not users:
+      raise CommandError("No matching users")
+
+    start = time.perf_counter()
+
+    def progress(stage, done, total):
+      self.stdout.write(
+        f"  {stage} {done}/{total} ({time.perf_counter() - start:.1f}s)"
+      )
+
+    for user in users:
+      self.stdout.write(f"Deleting {user.email}")
+      delete_user(user, batch_size=options["batch_size"], progress=progress)
+
+    # Image files are removed by background threads
+    wait_for_files()
+    self.stdout.write(self.style.SUCCESS(f"Deleted {len(users)} users"))
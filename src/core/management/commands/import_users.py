@@ -0,0 +1,188 @@
+"""
+Import users in bulk from CSV or NDJSON
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+
+def _setup_worker():
+  # Needed when workers are spawned rather than forked
+  import django
+  django.setup()
+
+
+class Command(BaseCommand):
+  help = (
+    "Stream users from a CSV or NDJSON file with email, name and either "
+    "password or password_hash fields. Existing emails are skipped."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("path", help="File to read, - for stdin")
+    parser.add_argument(
+      "--format", choices=["csv", "ndjson"], default=None,
+      help="Defaults to the file extension"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+      "--workers", type=int, default=os.cpu_count(),
+      help="Processes hashing passwords, 0 hashes in this process"
+    )
+
+  def handle(self, *args, **options):
+    fmt = options["format"] or (
+      "ndjson" if options["path"].endswith((".ndjson", ".jsonl")) else "csv"
+    )
+    if options["path"] == "-":
+      stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    else:
+      try:
+        stream = open(options["path"], newline="", encoding="utf-8")
+      except OSError as exc:
+        raise CommandError(exc)
+
+    self.workers, pool = options["workers"], None
+    if self.workers:
+      pool = ProcessPoolExecutor(
+        max_workers=self.workers, initializer=_setup_worker
+      )
+
+    totals = {"created": 0, "existing": 0, "invalid": 0}
+    start = time.perf_counter()
+    try:
+      rows = enumerate(self._read(stream, fmt), start=1)
+      while True:
+        batch = list(itertools.islice(rows, options["batch_size"]))
+        if not batch:
+          break
+        for key, count in self._import_batch(batch, pool).items():
+          totals[key] += count
+        self.stdout.write(
+          f"  {batch[-1][0]} rows, {totals['created']} created "
+          f"({time.perf_counter() - start:.1f}s)"
+        )
+    finally:
+      stream.close()
+      if pool:
+        pool.shutdown()
+
+    self.stdout.write(self.style.SUCCESS(
+      "Created {created} users, skipped {existing} existing and "
+      "{invalid} invalid rows".format(**totals)
+    ))
+
+  def _read(self, stream, fmt):
+    if fmt == "csv":
+      yield from csv.DictReader(stream)
+      return
+    for line in stream:
+      if line.strip():
+        try:
+          row = json.loads(line)
+        except ValueError:
+          row = None
+        yield row if isinstance(row, dict) else {}
+
+  def _clean(self, row):
+    """
+    Return (email, name, password, password_hash) of a row validated like
+    the model fields, or None when invalid. Rows are checked before the
+    batch insert so one bad row cannot abort it.
+    """
+    User = get_user_model()
+    values = [
+      row.get(key) for key in ("email", "name", "password", "password_hash")
+    ]
+    if not all(value is None or isinstance(value, str) for value in values):
+      return None
+    email, name, password, password_hash = (value or "" for value in values)
+    try:
+      email = User._meta.get_field("email").clean(
+        User.objects.normalize_email(email.strip()), None
+      )
+      name = name.strip()
+      User._meta.get_field("name").run_validators(name)
+      if password_hash:
+        identify_hasher(password_hash)
+        User._meta.get_field("password").run_validators(password_hash)
+    except (ValidationError, ValueError):
+      return None
+    return email, name, password or None, password_hash or None
+
+  def _insert(self, users):
+    """Insert users, return (created, existing) counts"""
+    User = get_user_model()
+    existing = 0
+    while users:
+      try:
+        with transaction.atomic():
+          User.objects.bulk_create(users)
+        break
+      except IntegrityError:
+        # Some emails were inserted concurrently since they were checked
+        taken = set(User.objects.filter(
+          email__in=[user.email for user in users]
+        ).values_list("email", flat=True))
+        if not taken:
+          raise
+        existing += sum(user.email in taken for user in users)
+        users = [user for user in users if user.email not in taken]
+    return len(users), existing
+
+  def _import_batch(self, batch, pool):
+    """Insert one batch, return counts of created, existing and invalid"""
+    User = get_user_model()
+    counts = {"created": 0, "existing": 0, "invalid": 0}
+
+    users = {}
+    for line, row in batch:
+      cleaned = self._clean(row)
+      if cleaned is None:
+        self.stderr.write(f"line {line}: invalid row skipped")
+        counts["invalid"] += 1
+        continue
+      email, name, password, password_hash = cleaned
+      if email in users:
+        counts["existing"] += 1
+        continue
+      users[email] = (name, password, password_hash)
+
+    # Skip hashing for users that already exist
+    existing = set(
+      User.objects.filter(email__in=users).values_list("email", flat=True)
+    )
+    counts["existing"] += len(existing)
+    for email in existing:
+      del users[email]
+
+    to_hash = [
+      email for email, (name, password, password_hash) in users.items()
+      if not password_hash
+    ]
+    passwords = [users[email][1] for email in to_hash]
+    if pool and passwords:
+      chunksize = max(1, len(passwords) // (self.workers * 4))
+      hashes = pool.map(make_password, passwords, chunksize=chunksize)
+    else:
+      hashes = map(make_password, passwords)
+    hashed = dict(zip(to_hash, hashes))
+
+    created, existing = self._insert([
+      User(email=email, name=name, password=password_hash or hashed[email])
+      for email, (name, password, password_hash) in users.items()
+    ])
+    counts["created"] += created
+    counts["existing"] += existing
+    return counts
@@ -0,0 +1,41 @@
+"""
+Merge tags and ingredients whose names differ only in case or whitespace
+"""
+from django.core.management.base import BaseCommand
+
+from src.core.models import (Tag, Ingredient)
+from src.core.names import merge_duplicate_names
+
+
+MODELS = {"tag": Tag, "ingredient": Ingredient}
+
+
+class Command(BaseCommand):
+  help = "Merge duplicate tag and ingredient names with set based SQL"
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--model", choices=sorted(MODELS), action="append",
+      help="Only merge this model, may be repeated"
+    )
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument(
+      "--dry-run", action="store_true",
+      help="Only report how many rows would be merged"
+    )
+
+  def handle(self, *args, **options):
+    for name in options["model"] or sorted(MODELS):
+      def progress(done, total, name=name):
+        self.stdout.write(f"  {name}: {done}/{total}")
+
+      merged = merge_duplicate_names(
+        MODELS[name],
+        batch_size=options["batch_size"],
+        dry_run=options["dry_run"],
+        progress=progress,
+      )
+      verb = "Would merge" if options["dry_run"] else "Merged"
+      self.stdout.write(self.style.SUCCESS(
+        f"{verb} {merged} duplicate {name} rows"
+      ))
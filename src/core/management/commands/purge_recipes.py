@@ -0,0 +1,30 @@
+"""
+Remove soft deleted recipes left behind by an interrupted purge
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from src.core.deletion import purge_deleted_recipes, wait_for_files
+
+
+class Command(BaseCommand):
+  help = "Delete soft deleted recipes with their images in batches"
+
+  def add_arguments(self, parser):
+    parser.add_argument("--user-id", type=int, help="Only purge this user")
+    parser.add_argument("--batch-size", type=int, default=1000)
+
+  def handle(self, *args, **options):
+    start = time.perf_counter()
+
+    def progress(stage, done, total):
+      self.stdout.write(
+        f"  {stage} {done}/{total} ({time.perf_counter() - start:.1f}s)"
+      )
+
+    purged = purge_deleted_recipes(
+      options["user_id"], batch_size=options["batch_size"], progress=progress
+    )
+    wait_for_files()
+    self.stdout.write(self.style.SUCCESS(f"Purged {purged} recipes"))
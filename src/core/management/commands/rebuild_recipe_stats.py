@@ -0,0 +1,20 @@
+"""
+Recompute the per-user recipe statistics
+"""
+from django.core.management.base import BaseCommand
+
+from src.core.stats import rebuild_recipe_stats
+
+
+class Command(BaseCommand):
+  help = "Recompute per-user recipe statistics from the recipe tables"
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--user-id", type=int, action="append",
+      help="Only rebuild this user, may be repeated"
+    )
+
+  def handle(self, *args, **options):
+    rows = rebuild_recipe_stats(options["user_id"])
+    self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics of {rows} users"))
@@ -0,0 +1,99 @@
+"""
+Run queued jobs, see src.core.jobs
+"""
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from src.core.jobs import work_in_threads
+
+
+def _run_process(threads, options):
+  stop = threading.Event()
+  signal.signal(signal.SIGTERM, lambda *args: stop.set())
+  # Ctrl-C reaches the whole process group, the parent forwards SIGTERM
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  work_in_threads(threads, stop=stop, **options)
+
+
+class Command(BaseCommand):
+  help = (
+    "Run jobs from the database queue until interrupted. Workers finish "
+    "their current batch on SIGINT or SIGTERM."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      "--threads", type=int, default=4, help="Worker threads per process"
+    )
+    parser.add_argument(
+      "--processes", type=int, default=1,
+      help="Worker processes, more than one forks this one"
+    )
+    parser.add_argument(
+      "--batch-size", type=int, default=10,
+      help="Jobs claimed by a worker at a time"
+    )
+    parser.add_argument(
+      "--poll-interval", type=float, default=1.0,
+      help="Seconds to wait when no job is ready"
+    )
+    parser.add_argument(
+      "--burst", action="store_true",
+      help="Exit once no job is ready"
+    )
+
+  def handle(self, *args, **options):
+    threads = options["threads"]
+    work_options = {
+      "batch_size": options["batch_size"],
+      "poll_interval": options["poll_interval"],
+      "burst": options["burst"],
+    }
+    self.stdout.write(
+      f"Running {options['processes']} x {threads} workers"
+    )
+
+    previous = {
+      signum: signal.getsignal(signum)
+      for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+      self._run(threads, options["processes"], work_options)
+    finally:
+      # Leave the handlers of a calling process, such as tests, as found
+      for signum, handler in previous.items():
+        signal.signal(signum, handler)
+
+  def _run(self, threads, process_count, work_options):
+    if process_count <= 1:
+      stop = threading.Event()
+      for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())
+      claimed = work_in_threads(threads, stop=stop, **work_options)
+      self.stdout.write(self.style.SUCCESS(f"Claimed {claimed} jobs"))
+      return
+
+    # Children must open their own connections
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    processes = [
+      context.Process(target=_run_process, args=(threads, work_options))
+      for _ in range(process_count)
+    ]
+    for process in processes:
+      process.start()
+
+    def forward(*args):
+      for process in processes:
+        if process.is_alive():
+          process.terminate()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+      signal.signal(signum, forward)
+    for process in processes:
+      process.join()
+    self.stdout.write(self.style.SUCCESS("Workers stopped"))
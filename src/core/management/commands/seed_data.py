@@ -0,0 +1,174 @@
+"""
+Seed the database with a synthetic, reproducible dataset
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from src.core.models import (Recipe, Tag, Ingredient)
+
+
+TAG_NAMES = [
+  "Vegan", "Vegetarian", "Dessert", "Breakfast", "Lunch", "Dinner",
+  "Snack", "Quick", "Spicy", "Gluten Free", "Dairy Free", "Low Carb",
+  "Italian", "Indian", "Mexican", "Thai", "Chinese", "French",
+  "Comfort Food", "Healthy", "Holiday", "Grill", "Soup", "Salad",
+]
+
+INGREDIENT_NAMES = [
+  "Salt", "Pepper", "Olive Oil", "Butter", "Garlic", "Onion", "Tomato",
+  "Potato", "Carrot", "Celery", "Chicken", "Beef", "Pork", "Tofu",
+  "Rice", "Pasta", "Flour", "Sugar", "Egg", "Milk", "Cream", "Cheese",
+  "Basil", "Oregano", "Thyme", "Cumin", "Paprika", "Chili", "Ginger",
+  "Lemon", "Lime", "Coriander", "Spinach", "Mushroom", "Bell Pepper",
+  "Cucumber", "Yogurt", "Honey", "Soy Sauce", "Vinegar", "Beans",
+  "Lentils", "Coconut Milk", "Cinnamon", "Vanilla", "Chocolate",
+]
+
+
+class Command(BaseCommand):
+  help = "Seed users, recipes, tags and ingredients with synthetic data"
+
+  def add_arguments(self, parser):
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument(
+      "--recipes", type=int, default=100,
+      help="Mean number of recipes per user"
+    )
+    parser.add_argument(
+      "--tags", type=int, default=15,
+      help="Number of tags per user"
+    )
+    parser.add_argument(
+      "--ingredients", type=int, default=40,
+      help="Number of ingredients per user"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+      "--password", default="testpass123",
+      help="Password shared by every seeded user"
+    )
+    parser.add_argument(
+      "--email-domain", default="seed.example.com",
+    )
+
+  def handle(self, *args, **options):
+    try:
+      from faker import Faker
+    except ImportError:
+      raise CommandError("faker is required, install the dev dependencies")
+
+    rng = random.Random(options["seed"])
+    faker = Faker()
+    faker.seed_instance(options["seed"])
+    batch_size = options["batch_size"]
+
+    with transaction.atomic():
+      users = self._create_users(faker, options)
+      totals = {"users": len(users), "tags": 0, "ingredients": 0,
+                "recipes": 0}
+
+      for user in users:
+        tags = self._create_names(
+          Tag, user, TAG_NAMES, options["tags"], faker, rng, batch_size
+        )
+        ingredients = self._create_names(
+          Ingredient, user, INGREDIENT_NAMES, options["ingredients"],
+          faker, rng, batch_size
+        )
+        recipes = self._create_recipes(
+          user, options["recipes"], tags, ingredients, faker, rng, batch_size
+        )
+        totals["tags"] += len(tags)
+        totals["ingredients"] += len(ingredients)
+        totals["recipes"] += recipes
+
+    self.stdout.write(self.style.SUCCESS(
+      "Seeded {users} users, {recipes} recipes, {tags} tags, "
+      "{ingredients} ingredients".format(**totals)
+    ))
+
+  def _create_users(self, faker, options):
+    """Bulk insert users sharing a single pre-computed password hash"""
+    User = get_user_model()
+    password = make_password(options["password"])
+    users = [
+      User(
+        email=f"user{i}@{options['email_domain']}",
+        name=faker.name(),
+        password=password,
+      )
+      for i in range(options["users"])
+    ]
+    User.objects.bulk_create(
+      users, batch_size=options["batch_size"], ignore_conflicts=True
+    )
+    return list(
+      User.objects.filter(
+        email__in=[user.email for user in users]
+      ).order_by("id")
+    )
+
+  def _create_names(self, model, user, vocabulary, count, faker, rng,
+                    batch_size):
+    """Pick `count` distinct names, padding the vocabulary with faker words"""
+    names = rng.sample(vocabulary, min(count, len(vocabulary)))
+    seen = set(names)
+    while len(names) < count:
+      name = f"{faker.word().title()} {rng.choice(vocabulary)}"
+      if name not in seen:
+        seen.add(name)
+        names.append(name)
+
+    return model.objects.bulk_create(
+      [model(user=user, name=name) for name in names],
+      batch_size=batch_size,
+    )
+
+  def _create_recipes(self, user, mean, tags, ingredients, faker, rng,
+                      batch_size):
+    """
+    Bulk insert recipes for a user.
+
+    Recipe counts per user, prices and cooking times follow skewed
+    distributions so a few users own large collections and most own few.
+    """
+    count = max(1, int(rng.expovariate(1 / mean))) if mean else 0
+    recipes = []
+    for _ in range(count):
+      recipes.append(Recipe(
+        user=user,
+        title=faker.sentence(nb_words=rng.randint(2, 6)).rstrip("."),
+        description=faker.paragraph(nb_sentences=rng.randint(1, 5)),
+        time_minutes=min(600, max(1, int(rng.gammavariate(2.0, 15)))),
+        price=Decimal(
+          str(round(min(999.99, rng.lognormvariate(2.0, 0.6)), 2))
+        ),
+        link=faker.url() if rng.random() < 0.5 else "",
+      ))
+    recipes = Recipe.objects.bulk_create(recipes, batch_size=batch_size)
+
+    RecipeTag = Recipe.tags.through
+    RecipeIngredient = Recipe.ingredients.through
+    recipe_tags = []
+    recipe_ingredients = []
+    for recipe in recipes:
+      for tag in rng.sample(tags, min(len(tags), rng.randint(0, 4))):
+        recipe_tags.append(RecipeTag(recipe_id=recipe.id, tag_id=tag.id))
+      for ingredient in rng.sample(
+        ingredients, min(len(ingredients), rng.randint(2, 12))
+      ):
+        recipe_ingredients.append(RecipeIngredient(
+          recipe_id=recipe.id, ingredient_id=ingredient.id
+        ))
+
+    RecipeTag.objects.bulk_create(recipe_tags, batch_size=batch_size)
+    RecipeIngredient.objects.bulk_create(
+      recipe_ingredients, batch_size=batch_size
+    )
+    return len(recipes)
@@ -0,0 +1,123 @@
+"""
+Project middleware
+"""
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.middleware import clickjacking, csrf
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from src.core import compression
+
+
+def is_api_request(request):
+  """Return True when the request targets one of API_PATH_PREFIXES"""
+  return request.path_info.startswith(tuple(settings.API_PATH_PREFIXES))
+
+
+class ApiExemptMixin:
+  """
+  Skip the wrapped middleware for API requests.
+
+  The API authenticates with tokens, so session loading, message storage
+  and CSRF are pure overhead there while the admin still relies on them.
+  """
+  async_capable = False
+
+  def __call__(self, request):
+    if is_api_request(request):
+      return self.get_response(request)
+    return super().__call__(request)
+
+
+class SessionMiddleware(ApiExemptMixin, sessions_middleware.SessionMiddleware):
+  pass
+
+
+class AuthenticationMiddleware(ApiExemptMixin,
+                               auth_middleware.AuthenticationMiddleware):
+  pass
+
+
+class MessageMiddleware(ApiExemptMixin, messages_middleware.MessageMiddleware):
+  pass
+
+
+class XFrameOptionsMiddleware(clickjacking.XFrameOptionsMiddleware):
+  """
+  Skip frame options on API responses other than HTML.
+
+  Pages under the API prefix such as the Swagger UI can still be framed
+  by another site, so they keep the header.
+  """
+
+  def process_response(self, request, response):
+    content_type = response.get("Content-Type", "")
+    if is_api_request(request) and not content_type.startswith("text/html"):
+      return response
+    return super().process_response(request, response)
+
+
+class CsrfViewMiddleware(ApiExemptMixin, csrf.CsrfViewMiddleware):
+
+  def process_view(self, request, callback, callback_args, callback_kwargs):
+    if is_api_request(request):
+      return None
+    return super().process_view(
+      request, callback, callback_args, callback_kwargs
+    )
+
+
+class CompressionMiddleware(MiddlewareMixin):
+  """
+  Compress responses according to Accept-Encoding.
+
+  Only COMPRESSION_CONTENT_TYPES are compressed, buffered responses must be
+  at least COMPRESSION_MIN_SIZE bytes. Streaming responses are compressed
+  chunk by chunk.
+  """
+
+  def process_response(self, request, response):
+    if response.has_header("Content-Encoding"):
+      return response
+
+    content_type = response.get("Content-Type", "").split(";")[0].strip()
+    if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+      return response
+
+    if (not response.streaming
+        and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+      return response
+
+    patch_vary_headers(response, ("Accept-Encoding",))
+
+    encoding = compression.select_encoding(
+      request.META.get("HTTP_ACCEPT_ENCODING", "")
+    )
+    if encoding is None:
+      return response
+
+    if response.streaming:
+      if response.is_async:
+        response.streaming_content = compression.acompress_sequence(
+          response.streaming_content, encoding
+        )
+      else:
+        response.streaming_content = compression.compress_sequence(
+          response.streaming_content, encoding
+        )
+      del response.headers["Content-Length"]
+    else:
+      content = compression.compress(response.content, encoding)
+      if len(content) >= len(response.content):
+        return response
+      response.content = content
+      response.headers["Content-Length"] = str(len(content))
+
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+      response.headers["ETag"] = "W/" + etag
+    response.headers["Content-Encoding"] = encoding
+    return response
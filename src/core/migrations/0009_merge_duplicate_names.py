@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:59
+
+from django.db import migrations
+
+
+# Frozen copy of src.core.names.merge_duplicate_names in a single pass. The
+# unique constraints added next fail while duplicates exist. Large tables
+# should run `manage.py merge_duplicate_names` before migrating.
+MERGE_SQL = """
+CREATE TEMPORARY TABLE {table}_merge AS
+SELECT id AS old_id, keep_id
+FROM (
+    SELECT id, min(id) OVER (
+        PARTITION BY user_id, lower(btrim(name))
+    ) AS keep_id
+    FROM {table}
+) grouped
+WHERE id <> keep_id;
+
+INSERT INTO {through} (recipe_id, {column})
+SELECT DISTINCT t.recipe_id, m.keep_id
+FROM {through} t
+JOIN {table}_merge m ON t.{column} = m.old_id
+ON CONFLICT DO NOTHING;
+
+DELETE FROM {through} t USING {table}_merge m WHERE t.{column} = m.old_id;
+DELETE FROM {table} o USING {table}_merge m WHERE o.id = m.old_id;
+UPDATE {table} SET name = btrim(name) WHERE name <> btrim(name);
+
+DROP TABLE {table}_merge;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            MERGE_SQL.format(
+                table='core_tag', through='core_recipe_tags', column='tag_id',
+            ),
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            MERGE_SQL.format(
+                table='core_ingredient', through='core_recipe_ingredients',
+                column='ingredient_id',
+            ),
+            migrations.RunSQL.noop,
+        ),
+    ]
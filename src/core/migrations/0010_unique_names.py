@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:59
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_merge_duplicate_names'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(models.F('user'), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('name')), name='ingredient_user_name_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(models.F('user'), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('name')), name='tag_user_name_key'),
+        ),
+    ]
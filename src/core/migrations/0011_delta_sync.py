@@ -0,0 +1,141 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+TRIGGERS_SQL = """
+CREATE FUNCTION core_track_change() RETURNS trigger AS $$
+BEGIN
+    NEW.change_id := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_write_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO core_tombstone (user_id, model, object_id, change_id, deleted_at)
+    VALUES (OLD.user_id, TG_ARGV[0], OLD.id,
+            pg_current_xact_id()::text::bigint, now());
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_touch_recipe() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE core_recipe SET updated_at = now() WHERE id = OLD.recipe_id;
+    ELSE
+        UPDATE core_recipe SET updated_at = now() WHERE id = NEW.recipe_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_change BEFORE INSERT OR UPDATE ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_track_change();
+CREATE TRIGGER core_tag_change BEFORE INSERT OR UPDATE ON core_tag
+    FOR EACH ROW EXECUTE FUNCTION core_track_change();
+CREATE TRIGGER core_ingredient_change BEFORE INSERT OR UPDATE ON core_ingredient
+    FOR EACH ROW EXECUTE FUNCTION core_track_change();
+
+CREATE TRIGGER core_recipe_tombstone AFTER DELETE ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_write_tombstone('recipe');
+CREATE TRIGGER core_tag_tombstone AFTER DELETE ON core_tag
+    FOR EACH ROW EXECUTE FUNCTION core_write_tombstone('tag');
+CREATE TRIGGER core_ingredient_tombstone AFTER DELETE ON core_ingredient
+    FOR EACH ROW EXECUTE FUNCTION core_write_tombstone('ingredient');
+
+CREATE TRIGGER core_recipe_tags_change AFTER INSERT OR DELETE ON core_recipe_tags
+    FOR EACH ROW EXECUTE FUNCTION core_touch_recipe();
+CREATE TRIGGER core_recipe_ingredients_change
+    AFTER INSERT OR DELETE ON core_recipe_ingredients
+    FOR EACH ROW EXECUTE FUNCTION core_touch_recipe();
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER core_recipe_ingredients_change ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_tags_change ON core_recipe_tags;
+DROP TRIGGER core_ingredient_tombstone ON core_ingredient;
+DROP TRIGGER core_tag_tombstone ON core_tag;
+DROP TRIGGER core_recipe_tombstone ON core_recipe;
+DROP TRIGGER core_ingredient_change ON core_ingredient;
+DROP TRIGGER core_tag_change ON core_tag;
+DROP TRIGGER core_recipe_change ON core_recipe;
+DROP FUNCTION core_touch_recipe();
+DROP FUNCTION core_write_tombstone();
+DROP FUNCTION core_track_change();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_unique_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('change_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'change_id', 'id'], name='ingredient_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'change_id', 'id'], name='recipe_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'change_id', 'id'], name='tag_user_change_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'change_id', 'id'], name='tombstone_user_change_idx'),
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,173 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+TRIGGERS_SQL = """
+CREATE FUNCTION core_recipe_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- No insert, the user may be being deleted
+        UPDATE core_recipestats s SET
+            recipe_count = s.recipe_count - d.n,
+            price_sum = s.price_sum - d.price,
+            time_sum = s.time_sum - d.time
+        FROM (
+            SELECT user_id, count(*) AS n, sum(price) AS price,
+                   sum(time_minutes) AS time
+            FROM old_rows GROUP BY user_id
+        ) d
+        WHERE s.user_id = d.user_id;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO core_recipestats (
+            user_id, recipe_count, price_sum, time_sum, tag_count,
+            ingredient_count
+        )
+        SELECT user_id, count(*), sum(price), sum(time_minutes), 0, 0
+        FROM new_rows GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            recipe_count = core_recipestats.recipe_count
+                + EXCLUDED.recipe_count,
+            price_sum = core_recipestats.price_sum + EXCLUDED.price_sum,
+            time_sum = core_recipestats.time_sum + EXCLUDED.time_sum;
+        RETURN NULL;
+    END IF;
+
+    -- Most updates leave user, price and time alone
+    INSERT INTO core_recipestats (
+        user_id, recipe_count, price_sum, time_sum, tag_count, ingredient_count
+    )
+    SELECT user_id, sum(n), sum(price), sum(time), 0, 0
+    FROM (
+        SELECT user_id, 1 AS n, price, time_minutes AS time FROM new_rows
+        UNION ALL
+        SELECT user_id, -1, -price, -time_minutes FROM old_rows
+    ) delta
+    GROUP BY user_id
+    HAVING sum(n) <> 0 OR sum(price) <> 0 OR sum(time) <> 0
+    ON CONFLICT (user_id) DO UPDATE SET
+        recipe_count = core_recipestats.recipe_count + EXCLUDED.recipe_count,
+        price_sum = core_recipestats.price_sum + EXCLUDED.price_sum,
+        time_sum = core_recipestats.time_sum + EXCLUDED.time_sum;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_name_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        EXECUTE format(
+            'UPDATE core_recipestats s SET %1$I = s.%1$I - d.n '
+            'FROM (SELECT user_id, count(*) AS n FROM old_rows '
+            'GROUP BY user_id) d WHERE s.user_id = d.user_id',
+            TG_ARGV[0]
+        );
+    ELSE
+        EXECUTE format(
+            'INSERT INTO core_recipestats (user_id, recipe_count, price_sum, '
+            'time_sum, tag_count, ingredient_count) '
+            'SELECT user_id, 0, 0, 0, 0, 0 FROM new_rows GROUP BY user_id '
+            'ON CONFLICT (user_id) DO NOTHING; '
+            'UPDATE core_recipestats s SET %1$I = s.%1$I + d.n '
+            'FROM (SELECT user_id, count(*) AS n FROM new_rows '
+            'GROUP BY user_id) d WHERE s.user_id = d.user_id',
+            TG_ARGV[0]
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_stats_insert AFTER INSERT ON core_recipe
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_stats();
+CREATE TRIGGER core_recipe_stats_update AFTER UPDATE ON core_recipe
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_stats();
+CREATE TRIGGER core_recipe_stats_delete AFTER DELETE ON core_recipe
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_stats();
+
+CREATE TRIGGER core_tag_stats_insert AFTER INSERT ON core_tag
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_name_stats('tag_count');
+CREATE TRIGGER core_tag_stats_delete AFTER DELETE ON core_tag
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_name_stats('tag_count');
+CREATE TRIGGER core_ingredient_stats_insert AFTER INSERT ON core_ingredient
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_name_stats('ingredient_count');
+CREATE TRIGGER core_ingredient_stats_delete AFTER DELETE ON core_ingredient
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_name_stats('ingredient_count');
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER core_ingredient_stats_delete ON core_ingredient;
+DROP TRIGGER core_ingredient_stats_insert ON core_ingredient;
+DROP TRIGGER core_tag_stats_delete ON core_tag;
+DROP TRIGGER core_tag_stats_insert ON core_tag;
+DROP TRIGGER core_recipe_stats_delete ON core_recipe;
+DROP TRIGGER core_recipe_stats_update ON core_recipe;
+DROP TRIGGER core_recipe_stats_insert ON core_recipe;
+DROP FUNCTION core_name_stats();
+DROP FUNCTION core_recipe_stats();
+"""
+
+# Frozen copy of src.core.stats.REBUILD_SQL
+BUILD_STATS_SQL = """
+INSERT INTO core_recipestats (
+    user_id, recipe_count, price_sum, time_sum, tag_count, ingredient_count
+)
+SELECT u.id,
+       coalesce(r.recipe_count, 0), coalesce(r.price_sum, 0),
+       coalesce(r.time_sum, 0), coalesce(t.tag_count, 0),
+       coalesce(i.ingredient_count, 0)
+FROM core_user u
+LEFT JOIN (
+    SELECT user_id, count(*) AS recipe_count, sum(price) AS price_sum,
+           sum(time_minutes) AS time_sum
+    FROM core_recipe GROUP BY user_id
+) r ON r.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, count(*) AS tag_count FROM core_tag GROUP BY user_id
+) t ON t.user_id = u.id
+LEFT JOIN (
+    SELECT user_id, count(*) AS ingredient_count
+    FROM core_ingredient GROUP BY user_id
+) i ON i.user_id = u.id
+ON CONFLICT (user_id) DO UPDATE SET
+    recipe_count = EXCLUDED.recipe_count,
+    price_sum = EXCLUDED.price_sum,
+    time_sum = EXCLUDED.time_sum,
+    tag_count = EXCLUDED.tag_count,
+    ingredient_count = EXCLUDED.ingredient_count;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('time_sum', models.BigIntegerField(default=0)),
+                ('tag_count', models.IntegerField(default=0)),
+                ('ingredient_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+        migrations.RunSQL(BUILD_STATS_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:24
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+TRIGGERS_SQL = """
+DROP TRIGGER core_recipe_ingredients_change ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_tags_change ON core_recipe_tags;
+DROP FUNCTION core_touch_recipe();
+
+-- Also stamps the recipes for delta sync through core_track_change()
+CREATE FUNCTION core_recipe_m2m_arrays() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'core_recipe_tags' THEN
+        UPDATE core_recipe r SET
+            tag_ids = coalesce((
+                SELECT array_agg(m.tag_id ORDER BY m.tag_id)
+                FROM core_recipe_tags m WHERE m.recipe_id = r.id
+            ), '{}'),
+            updated_at = now()
+        WHERE r.id IN (SELECT recipe_id FROM changed_rows);
+    ELSE
+        UPDATE core_recipe r SET
+            ingredient_ids = coalesce((
+                SELECT array_agg(m.ingredient_id ORDER BY m.ingredient_id)
+                FROM core_recipe_ingredients m WHERE m.recipe_id = r.id
+            ), '{}'),
+            updated_at = now()
+        WHERE r.id IN (SELECT recipe_id FROM changed_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_recipe_keep_arrays() RETURNS trigger AS $$
+BEGIN
+    IF pg_trigger_depth() = 1
+       AND current_setting('core.recipe_arrays', true) IS DISTINCT FROM 'on'
+    THEN
+        IF TG_OP = 'INSERT' THEN
+            NEW.tag_ids := '{}';
+            NEW.ingredient_ids := '{}';
+        ELSE
+            NEW.tag_ids := OLD.tag_ids;
+            NEW.ingredient_ids := OLD.ingredient_ids;
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_keep_arrays BEFORE INSERT OR UPDATE ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_recipe_keep_arrays();
+
+CREATE TRIGGER core_recipe_tags_insert AFTER INSERT ON core_recipe_tags
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_m2m_arrays();
+CREATE TRIGGER core_recipe_tags_delete AFTER DELETE ON core_recipe_tags
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_m2m_arrays();
+CREATE TRIGGER core_recipe_ingredients_insert
+    AFTER INSERT ON core_recipe_ingredients
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_m2m_arrays();
+CREATE TRIGGER core_recipe_ingredients_delete
+    AFTER DELETE ON core_recipe_ingredients
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_m2m_arrays();
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER core_recipe_ingredients_delete ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_ingredients_insert ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_tags_delete ON core_recipe_tags;
+DROP TRIGGER core_recipe_tags_insert ON core_recipe_tags;
+DROP TRIGGER core_recipe_keep_arrays ON core_recipe;
+DROP FUNCTION core_recipe_keep_arrays();
+DROP FUNCTION core_recipe_m2m_arrays();
+
+CREATE FUNCTION core_touch_recipe() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE core_recipe SET updated_at = now() WHERE id = OLD.recipe_id;
+    ELSE
+        UPDATE core_recipe SET updated_at = now() WHERE id = NEW.recipe_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_tags_change AFTER INSERT OR DELETE ON core_recipe_tags
+    FOR EACH ROW EXECUTE FUNCTION core_touch_recipe();
+CREATE TRIGGER core_recipe_ingredients_change
+    AFTER INSERT OR DELETE ON core_recipe_ingredients
+    FOR EACH ROW EXECUTE FUNCTION core_touch_recipe();
+"""
+
+# Frozen copy of src.core.recipe_arrays.rebuild_recipe_arrays in one
+# statement, the guard trigger only lets it through with the setting on
+FILL_ARRAYS_SQL = """
+SELECT set_config('core.recipe_arrays', 'on', true);
+UPDATE core_recipe r SET
+    tag_ids = coalesce((
+        SELECT array_agg(m.tag_id ORDER BY m.tag_id)
+        FROM core_recipe_tags m WHERE m.recipe_id = r.id
+    ), '{}'),
+    ingredient_ids = coalesce((
+        SELECT array_agg(m.ingredient_id ORDER BY m.ingredient_id)
+        FROM core_recipe_ingredients m WHERE m.recipe_id = r.id
+    ), '{}');
+SELECT set_config('core.recipe_arrays', 'off', true);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='recipe_tag_ids_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='recipe_ingredient_ids_idx'),
+        ),
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+        migrations.RunSQL(FILL_ARRAYS_SQL, migrations.RunSQL.noop),
+    ]
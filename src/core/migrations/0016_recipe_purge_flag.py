@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:35
+
+from django.db import migrations
+
+
+# Recipes whose M2M rows are deleted right before the recipes themselves
+# need no array update, src.core.deletion sets core.recipe_purge for them.
+PURGE_FLAG_SQL = """
+CREATE OR REPLACE FUNCTION core_recipe_m2m_arrays() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('core.recipe_purge', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_TABLE_NAME = 'core_recipe_tags' THEN
+        UPDATE core_recipe r SET
+            tag_ids = coalesce((
+                SELECT array_agg(m.tag_id ORDER BY m.tag_id)
+                FROM core_recipe_tags m WHERE m.recipe_id = r.id
+            ), '{}'),
+            updated_at = now()
+        WHERE r.id IN (SELECT recipe_id FROM changed_rows);
+    ELSE
+        UPDATE core_recipe r SET
+            ingredient_ids = coalesce((
+                SELECT array_agg(m.ingredient_id ORDER BY m.ingredient_id)
+                FROM core_recipe_ingredients m WHERE m.recipe_id = r.id
+            ), '{}'),
+            updated_at = now()
+        WHERE r.id IN (SELECT recipe_id FROM changed_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+NO_PURGE_FLAG_SQL = """
+CREATE OR REPLACE FUNCTION core_recipe_m2m_arrays() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'core_recipe_tags' THEN
+        UPDATE core_recipe r SET
+            tag_ids = coalesce((
+                SELECT array_agg(m.tag_id ORDER BY m.tag_id)
+                FROM core_recipe_tags m WHERE m.recipe_id = r.id
+            ), '{}'),
+            updated_at = now()
+        WHERE r.id IN (SELECT recipe_id FROM changed_rows);
+    ELSE
+        UPDATE core_recipe r SET
+            ingredient_ids = coalesce((
+                SELECT array_agg(m.ingredient_id ORDER BY m.ingredient_id)
+                FROM core_recipe_ingredients m WHERE m.recipe_id = r.id
+            ), '{}'),
+            updated_at = now()
+        WHERE r.id IN (SELECT recipe_id FROM changed_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(PURGE_FLAG_SQL, NO_PURGE_FLAG_SQL),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:12
+
+from django.db import migrations
+
+
+# Sync clients learn about a soft deleted recipe when it is flagged, the
+# purge removing the row later writes no second tombstone
+TRIGGERS_SQL = """
+CREATE TRIGGER core_recipe_flag_tombstone
+    AFTER UPDATE OF deleted_at ON core_recipe
+    FOR EACH ROW
+    WHEN (OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL)
+    EXECUTE FUNCTION core_write_tombstone('recipe');
+
+DROP TRIGGER core_recipe_tombstone ON core_recipe;
+CREATE TRIGGER core_recipe_tombstone AFTER DELETE ON core_recipe
+    FOR EACH ROW WHEN (OLD.deleted_at IS NULL)
+    EXECUTE FUNCTION core_write_tombstone('recipe');
+
+-- Recipes flagged before this migration
+INSERT INTO core_tombstone (user_id, model, object_id, change_id, deleted_at)
+SELECT user_id, 'recipe', id, pg_current_xact_id()::text::bigint, now()
+FROM core_recipe WHERE deleted_at IS NOT NULL;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER core_recipe_tombstone ON core_recipe;
+CREATE TRIGGER core_recipe_tombstone AFTER DELETE ON core_recipe
+    FOR EACH ROW EXECUTE FUNCTION core_write_tombstone('recipe');
+
+DROP TRIGGER core_recipe_flag_tombstone ON core_recipe;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RunSQL(TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
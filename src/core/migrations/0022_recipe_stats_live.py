@@ -0,0 +1,151 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:20
+
+from django.db import migrations
+
+
+# Soft deleted recipes leave the statistics when flagged: only rows with
+# deleted_at unset are counted, so flagging subtracts a recipe and the
+# purge deleting it later changes nothing.
+LIVE_STATS_SQL = """
+CREATE OR REPLACE FUNCTION core_recipe_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- No insert, the user may be being deleted
+        UPDATE core_recipestats s SET
+            recipe_count = s.recipe_count - d.n,
+            price_sum = s.price_sum - d.price,
+            time_sum = s.time_sum - d.time
+        FROM (
+            SELECT user_id, count(*) AS n, sum(price) AS price,
+                   sum(time_minutes) AS time
+            FROM old_rows WHERE deleted_at IS NULL GROUP BY user_id
+        ) d
+        WHERE s.user_id = d.user_id;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO core_recipestats (
+            user_id, recipe_count, price_sum, time_sum, tag_count,
+            ingredient_count
+        )
+        SELECT user_id, count(*), sum(price), sum(time_minutes), 0, 0
+        FROM new_rows WHERE deleted_at IS NULL GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            recipe_count = core_recipestats.recipe_count
+                + EXCLUDED.recipe_count,
+            price_sum = core_recipestats.price_sum + EXCLUDED.price_sum,
+            time_sum = core_recipestats.time_sum + EXCLUDED.time_sum;
+        RETURN NULL;
+    END IF;
+
+    -- Most updates leave user, price, time and deleted_at alone
+    INSERT INTO core_recipestats (
+        user_id, recipe_count, price_sum, time_sum, tag_count, ingredient_count
+    )
+    SELECT user_id, sum(n), sum(price), sum(time), 0, 0
+    FROM (
+        SELECT user_id, 1 AS n, price, time_minutes AS time
+        FROM new_rows WHERE deleted_at IS NULL
+        UNION ALL
+        SELECT user_id, -1, -price, -time_minutes
+        FROM old_rows WHERE deleted_at IS NULL
+    ) delta
+    GROUP BY user_id
+    HAVING sum(n) <> 0 OR sum(price) <> 0 OR sum(time) <> 0
+    ON CONFLICT (user_id) DO UPDATE SET
+        recipe_count = core_recipestats.recipe_count + EXCLUDED.recipe_count,
+        price_sum = core_recipestats.price_sum + EXCLUDED.price_sum,
+        time_sum = core_recipestats.time_sum + EXCLUDED.time_sum;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop the recipes flagged before this migration
+UPDATE core_recipestats s SET
+    recipe_count = s.recipe_count - d.n,
+    price_sum = s.price_sum - d.price,
+    time_sum = s.time_sum - d.time
+FROM (
+    SELECT user_id, count(*) AS n, sum(price) AS price,
+           sum(time_minutes) AS time
+    FROM core_recipe WHERE deleted_at IS NOT NULL GROUP BY user_id
+) d
+WHERE s.user_id = d.user_id;
+"""
+
+ALL_STATS_SQL = """
+CREATE OR REPLACE FUNCTION core_recipe_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- No insert, the user may be being deleted
+        UPDATE core_recipestats s SET
+            recipe_count = s.recipe_count - d.n,
+            price_sum = s.price_sum - d.price,
+            time_sum = s.time_sum - d.time
+        FROM (
+            SELECT user_id, count(*) AS n, sum(price) AS price,
+                   sum(time_minutes) AS time
+            FROM old_rows GROUP BY user_id
+        ) d
+        WHERE s.user_id = d.user_id;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO core_recipestats (
+            user_id, recipe_count, price_sum, time_sum, tag_count,
+            ingredient_count
+        )
+        SELECT user_id, count(*), sum(price), sum(time_minutes), 0, 0
+        FROM new_rows GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            recipe_count = core_recipestats.recipe_count
+                + EXCLUDED.recipe_count,
+            price_sum = core_recipestats.price_sum + EXCLUDED.price_sum,
+            time_sum = core_recipestats.time_sum + EXCLUDED.time_sum;
+        RETURN NULL;
+    END IF;
+
+    -- Most updates leave user, price and time alone
+    INSERT INTO core_recipestats (
+        user_id, recipe_count, price_sum, time_sum, tag_count, ingredient_count
+    )
+    SELECT user_id, sum(n), sum(price), sum(time), 0, 0
+    FROM (
+        SELECT user_id, 1 AS n, price, time_minutes AS time FROM new_rows
+        UNION ALL
+        SELECT user_id, -1, -price, -time_minutes FROM old_rows
+    ) delta
+    GROUP BY user_id
+    HAVING sum(n) <> 0 OR sum(price) <> 0 OR sum(time) <> 0
+    ON CONFLICT (user_id) DO UPDATE SET
+        recipe_count = core_recipestats.recipe_count + EXCLUDED.recipe_count,
+        price_sum = core_recipestats.price_sum + EXCLUDED.price_sum,
+        time_sum = core_recipestats.time_sum + EXCLUDED.time_sum;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+UPDATE core_recipestats s SET
+    recipe_count = s.recipe_count + d.n,
+    price_sum = s.price_sum + d.price,
+    time_sum = s.time_sum + d.time
+FROM (
+    SELECT user_id, count(*) AS n, sum(price) AS price,
+           sum(time_minutes) AS time
+    FROM core_recipe WHERE deleted_at IS NOT NULL GROUP BY user_id
+) d
+WHERE s.user_id = d.user_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_recipe_flag_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunSQL(LIVE_STATS_SQL, ALL_STATS_SQL),
+    ]
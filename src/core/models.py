@@ -2,7 +2,14 @@ import uuid
 import os
 
 from django.conf import settings
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
 
 from django.contrib.auth.models import (
   AbstractBaseUser,
@@ -41,6 +48,60 @@ class UserManager(BaseUserManager):
 
 
 
+class SyncedModel(models.Model):
+  """
+  Base for objects offered to delta sync.
+
+  `change_id` is set by a database trigger to the id of the last
+  transaction writing the row, including changes to recipe tags and
+  ingredients. Deletes leave a Tombstone, see migration 0011.
+  """
+  updated_at = models.DateTimeField(auto_now=True)
+  change_id = models.BigIntegerField(default=0, editable=False)
+
+  class Meta:
+    abstract = True
+
+
+class NameQuerySet(models.QuerySet):
+  """Lookups on the case insensitive (user, lower(trim(name))) key"""
+
+  def filter_name(self, name):
+    return self.alias(
+      name_key=Lower(Trim("name"))
+    ).filter(name_key=name.strip().lower())
+
+  def get_or_create_by_name(self, user, name):
+    """Return the user's object matching name, creating it if missing"""
+    name = name.strip()
+    try:
+      return self.filter(user=user).filter_name(name).get(), False
+    except self.model.DoesNotExist:
+      pass
+    try:
+      with transaction.atomic(using=self.db):
+        return self.create(user=user, name=name), True
+    except IntegrityError:
+      return self.filter(user=user).filter_name(name).get(), False
+
+
+class NamedModel(SyncedModel):
+  """Base for per-user objects identified by a case insensitive name"""
+  name = models.CharField(max_length=255)
+
+  objects = NameQuerySet.as_manager()
+
+  class Meta:
+    abstract = True
+
+  def save(self, *args, **kwargs):
+    self.name = self.name.strip()
+    super().save(*args, **kwargs)
+
+  def __str__(self):
+    return self.name
+
+
 class User(AbstractBaseUser, PermissionsMixin):
   """user in the system"""
 
@@ -48,13 +109,25 @@ class User(AbstractBaseUser, PermissionsMixin):
   name= models.CharField(max_length=255)
   is_active =models.BooleanField(default=True)
   is_staff = models.BooleanField(default=False)
+  # Bumped to revoke every token of the user, see src.core.authentication
+  token_version = models.PositiveIntegerField(default=0, editable=False)
 
   USERNAME_FIELD="email"
 
   objects = UserManager()
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+  """Soft deleted recipes stay until purged, see src.core.deletion"""
+
+  def live(self):
+    return self.filter(deleted_at__isnull=True)
+
+  def deleted(self):
+    return self.filter(deleted_at__isnull=False)
+
+
+class Recipe(SyncedModel):
   """ Recipe model """
   user = models.ForeignKey(
     settings.AUTH_USER_MODEL,
@@ -68,32 +141,235 @@ class Recipe(models.Model):
   tags = models.ManyToManyField('Tag')
   ingredients = models.ManyToManyField('Ingredient')
   image = models.ImageField(null=True, upload_to=recipe_image_file_path)
-  
+  # Copies of the tag and ingredient ids, owned by database triggers on the
+  # M2M tables, see migration 0014. Values written from Django are ignored.
+  tag_ids = ArrayField(
+    models.BigIntegerField(), default=list, blank=True, editable=False
+  )
+  ingredient_ids = ArrayField(
+    models.BigIntegerField(), default=list, blank=True, editable=False
+  )
+  search_vector = models.GeneratedField(
+    expression=(
+      SearchVector("title", weight="A", config="english")
+      + SearchVector("description", weight="B", config="english")
+    ),
+    output_field=SearchVectorField(),
+    db_persist=True,
+  )
+  deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+  objects = RecipeQuerySet.as_manager()
+
+  class Meta:
+    indexes = [
+      GinIndex(fields=["search_vector"], name="recipe_search_vector_idx"),
+      GinIndex(
+        fields=["title"],
+        opclasses=["gin_trgm_ops"],
+        name="recipe_title_trgm_idx",
+      ),
+      models.Index(
+        fields=["user", "change_id", "id"], name="recipe_user_change_idx"
+      ),
+      # List orderings, over live recipes only
+      models.Index(
+        fields=["user", "id"],
+        name="recipe_user_live_idx",
+        condition=Q(deleted_at__isnull=True),
+      ),
+      models.Index(
+        fields=["user", "time_minutes", "id"],
+        name="recipe_user_time_idx",
+        condition=Q(deleted_at__isnull=True),
+      ),
+      models.Index(
+        fields=["user", "price", "id"],
+        name="recipe_user_price_idx",
+        condition=Q(deleted_at__isnull=True),
+      ),
+      models.Index(
+        fields=["deleted_at"],
+        name="recipe_deleted_idx",
+        condition=Q(deleted_at__isnull=False),
+      ),
+      GinIndex(fields=["tag_ids"], name="recipe_tag_ids_idx"),
+      GinIndex(fields=["ingredient_ids"], name="recipe_ingredient_ids_idx"),
+    ]
 
   def __str__(self):
     return self.title
 
 
-class Tag(models.Model):
+class Tag(NamedModel):
   """Tag to be used for a recipe"""
   user = models.ForeignKey(
     settings.AUTH_USER_MODEL,
     on_delete=models.CASCADE
   )
-  name = models.CharField(max_length=255)
 
-  def __str__(self):
-    return self.name
+  class Meta:
+    indexes = [
+      models.Index(
+        F("user"),
+        OpClass(Lower("name"), name="text_pattern_ops"),
+        name="tag_user_lower_name_idx",
+      ),
+      models.Index(
+        fields=["user", "change_id", "id"], name="tag_user_change_idx"
+      ),
+      # Admin search across users, see src.core.lookups
+      GinIndex(
+        fields=["name"], opclasses=["gin_trgm_ops"], name="tag_name_trgm_idx"
+      ),
+    ]
+    constraints = [
+      models.UniqueConstraint(
+        F("user"),
+        Lower(Trim("name")),
+        name="tag_user_name_key",
+      ),
+    ]
 
 
 
-class Ingredient(models.Model):
+class Ingredient(NamedModel):
   """Ingredient to be used in a recipe"""
   user = models.ForeignKey(
     settings.AUTH_USER_MODEL,
     on_delete=models.CASCADE
   )
-  name= models.CharField(max_length=255)
+
+  class Meta:
+    indexes = [
+      models.Index(
+        F("user"),
+        OpClass(Lower("name"), name="text_pattern_ops"),
+        name="ingredient_user_lower_name_idx",
+      ),
+      models.Index(
+        fields=["user", "change_id", "id"], name="ingredient_user_change_idx"
+      ),
+      # Admin search across users, see src.core.lookups
+      GinIndex(
+        fields=["name"], opclasses=["gin_trgm_ops"], name="ingredient_name_trgm_idx"
+      ),
+    ]
+    constraints = [
+      models.UniqueConstraint(
+        F("user"),
+        Lower(Trim("name")),
+        name="ingredient_user_name_key",
+      ),
+    ]
+
+
+class Tombstone(models.Model):
+  """Deleted recipe, tag or ingredient, written by a database trigger"""
+  user = models.ForeignKey(
+    settings.AUTH_USER_MODEL,
+    on_delete=models.DO_NOTHING,
+    db_constraint=False,
+    related_name="+",
+  )
+  model = models.CharField(max_length=20)
+  object_id = models.BigIntegerField()
+  change_id = models.BigIntegerField()
+  deleted_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    indexes = [
+      models.Index(
+        fields=["user", "change_id", "id"], name="tombstone_user_change_idx"
+      ),
+    ]
+
+
+class RecipeStats(models.Model):
+  """
+  Per-user recipe totals.
+
+  Maintained by statement level database triggers on recipes, tags and
+  ingredients, see migration 0013. `rebuild_recipe_stats` recomputes them.
+  """
+  user = models.OneToOneField(
+    settings.AUTH_USER_MODEL,
+    on_delete=models.CASCADE,
+    primary_key=True,
+    related_name="recipe_stats",
+  )
+  recipe_count = models.IntegerField(default=0)
+  price_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+  time_sum = models.BigIntegerField(default=0)
+  tag_count = models.IntegerField(default=0)
+  ingredient_count = models.IntegerField(default=0)
+
+  @property
+  def average_price(self):
+    if not self.recipe_count:
+      return None
+    return self.price_sum / self.recipe_count
+
+  @property
+  def average_time_minutes(self):
+    if not self.recipe_count:
+      return None
+    return self.time_sum / self.recipe_count
+
+
+class Job(models.Model):
+  """
+  Deferred function call, run by `manage.py runworkers`.
+
+  A job is ready once `run_at` has passed. Claiming pushes `run_at` a
+  lease ahead, so a job whose worker died runs again, see src.core.jobs.
+  """
+  task = models.CharField(max_length=255)
+  args = models.JSONField(default=list, blank=True)
+  run_at = models.DateTimeField(default=timezone.now)
+  attempts = models.PositiveIntegerField(default=0)
+  max_attempts = models.PositiveIntegerField(default=5)
+  last_error = models.TextField(blank=True)
+  failed_at = models.DateTimeField(null=True, blank=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    indexes = [
+      models.Index(
+        fields=["run_at", "id"],
+        name="job_ready_idx",
+        condition=Q(failed_at__isnull=True),
+      ),
+    ]
 
   def __str__(self):
-    return self.name
+    return f"{self.task}{tuple(self.args)!r}"
+
+
+class IdempotencyKey(models.Model):
+  """
+  Outcome of a POST sent with an `Idempotency-Key` header, replayed when
+  the request is retried, see src.core.idempotency. `status_code` stays
+  empty while the first request runs.
+  """
+  user = models.ForeignKey(
+    settings.AUTH_USER_MODEL,
+    on_delete=models.CASCADE,
+    related_name="+",
+  )
+  key = models.CharField(max_length=255)
+  fingerprint = models.CharField(max_length=64)
+  status_code = models.PositiveSmallIntegerField(null=True)
+  response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+  created_at = models.DateTimeField(default=timezone.now)
+  expires_at = models.DateTimeField()
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(
+        fields=["user", "key"], name="idempotency_key_user_key"
+      ),
+    ]
+    indexes = [
+      models.Index(fields=["expires_at"], name="idempotency_key_expires_idx"),
+    ]
@@ -0,0 +1,84 @@
+"""
+Set based merging of tags and ingredients that differ only in case or
+surrounding whitespace
+"""
+from django.db import connection, transaction
+
+
+def _m2m_tables(model):
+  """Yield (table, source column, target column) for M2M rows to model"""
+  for rel in model._meta.related_objects:
+    if rel.many_to_many:
+      yield (
+        rel.through._meta.db_table,
+        rel.field.m2m_column_name(),
+        rel.field.m2m_reverse_name(),
+      )
+
+
+def merge_duplicate_names(model, batch_size=10000, dry_run=False,
+                          progress=None):
+  """
+  Merge rows of model sharing (user, lower(trim(name))).
+
+  The lowest id of each group is kept. M2M rows pointing at the others are
+  repointed with INSERT ... ON CONFLICT DO NOTHING, then the duplicates are
+  deleted, `batch_size` duplicates per transaction. Surrounding whitespace
+  is trimmed from the remaining names. Returns the number of merged rows.
+  """
+  table = model._meta.db_table
+  qn = connection.ops.quote_name
+  mapping = qn(f"{table}_merge")
+
+  with connection.cursor() as cursor:
+    cursor.execute(f"DROP TABLE IF EXISTS {mapping}")
+    cursor.execute(f"""
+      CREATE TEMPORARY TABLE {mapping} AS
+      SELECT id AS old_id, keep_id,
+             (row_number() OVER (ORDER BY id) - 1) / %s AS batch
+      FROM (
+        SELECT id, min(id) OVER (
+          PARTITION BY user_id, lower(btrim(name))
+        ) AS keep_id
+        FROM {qn(table)}
+      ) grouped
+      WHERE id <> keep_id
+    """, [batch_size])
+    cursor.execute(f"CREATE INDEX ON {mapping} (batch)")
+    cursor.execute(f"SELECT count(*), max(batch) FROM {mapping}")
+    total, last_batch = cursor.fetchone()
+
+    if dry_run:
+      cursor.execute(f"DROP TABLE {mapping}")
+      return total
+
+    done = 0
+    for batch in range(last_batch + 1 if total else 0):
+      with transaction.atomic():
+        for through, source, target in _m2m_tables(model):
+          cursor.execute(f"""
+            INSERT INTO {qn(through)} ({qn(source)}, {qn(target)})
+            SELECT DISTINCT t.{qn(source)}, m.keep_id
+            FROM {qn(through)} t
+            JOIN {mapping} m ON t.{qn(target)} = m.old_id
+            WHERE m.batch = %s
+            ON CONFLICT DO NOTHING
+          """, [batch])
+          cursor.execute(f"""
+            DELETE FROM {qn(through)} t USING {mapping} m
+            WHERE t.{qn(target)} = m.old_id AND m.batch = %s
+          """, [batch])
+        cursor.execute(f"""
+          DELETE FROM {qn(table)} o USING {mapping} m
+          WHERE o.id = m.old_id AND m.batch = %s
+        """, [batch])
+        done += cursor.rowcount
+      if progress:
+        progress(done, total)
+
+    cursor.execute(f"""
+      UPDATE {qn(table)} SET name = btrim(name) WHERE name <> btrim(name)
+    """)
+    cursor.execute(f"DROP TABLE {mapping}")
+
+  return total
@@ -0,0 +1,72 @@
+"""
+Recipe.tag_ids and Recipe.ingredient_ids, the denormalized copies of the
+recipe M2M tables
+
+Statement level triggers on the M2M tables recompute the arrays of the
+recipes a statement touched. A guard trigger on core_recipe discards array
+values written by anything else, unless the transaction sets
+`core.recipe_arrays` to on as `rebuild_recipe_arrays` does.
+"""
+from django.db import connection, transaction
+
+
+# (array column, through table, target column)
+ARRAYS = (
+  ("tag_ids", "core_recipe_tags", "tag_id"),
+  ("ingredient_ids", "core_recipe_ingredients", "ingredient_id"),
+)
+
+
+def expected_sql(column, through, target):
+  """SQL expression of the sorted ids an array should hold for recipe r"""
+  return f"""coalesce((
+    SELECT array_agg(m.{target} ORDER BY m.{target})
+    FROM {through} m WHERE m.recipe_id = r.id
+  ), '{{}}')"""
+
+
+def _allow_writes(cursor, allow=True):
+  cursor.execute(
+    "SELECT set_config('core.recipe_arrays', %s, true)",
+    ["on" if allow else "off"],
+  )
+
+
+def find_inconsistent_recipes():
+  """Return the ids of recipes whose arrays disagree with the M2M tables"""
+  mismatch = " OR ".join(
+    f"r.{column} IS DISTINCT FROM {expected_sql(column, through, target)}"
+    for column, through, target in ARRAYS
+  )
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f"SELECT r.id FROM core_recipe r WHERE {mismatch} ORDER BY r.id"
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def rebuild_recipe_arrays(recipe_ids=None, batch_size=10000):
+  """
+  Recompute the arrays of recipe_ids, or of every recipe, `batch_size`
+  recipes per transaction. Returns the number of updated recipes.
+  """
+  assignments = ", ".join(
+    f"{column} = {expected_sql(column, through, target)}"
+    for column, through, target in ARRAYS
+  )
+  if recipe_ids is None:
+    with connection.cursor() as cursor:
+      cursor.execute("SELECT id FROM core_recipe ORDER BY id")
+      recipe_ids = [row[0] for row in cursor.fetchall()]
+
+  updated = 0
+  for start in range(0, len(recipe_ids), batch_size):
+    with transaction.atomic(), connection.cursor() as cursor:
+      _allow_writes(cursor)
+      cursor.execute(
+        f"UPDATE core_recipe r SET {assignments} WHERE r.id = ANY(%s)",
+        [recipe_ids[start:start + batch_size]],
+      )
+      updated += cursor.rowcount
+      _allow_writes(cursor, False)
+  return updated
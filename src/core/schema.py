@@ -0,0 +1,140 @@
+"""
+OpenAPI schema served from memory
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import translation
+
+from rest_framework.settings import api_settings
+
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+
+logger = logging.getLogger(__name__)
+
+_schemas = {}
+_responses = {}
+
+
+def generate_schema(request=None, lang=None, version=None):
+  """Introspect the url conf and return the schema dictionary"""
+  generator_class = spectacular_settings.DEFAULT_GENERATOR_CLASS
+  generator = generator_class(api_version=version)
+  start = time.perf_counter()
+  if lang:
+    with translation.override(lang):
+      schema = generator.get_schema(
+        request=request, public=spectacular_settings.SERVE_PUBLIC
+      )
+  else:
+    schema = generator.get_schema(
+      request=request, public=spectacular_settings.SERVE_PUBLIC
+    )
+  logger.info(
+    "Generated OpenAPI schema in %.1fms", (time.perf_counter() - start) * 1000
+  )
+  return schema
+
+
+def load_schema_file(path=None):
+  """Return the schema written by `build_schema`, or None if missing"""
+  path = path or settings.SPECTACULAR_SCHEMA_FILE
+  if not path or not os.path.exists(path):
+    return None
+  start = time.perf_counter()
+  with open(path) as fh:
+    schema = json.load(fh)
+  logger.info(
+    "Loaded OpenAPI schema from %s in %.1fms",
+    path, (time.perf_counter() - start) * 1000,
+  )
+  return schema
+
+
+def get_schema(request=None, lang=None, version=None):
+  """Return the schema, generating it at most once per process"""
+  key = (lang, version)
+  if key not in _schemas:
+    schema = None
+    if key == (None, None):
+      schema = load_schema_file()
+    if schema is None:
+      schema = generate_schema(request=request, lang=lang, version=version)
+    _schemas[key] = schema
+  return _schemas[key]
+
+
+def etag_matches(if_none_match, etag):
+  """
+  Return True when an If-None-Match header matches etag or is `*`.
+  Comparison is weak, compression turns the ETag weak.
+  """
+  tags = {
+    tag.strip().removeprefix("W/")
+    for tag in if_none_match.split(",") if tag.strip()
+  }
+  return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def _supported_language(lang):
+  """Return the configured language matching lang, or None"""
+  if not lang or not settings.USE_I18N:
+    return None
+  try:
+    return translation.get_supported_language_variant(lang)
+  except LookupError:
+    return None
+
+
+def clear_schema_cache():
+  """Drop every cached schema and rendered response"""
+  _schemas.clear()
+  _responses.clear()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+  """
+  Serve the OpenAPI schema from memory.
+
+  The schema is read from `SPECTACULAR_SCHEMA_FILE` when it exists, and
+  generated on the first request otherwise. Each rendered format is kept
+  along with its ETag so repeated requests skip introspection and
+  rendering.
+  """
+
+  def _get_schema_response(self, request):
+    version = self.api_version or request.version
+    if not version:
+      # Without a versioning class the parameter is not validated
+      version = self._get_version_parameter(request)
+      if version not in (api_settings.ALLOWED_VERSIONS or ()):
+        version = None
+    # Cache keys only take configured values, not whatever clients send
+    lang = _supported_language(request.GET.get("lang"))
+    renderer, media_type = self.perform_content_negotiation(request)
+    key = (lang, version, media_type)
+
+    if key not in _responses:
+      schema = get_schema(request=request, lang=lang, version=version)
+      content = renderer.render(schema, media_type, {"request": request})
+      etag = '"{}"'.format(hashlib.sha256(content).hexdigest()[:32])
+      _responses[key] = (content, etag)
+
+    content, etag = _responses[key]
+    if etag_matches(request.headers.get("If-None-Match", ""), etag):
+      response = HttpResponseNotModified()
+    else:
+      response = HttpResponse(content, content_type=media_type)
+      response["Content-Disposition"] = "inline; filename=\"{}\"".format(
+        self._get_filename(request, version)
+      )
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
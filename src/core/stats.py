@@ -0,0 +1,53 @@
+"""
+Per-user recipe statistics kept in core_recipestats
+"""
+from django.db import connection, transaction
+
+
+REBUILD_SQL = """
+  INSERT INTO core_recipestats (
+    user_id, recipe_count, price_sum, time_sum, tag_count, ingredient_count
+  )
+  SELECT u.id,
+         coalesce(r.recipe_count, 0), coalesce(r.price_sum, 0),
+         coalesce(r.time_sum, 0), coalesce(t.tag_count, 0),
+         coalesce(i.ingredient_count, 0)
+  FROM core_user u
+  LEFT JOIN (
+    SELECT user_id, count(*) AS recipe_count, sum(price) AS price_sum,
+           sum(time_minutes) AS time_sum
+    FROM core_recipe WHERE deleted_at IS NULL GROUP BY user_id
+  ) r ON r.user_id = u.id
+  LEFT JOIN (
+    SELECT user_id, count(*) AS tag_count FROM core_tag GROUP BY user_id
+  ) t ON t.user_id = u.id
+  LEFT JOIN (
+    SELECT user_id, count(*) AS ingredient_count
+    FROM core_ingredient GROUP BY user_id
+  ) i ON i.user_id = u.id
+  {where}
+  ON CONFLICT (user_id) DO UPDATE SET
+    recipe_count = EXCLUDED.recipe_count,
+    price_sum = EXCLUDED.price_sum,
+    time_sum = EXCLUDED.time_sum,
+    tag_count = EXCLUDED.tag_count,
+    ingredient_count = EXCLUDED.ingredient_count
+"""
+
+
+def rebuild_recipe_stats(user_ids=None):
+  """
+  Recompute the statistics of every user, or of user_ids, with one set
+  based statement. Writes to the counted tables wait until it finishes so
+  no trigger delta is lost. Returns the number of rows written.
+  """
+  where, params = "", []
+  if user_ids is not None:
+    where, params = "WHERE u.id = ANY(%s)", [list(user_ids)]
+
+  with transaction.atomic(), connection.cursor() as cursor:
+    cursor.execute(
+      "LOCK TABLE core_recipe, core_tag, core_ingredient IN SHARE MODE"
+    )
+    cursor.execute(REBUILD_SQL.format(where=where), params)
+    return cursor.rowcount
@@ -0,0 +1,144 @@
+"""Tests for expiring and signed API tokens"""
+from datetime import timedelta
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+TOKEN_URL = reverse("user:token")
+REFRESH_URL = reverse("user:token-refresh")
+REVOKE_URL = reverse("user:token-revoke")
+ME_URL = reverse("user:me")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+  cache.clear()
+  yield
+  cache.clear()
+
+
+@pytest.fixture
+def user(db):
+  return get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123", name="Test"
+  )
+
+
+def login():
+  res = APIClient().post(
+    TOKEN_URL, {"email": "user@example.com", "password": "testpass123"}
+  )
+  assert res.status_code == status.HTTP_200_OK
+  return res.data
+
+
+def client_for(token):
+  client = APIClient()
+  client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+  return client
+
+
+def age_token(key, seconds):
+  Token.objects.filter(key=key).update(
+    created=timezone.now() - timedelta(seconds=seconds)
+  )
+
+
+@override_settings(AUTH_TOKEN_TTL=600, AUTH_TOKEN_REFRESH_INTERVAL=60)
+def test_database_token_slides_and_expires(user):
+  key = login()["token"]
+  client = client_for(key)
+
+  age_token(key, 300)
+  assert client.get(ME_URL).status_code == status.HTTP_200_OK
+  # Use moved the expiry forward
+  assert Token.objects.get(key=key).created > (
+    timezone.now() - timedelta(seconds=60)
+  )
+
+  age_token(key, 600)
+  assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+  # Logging in again replaces the expired token
+  assert login()["token"] != key
+
+
+def test_refresh_rotates_database_token(user):
+  key = login()["token"]
+
+  res = client_for(key).post(REFRESH_URL)
+
+  assert res.status_code == status.HTTP_200_OK
+  assert res.data["token"] != key
+  assert client_for(key).get(ME_URL).status_code == (
+    status.HTTP_401_UNAUTHORIZED
+  )
+  assert client_for(res.data["token"]).get(ME_URL).status_code == (
+    status.HTTP_200_OK
+  )
+
+
+@override_settings(AUTH_SIGNED_TOKENS=True)
+def test_signed_token_authenticates_without_queries(
+  user, django_assert_num_queries
+):
+  token = login()["token"]
+  client = client_for(token)
+  assert client.get(RECIPES_URL).status_code == status.HTTP_200_OK
+
+  # Only the recipe list query once the token version is cached
+  with django_assert_num_queries(1):
+    assert client.get(RECIPES_URL).status_code == status.HTTP_200_OK
+
+  assert client.get(ME_URL).data["email"] == "user@example.com"
+
+
+@override_settings(AUTH_SIGNED_TOKENS=True, AUTH_TOKEN_TTL=600)
+def test_signed_token_rejects_tampering_and_expiry(user):
+  token = login()["token"]
+  user_id, rest = token.split(":", 1)
+
+  forged = client_for(f"{int(user_id) + 1}:{rest}")
+  assert forged.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
+
+  with override_settings(AUTH_TOKEN_TTL=-1):
+    assert client_for(token).get(ME_URL).status_code == (
+      status.HTTP_401_UNAUTHORIZED
+    )
+
+
+@pytest.mark.parametrize("signed", [False, True])
+def test_revoke_invalidates_tokens(
+  user, signed, django_capture_on_commit_callbacks
+):
+  with override_settings(AUTH_SIGNED_TOKENS=signed):
+    token = login()["token"]
+    client = client_for(token)
+    assert client.get(ME_URL).status_code == status.HTTP_200_OK
+
+    with django_capture_on_commit_callbacks(execute=True):
+      res = client.post(REVOKE_URL)
+    assert res.status_code == status.HTTP_204_NO_CONTENT
+
+    assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
+    assert login()["token"] != token
+
+
+def test_password_change_revokes_tokens(user):
+  client = client_for(login()["token"])
+
+  res = client.patch(ME_URL, {"password": "newpass123"})
+
+  assert res.status_code == status.HTTP_200_OK
+  assert client.get(ME_URL).status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,122 @@
+"""Tests for the batch endpoint"""
+from decimal import Decimal
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from src.core.models import (Recipe, Tag)
+
+
+BATCH_URL = reverse("api-batch")
+ME_URL = reverse("user:me")
+TAGS_URL = reverse("recipe:tag-list")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+@pytest.fixture
+def user_cl(db):
+  user = get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123", name="Test"
+  )
+  recipe = Recipe.objects.create(
+    user=user, title="Soup", time_minutes=10, price=Decimal("2.50")
+  )
+  recipe.tags.add(Tag.objects.create(user=user, name="Vegan"))
+  return user
+
+
+@pytest.fixture
+def auth_client(user_cl):
+  client = APIClient()
+  token = Token.objects.create(user=user_cl)
+  client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+  return client
+
+
+def batch(client, *paths, **options):
+  return client.post(
+    BATCH_URL,
+    {"requests": [{"path": path} for path in paths], **options},
+    format="json",
+  )
+
+
+def test_batch_requires_auth(db):
+  response = batch(APIClient(), ME_URL)
+
+  assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_batch_returns_every_response_in_order(auth_client):
+  response = batch(
+    auth_client, ME_URL, f"{RECIPES_URL}?ordering=price", TAGS_URL
+  )
+
+  assert response.status_code == status.HTTP_200_OK
+  me, recipes, tags = response.data["responses"]
+  assert me["status"] == 200
+  assert me["body"]["email"] == "user@example.com"
+  assert recipes["path"] == f"{RECIPES_URL}?ordering=price"
+  assert [recipe["title"] for recipe in recipes["body"]] == ["Soup"]
+  assert [tag["name"] for tag in tags["body"]] == ["Vegan"]
+
+
+def test_batch_matches_separate_requests(auth_client):
+  paths = [ME_URL, TAGS_URL, RECIPES_URL, f"{RECIPES_URL}facets/"]
+
+  response = batch(auth_client, *paths)
+
+  for path, result in zip(paths, response.data["responses"]):
+    separate = auth_client.get(path)
+    assert result["status"] == separate.status_code
+    assert result["body"] == separate.data
+
+
+def test_batch_authenticates_once(
+  auth_client, django_assert_num_queries
+):
+  # The token is looked up for the batch only, not per request
+  with django_assert_num_queries(3):
+    batch(auth_client, TAGS_URL, TAGS_URL)
+
+
+def test_batch_rejects_unknown_and_non_api_paths(auth_client):
+  response = batch(
+    auth_client,
+    "/api/missing/",
+    reverse("admin:index"),
+    BATCH_URL,
+    "https://example.com/api/user/me/",
+    reverse("recipe:recipe-detail", args=[0]),
+  )
+
+  assert [
+    result["status"] for result in response.data["responses"]
+  ] == [404] * 5
+
+
+@override_settings(BATCH_MAX_REQUESTS=2)
+def test_batch_size_is_limited(auth_client):
+  response = batch(auth_client, ME_URL, ME_URL, ME_URL)
+
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+  assert "requests" in response.data
+
+
+def test_parallel_batch(transactional_db, user_cl, auth_client):
+  response = batch(
+    auth_client, ME_URL, TAGS_URL, RECIPES_URL, "/api/missing/",
+    parallel=True,
+  )
+
+  assert [
+    result["status"] for result in response.data["responses"]
+  ] == [200, 200, 200, 404]
+  assert response.data["responses"][1]["body"][0]["name"] == "Vegan"
@@ -0,0 +1,344 @@
+"""Tests for the management commands"""
+import json
+import os
+from io import StringIO
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from src.core.models import (Recipe, RecipeStats, Tag, Ingredient)
+
+
+User = get_user_model()
+
+
+def seed(**options):
+  defaults = {"users": 2, "recipes": 5, "tags": 4, "ingredients": 6,
+              "seed": 1}
+  defaults.update(options)
+  call_command("seed_data", stdout=open(os.devnull, "w"), **defaults)
+
+
+@pytest.mark.django_db
+def test_seed_data_creates_objects():
+  seed()
+
+  assert User.objects.count() == 2
+  assert Tag.objects.count() == 8
+  assert Ingredient.objects.count() == 12
+  assert Recipe.objects.exists()
+  assert Recipe.ingredients.through.objects.exists()
+  assert User.objects.first().check_password("testpass123")
+
+
+@pytest.mark.django_db
+def test_seed_data_is_deterministic():
+  seed()
+  first = list(Recipe.objects.order_by("id").values_list("title", "price"))
+  Recipe.objects.all().delete()
+  User.objects.all().delete()
+
+  seed()
+  second = list(Recipe.objects.order_by("id").values_list("title", "price"))
+  assert first == second
+
+
+@pytest.mark.django_db
+def test_benchmark_api_reports_every_endpoint(tmp_path):
+  seed(users=1)
+  baseline = tmp_path / "baseline.json"
+
+  call_command(
+    "benchmark_api", iterations=2, warmup=0,
+    save_baseline=str(baseline), stdout=open(os.devnull, "w"),
+  )
+
+  results = json.loads(baseline.read_text())
+  assert {"user-me", "recipe-list", "recipe-upload-image",
+          "tag-delete", "ingredient-list", "recipe-bulk-delete",
+          "user-token-refresh", "user-token-revoke",
+          "user-me-delete"} <= set(results)
+  for result in results.values():
+    assert result["status"] < 400
+    assert result["queries"] > 0
+
+  assert Recipe.objects.filter(title="Bench").count() == 0
+  assert not User.objects.filter(email__startswith="bench-").exists()
+
+
+@pytest.mark.django_db
+def test_benchmark_api_detects_regressions(tmp_path):
+  seed(users=1)
+  baseline = tmp_path / "baseline.json"
+  baseline.write_text(json.dumps({
+    "user-me": {"queries": 0, "p95_ms": 1000.0},
+  }))
+
+  with pytest.raises(CommandError):
+    call_command(
+      "benchmark_api", iterations=1, warmup=0, only="user-me",
+      compare=str(baseline), stdout=open(os.devnull, "w"),
+    )
+
+
+@pytest.mark.django_db
+def test_merge_duplicate_names():
+  from django.db import connection
+
+  # Legacy duplicates predating the unique constraint
+  with connection.cursor() as cursor:
+    cursor.execute(
+      "DROP INDEX ingredient_user_name_key"
+    )
+
+  user = User.objects.create_user(email="user@example.com", password="pass")
+  keep = Ingredient.objects.create(user=user, name="Tomato")
+  recipe1 = Recipe.objects.create(
+    user=user, title="Soup", time_minutes=5, price="1.00"
+  )
+  recipe2 = Recipe.objects.create(
+    user=user, title="Salad", time_minutes=5, price="1.00"
+  )
+  recipe1.ingredients.add(keep)
+
+  dupe1 = Ingredient.objects.create(user=user, name="tomato ")
+  dupe2 = Ingredient.objects.create(user=user, name="TOMATO")
+  other = Ingredient.objects.create(user=user, name="Basil")
+  recipe1.ingredients.add(dupe1)
+  recipe2.ingredients.add(dupe2, other)
+
+  call_command(
+    "merge_duplicate_names", model=["ingredient"], batch_size=1,
+    stdout=open(os.devnull, "w"),
+  )
+
+  assert list(
+    Ingredient.objects.order_by("id").values_list("id", flat=True)
+  ) == [keep.id, other.id]
+  assert list(recipe1.ingredients.all()) == [keep]
+  assert set(recipe2.ingredients.all()) == {keep, other}
+
+
+@pytest.mark.django_db
+def test_merge_duplicate_names_trims_without_duplicates():
+  user = User.objects.create_user(email="user@example.com", password="pass")
+  Ingredient.objects.create(user=user, name=" Tomato ")
+
+  call_command(
+    "merge_duplicate_names", model=["ingredient"],
+    stdout=open(os.devnull, "w"),
+  )
+
+  assert list(Ingredient.objects.values_list("name", flat=True)) == ["Tomato"]
+
+
+@pytest.mark.django_db
+def test_rebuild_recipe_stats():
+  seed()
+  expected = list(RecipeStats.objects.order_by("user_id").values())
+  RecipeStats.objects.update(recipe_count=0, price_sum=0, tag_count=0)
+
+  call_command("rebuild_recipe_stats", stdout=open(os.devnull, "w"))
+
+  assert list(RecipeStats.objects.order_by("user_id").values()) == expected
+  for stats in RecipeStats.objects.all():
+    assert stats.recipe_count == Recipe.objects.filter(
+      user_id=stats.user_id
+    ).count()
+
+
+@pytest.mark.django_db
+def test_check_recipe_arrays():
+  from django.db import connection
+
+  seed()
+  out = open(os.devnull, "w")
+  call_command("check_recipe_arrays", stdout=out)
+
+  recipe = Recipe.objects.exclude(tag_ids=[]).first()
+  with connection.cursor() as cursor:
+    cursor.execute(
+      "SELECT set_config('core.recipe_arrays', 'on', true)"
+    )
+    cursor.execute(
+      "UPDATE core_recipe SET tag_ids = '{}' WHERE id = %s", [recipe.id]
+    )
+
+  with pytest.raises(CommandError, match="1 inconsistent recipes"):
+    call_command("check_recipe_arrays", stdout=out)
+
+  call_command("check_recipe_arrays", fix=True, stdout=out)
+  recipe.refresh_from_db()
+  assert recipe.tag_ids == sorted(recipe.tags.values_list("id", flat=True))
+
+
+@override_settings(
+  PASSWORD_HASHERS=[
+    "src.core.hashers.ScryptPasswordHasher",
+    "django.contrib.auth.hashers.MD5PasswordHasher",
+  ],
+  PASSWORD_SCRYPT_WORK_FACTOR=2**10,
+)
+def test_benchmark_hashers():
+  out = StringIO()
+
+  call_command("benchmark_hashers", repeat=1, stdout=out)
+
+  lines = out.getvalue().splitlines()
+  assert lines[0].startswith("scrypt (preferred)")
+  assert "work factor=1024" in lines[0]
+  assert lines[1].startswith("md5")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("workers", [0, 2])
+def test_import_users_csv(tmp_path, workers):
+  User.objects.create_user(email="existing@example.com", password="old")
+  path = tmp_path / "users.csv"
+  path.write_text(
+    "email,name,password\n"
+    "new@example.com,New User,secret123\n"
+    "existing@example.com,Existing,other\n"
+    ",No Email,secret\n"
+    "nopassword@example.com,No Password,\n"
+    "new@example.com,Duplicate,secret\n"
+  )
+
+  call_command(
+    "import_users", str(path), workers=workers, batch_size=2,
+    stdout=open(os.devnull, "w"), stderr=open(os.devnull, "w"),
+  )
+
+  assert User.objects.count() == 3
+  new = User.objects.get(email="new@example.com")
+  assert new.name == "New User"
+  assert new.check_password("secret123")
+  assert not User.objects.get(
+    email="nopassword@example.com"
+  ).has_usable_password()
+  assert User.objects.get(email="existing@example.com").check_password("old")
+
+
+@pytest.mark.django_db
+def test_import_users_ndjson_with_password_hashes(tmp_path):
+  from django.contrib.auth.hashers import make_password
+
+  path = tmp_path / "users.ndjson"
+  path.write_text("\n".join([
+    json.dumps({
+      "email": "hashed@Example.com", "name": "Hashed",
+      "password_hash": make_password("secret123"),
+    }),
+    json.dumps({"email": "bad@example.com", "password_hash": "plain"}),
+    "not json",
+  ]))
+  err = StringIO()
+
+  call_command(
+    "import_users", str(path), workers=0,
+    stdout=open(os.devnull, "w"), stderr=err,
+  )
+
+  assert list(User.objects.values_list("email", flat=True)) == [
+    "hashed@example.com"
+  ]
+  assert User.objects.get().check_password("secret123")
+  assert "line 2" in err.getvalue() and "line 3" in err.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_users_skips_rows_failing_field_validation(tmp_path):
+  path = tmp_path / "users.ndjson"
+  path.write_text("\n".join(json.dumps(row) for row in [
+    {"email": "ok@example.com", "name": "Ok", "password": "secret123"},
+    {"email": 42, "name": "Number"},
+    {"email": "not-an-email", "name": "Bad"},
+    {"email": "x" * 150 + "@example.com", "name": "Long email"},
+    {"email": "longname@example.com", "name": "x" * 256},
+    {"email": "list@example.com", "name": ["Not", "a", "string"]},
+  ]))
+  out, err = StringIO(), StringIO()
+
+  call_command("import_users", str(path), workers=0, stdout=out, stderr=err)
+
+  assert list(User.objects.values_list("email", flat=True)) == [
+    "ok@example.com"
+  ]
+  assert "Created 1 users, skipped 0 existing and 5 invalid rows" in (
+    out.getvalue()
+  )
+
+
+@pytest.mark.django_db
+def test_import_users_counts_emails_taken_concurrently():
+  from src.core.management.commands.import_users import Command
+
+  # Inserted by another import after this one checked for existing emails
+  User.objects.create_user(email="second@example.com", password="x")
+
+  created, existing = Command()._insert([
+    User(email="first@example.com", name="First"),
+    User(email="second@example.com", name="Second"),
+  ])
+
+  assert (created, existing) == (1, 1)
+  assert User.objects.get(email="second@example.com").name == ""
+
+
+@pytest.mark.django_db
+def test_purge_recipes():
+  seed()
+  deleted = list(Recipe.objects.order_by("id")[:3])
+  Recipe.objects.filter(pk__in=[r.pk for r in deleted]).update(
+    deleted_at=timezone.now()
+  )
+  remaining = Recipe.objects.live().count()
+
+  out = StringIO()
+  call_command("purge_recipes", batch_size=2, stdout=out)
+
+  assert "Purged 3 recipes" in out.getvalue()
+  assert not Recipe.objects.deleted().exists()
+  assert Recipe.objects.count() == remaining
+
+
+@pytest.mark.django_db
+def test_delete_users(tmp_path, django_capture_on_commit_callbacks):
+  from django.core.files.base import ContentFile
+  from django.core.files.storage import default_storage
+
+  from src.core.deletion import wait_for_files
+  from src.core.models import Tombstone
+
+  seed(users=3)
+  user, other = User.objects.order_by("id")[:2]
+  with override_settings(MEDIA_ROOT=tmp_path):
+    image = default_storage.save("uploads/recipe/a.jpg", ContentFile(b"x"))
+    Recipe.objects.filter(
+      pk=Recipe.objects.filter(user=user).first().pk
+    ).update(image=image)
+    Tag.objects.filter(user=user).first().delete()
+    recipes = Recipe.objects.filter(user=user).count()
+    other_recipes = Recipe.objects.filter(user=other).count()
+
+    out = StringIO()
+    with django_capture_on_commit_callbacks(execute=True):
+      call_command("delete_users", user.email, batch_size=2, stdout=out)
+
+    assert f"recipes {recipes}/{recipes}" in out.getvalue()
+    # The test transaction delays the file deletion until here
+    wait_for_files()
+    assert not default_storage.exists(image)
+  assert not User.objects.filter(pk=user.pk).exists()
+  for model in (Recipe, Tag, Ingredient, Tombstone, RecipeStats):
+    assert not model.objects.filter(user_id=user.pk).exists()
+  assert Recipe.objects.filter(user=other).count() == other_recipes
+  assert RecipeStats.objects.get(user=other).recipe_count == other_recipes
+
+  with pytest.raises(CommandError):
+    call_command("delete_users", user.email, stdout=out)
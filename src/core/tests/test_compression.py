@@ -0,0 +1,103 @@
+"""Tests for response compression"""
+import gzip
+import json
+
+import pytest
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from src.core import compression
+from src.core.middleware import CompressionMiddleware
+
+
+PAYLOAD = json.dumps(
+  [{"id": i, "title": "Sample recipe", "tags": []} for i in range(200)]
+).encode()
+
+
+def process(response, accept_encoding="gzip"):
+  request = RequestFactory().get(
+    "/api/recipe/recipes/", HTTP_ACCEPT_ENCODING=accept_encoding
+  )
+  return CompressionMiddleware(lambda r: response)(request)
+
+
+def json_response(content=PAYLOAD):
+  return HttpResponse(content, content_type="application/json")
+
+
+@pytest.mark.parametrize("header, expected", [
+  ("gzip", "gzip"),
+  ("gzip, br", "br"),
+  ("gzip, br, zstd", "zstd"),
+  ("br;q=0.5, gzip", "gzip"),
+  ("*", "zstd"),
+  ("gzip;q=0", None),
+  ("identity", None),
+  ("", None),
+])
+def test_select_encoding(header, expected):
+  if expected and expected not in compression.CODECS:
+    pytest.skip(f"{expected} support is not installed")
+  assert compression.select_encoding(header) == expected
+
+
+def test_json_response_compressed():
+  response = process(json_response())
+
+  assert response["Content-Encoding"] == "gzip"
+  assert response["Vary"] == "Accept-Encoding"
+  assert gzip.decompress(response.content) == PAYLOAD
+  assert int(response["Content-Length"]) == len(response.content)
+
+
+def test_small_response_not_compressed(settings):
+  response = process(json_response(PAYLOAD[:settings.COMPRESSION_MIN_SIZE - 1]))
+
+  assert not response.has_header("Content-Encoding")
+
+
+def test_non_json_response_not_compressed():
+  response = process(HttpResponse(PAYLOAD, content_type="text/html"))
+
+  assert not response.has_header("Content-Encoding")
+
+
+def test_compression_level_setting(settings):
+  # The gzip XFL header byte records the fastest (4) and best (2) levels
+  settings.COMPRESSION_LEVELS = {**settings.COMPRESSION_LEVELS, "gzip": 1}
+  fast = process(json_response()).content
+  settings.COMPRESSION_LEVELS = {**settings.COMPRESSION_LEVELS, "gzip": 9}
+  best = process(json_response()).content
+
+  assert fast[8] == 4
+  assert best[8] == 2
+
+
+def test_etag_weakened():
+  response = json_response()
+  response["ETag"] = '"abc"'
+
+  response = process(response)
+
+  assert response["ETag"] == 'W/"abc"'
+
+
+@pytest.mark.parametrize("encoding", sorted(compression.CODECS))
+def test_streaming_response_compressed(encoding):
+  chunks = [PAYLOAD[i:i + 500] for i in range(0, len(PAYLOAD), 500)]
+  response = process(
+    StreamingHttpResponse(iter(chunks), content_type="application/json"),
+    accept_encoding=encoding,
+  )
+
+  assert response["Content-Encoding"] == encoding
+  content = b"".join(response.streaming_content)
+  if encoding == "gzip":
+    assert gzip.decompress(content) == PAYLOAD
+  elif encoding == "br":
+    assert compression.brotli.decompress(content) == PAYLOAD
+  else:
+    decompressor = compression.zstandard.ZstdDecompressor().decompressobj()
+    assert decompressor.decompress(content) == PAYLOAD
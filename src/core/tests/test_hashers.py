@@ -0,0 +1,62 @@
+"""Tests for the settings driven password hashers"""
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+TOKEN_URL = reverse("user:token")
+
+PBKDF2 = "src.core.hashers.PBKDF2PasswordHasher"
+SCRYPT = "src.core.hashers.ScryptPasswordHasher"
+
+
+def login(email, password):
+  return APIClient().post(TOKEN_URL, {"email": email, "password": password})
+
+
+@pytest.mark.django_db
+@override_settings(PASSWORD_HASHERS=[PBKDF2], PASSWORD_PBKDF2_ITERATIONS=1000)
+def test_cost_change_rehashes_on_login():
+  user = get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123"
+  )
+  assert user.password.startswith("pbkdf2_sha256$1000$")
+
+  with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+    res = login("user@example.com", "testpass123")
+
+  assert res.status_code == status.HTTP_200_OK
+  user.refresh_from_db()
+  assert user.password.startswith("pbkdf2_sha256$2000$")
+
+
+@pytest.mark.django_db
+@override_settings(
+  PASSWORD_HASHERS=[PBKDF2, SCRYPT],
+  PASSWORD_PBKDF2_ITERATIONS=1000,
+  PASSWORD_SCRYPT_WORK_FACTOR=2**10,
+)
+def test_hasher_change_rehashes_on_login():
+  user = get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123"
+  )
+
+  with override_settings(PASSWORD_HASHERS=[SCRYPT, PBKDF2]):
+    assert login("user@example.com", "wrong").status_code == (
+      status.HTTP_400_BAD_REQUEST
+    )
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$")
+
+    res = login("user@example.com", "testpass123")
+
+  assert res.status_code == status.HTTP_200_OK
+  user.refresh_from_db()
+  assert user.password.startswith("scrypt$1024$")
+  with override_settings(PASSWORD_HASHERS=[SCRYPT]):
+    assert user.check_password("testpass123")
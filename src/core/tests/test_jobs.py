@@ -0,0 +1,196 @@
+"""Tests for the database job queue"""
+import os
+import signal
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import override_settings
+from django.utils import timezone
+
+from src.core import jobs
+from src.core.models import Job
+
+
+calls = []
+calls_lock = threading.Lock()
+
+
+def record(value):
+  with calls_lock:
+    calls.append(value)
+
+
+def fail(value):
+  raise RuntimeError(value)
+
+
+slow_started = threading.Event()
+slow_release = threading.Event()
+
+
+def slow(value):
+  slow_started.set()
+  slow_release.wait(10)
+  record(value)
+
+
+@pytest.fixture(autouse=True)
+def queued(settings):
+  settings.JOBS_EAGER = False
+  calls.clear()
+  slow_started.clear()
+  slow_release.clear()
+  yield
+  calls.clear()
+
+
+@pytest.mark.django_db
+def test_enqueued_job_runs_once():
+  job = jobs.enqueue(record, "a")
+
+  assert job.task == "src.core.tests.test_jobs.record"
+  assert jobs.run_batch() == 1
+  assert calls == ["a"]
+  assert not Job.objects.exists()
+  assert jobs.run_batch() == 0
+
+
+@pytest.mark.django_db
+def test_delayed_job_waits():
+  jobs.enqueue(record, "a", delay=60)
+
+  assert jobs.run_batch() == 0
+  assert calls == []
+
+
+@pytest.mark.django_db
+@override_settings(JOBS_RETRY_BASE_DELAY=10, JOBS_RETRY_MAX_DELAY=15)
+def test_failed_job_retries_with_backoff_then_gives_up():
+  job = jobs.enqueue(fail, "boom", max_attempts=3)
+
+  jobs.run_batch()
+  job.refresh_from_db()
+  assert job.attempts == 1
+  assert "RuntimeError: boom" in job.last_error
+  assert job.run_at > timezone.now() + timedelta(seconds=4)
+  assert jobs.run_batch() == 0
+
+  Job.objects.update(run_at=timezone.now())
+  jobs.run_batch()
+  job.refresh_from_db()
+  # The delay doubles up to the maximum
+  assert job.attempts == 2
+  assert job.run_at < timezone.now() + timedelta(seconds=23)
+
+  Job.objects.update(run_at=timezone.now())
+  jobs.run_batch()
+  job.refresh_from_db()
+  assert job.attempts == 3
+  assert job.failed_at is not None
+  Job.objects.update(run_at=timezone.now())
+  assert jobs.run_batch() == 0
+
+
+@pytest.mark.django_db
+def test_expired_lease_is_claimed_again():
+  job = jobs.enqueue(record, "a", max_attempts=1)
+
+  # A worker claimed the job and died
+  assert [claimed.pk for claimed in jobs.claim(10)] == [job.pk]
+  assert jobs.claim(10) == []
+
+  Job.objects.update(run_at=timezone.now())
+  jobs.run_batch()
+
+  job.refresh_from_db()
+  assert calls == []
+  assert job.failed_at is not None
+  assert job.last_error == "Lease expired"
+
+
+@pytest.mark.django_db
+def test_eager_jobs_run_on_commit(settings, django_capture_on_commit_callbacks):
+  settings.JOBS_EAGER = True
+
+  with django_capture_on_commit_callbacks(execute=True):
+    assert jobs.enqueue(record, "a") is None
+    assert calls == []
+
+  assert calls == ["a"]
+  assert not Job.objects.exists()
+
+
+def test_concurrent_workers_run_each_job_once(transactional_db):
+  Job.objects.bulk_create(
+    [Job(task=jobs.task_name(record), args=[i]) for i in range(200)]
+  )
+
+  claimed = jobs.work_in_threads(4, batch_size=5, burst=True)
+
+  assert claimed == 200
+  assert sorted(calls) == list(range(200))
+  assert not Job.objects.exists()
+
+
+def test_runworkers_burst(transactional_db):
+  for value in ("a", "b"):
+    jobs.enqueue(record, value)
+
+  handlers = [
+    signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)
+  ]
+
+  call_command(
+    "runworkers", threads=2, burst=True, stdout=open(os.devnull, "w")
+  )
+
+  assert sorted(calls) == ["a", "b"]
+  assert [
+    signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)
+  ] == handlers
+
+
+def test_leases_renewed_while_jobs_run(transactional_db, settings):
+  settings.JOBS_LEASE_SECONDS = 1
+  jobs.enqueue(slow, "a")
+  jobs.enqueue(record, "b")
+  worker = threading.Thread(
+    target=jobs.work_in_threads, args=(1,),
+    kwargs={"batch_size": 2, "burst": True},
+  )
+  worker.start()
+
+  try:
+    assert slow_started.wait(10)
+    # Longer than the lease, neither job may be claimed again meanwhile
+    time.sleep(1.5)
+    assert jobs.claim(10) == []
+  finally:
+    slow_release.set()
+    worker.join()
+
+  assert calls == ["a", "b"]
+  assert not Job.objects.exists()
+
+
+def test_worker_survives_queue_errors(transactional_db):
+  jobs.enqueue(record, "a")
+  run_batch = jobs.run_batch
+  outcomes = iter([OperationalError("server closed the connection")])
+
+  def flaky_run_batch(*args, **kwargs):
+    for error in outcomes:
+      raise error
+    return run_batch(*args, **kwargs)
+
+  with mock.patch("src.core.jobs.run_batch", side_effect=flaky_run_batch):
+    claimed = jobs.work_in_threads(1, burst=True, poll_interval=0.01)
+
+  assert claimed == 1
+  assert calls == ["a"]
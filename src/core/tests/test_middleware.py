@@ -0,0 +1,83 @@
+"""Tests for the API aware middleware"""
+import os
+
+import pytest
+
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.urls import reverse
+
+from src.core.middleware import (
+  CsrfViewMiddleware,
+  SessionMiddleware,
+  is_api_request,
+)
+
+
+def test_is_api_request():
+  factory = RequestFactory()
+
+  assert is_api_request(factory.get("/api/recipe/recipes/"))
+  assert not is_api_request(factory.get("/admin/"))
+
+
+def test_session_skipped_for_api():
+  factory = RequestFactory()
+  middleware = SessionMiddleware(lambda request: request)
+
+  api_request = middleware(factory.get("/api/user/me/"))
+  admin_request = factory.get("/admin/")
+  middleware.process_request(admin_request)
+
+  assert not hasattr(api_request, "session")
+  assert hasattr(admin_request, "session")
+
+
+def test_csrf_not_enforced_for_api():
+  factory = RequestFactory()
+  middleware = CsrfViewMiddleware(lambda request: None)
+
+  def view(request):
+    return None
+
+  api_response = middleware.process_view(
+    factory.post("/api/user/create/"), view, (), {}
+  )
+  admin_response = middleware.process_view(
+    factory.post("/admin/login/"), view, (), {}
+  )
+
+  assert api_response is None
+  assert admin_response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_api_response_sets_no_session_cookie(client):
+  response = client.get(reverse("recipe:recipe-list"))
+
+  assert response.status_code == 401
+  assert "sessionid" not in response.cookies
+  assert "X-Frame-Options" not in response
+
+
+@pytest.mark.django_db
+def test_admin_keeps_middleware(client):
+  response = client.get(reverse("admin:login"))
+
+  assert response.status_code == 200
+  assert response["X-Frame-Options"] == "DENY"
+  assert "csrftoken" in response.cookies
+
+
+@pytest.mark.django_db
+def test_api_html_pages_keep_frame_options(client):
+  response = client.get(reverse("api-docs"))
+
+  assert response.status_code == 200
+  assert response["X-Frame-Options"] == "DENY"
+
+
+def test_benchmark_middleware_runs():
+  call_command(
+    "benchmark_middleware", iterations=10, stdout=open(os.devnull, "w")
+  )
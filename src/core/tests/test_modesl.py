@@ -117,3 +117,37 @@ def test_recipe_file_name_uuid(mock_uuid):
   file_path = models.recipe_image_file_path(None, 'example.jpg')
   expected_path = os.path.join("uploads", "recipe", f"{uuid}.jpg")
   assert file_path == expected_path
+
+
+@pytest.mark.django_db
+def test_tag_names_unique_ignoring_case_and_whitespace():
+  from django.db import IntegrityError
+
+  user = User.objects.create_user(
+    email="testtaguser@example.com",
+    password="testpass123"
+  )
+  models.Tag.objects.create(user=user, name="Vegan")
+
+  with pytest.raises(IntegrityError):
+    models.Tag.objects.create(user=user, name="vegan ")
+
+
+@pytest.mark.django_db
+def test_get_or_create_by_name_normalizes():
+  user = User.objects.create_user(
+    email="testingredientuser@gmail.com",
+    password="testpass123"
+  )
+
+  tomato, created = models.Ingredient.objects.get_or_create_by_name(
+    user, " Tomato "
+  )
+  same, same_created = models.Ingredient.objects.get_or_create_by_name(
+    user, "TOMATO"
+  )
+
+  assert created
+  assert not same_created
+  assert same == tomato
+  assert tomato.name == "Tomato"
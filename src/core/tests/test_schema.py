@@ -0,0 +1,77 @@
+"""Tests for the cached OpenAPI schema"""
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from src.core import schema
+
+
+SCHEMA_URL = reverse("api-schema")
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+  schema.clear_schema_cache()
+  yield
+  schema.clear_schema_cache()
+
+
+@pytest.mark.django_db
+def test_schema_generated_once(client):
+  with patch(
+    "src.core.schema.generate_schema", wraps=schema.generate_schema
+  ) as generate:
+    first = client.get(SCHEMA_URL)
+    second = client.get(SCHEMA_URL)
+
+  assert first.status_code == 200
+  assert first.content == second.content
+  assert generate.call_count == 1
+
+
+@pytest.mark.django_db
+def test_schema_etag_not_modified(client):
+  response = client.get(SCHEMA_URL)
+  etag = response["ETag"]
+
+  response = client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+  assert response.status_code == 304
+  assert response["ETag"] == etag
+
+
+@pytest.mark.django_db
+def test_schema_formats_cached_separately(client):
+  yaml_response = client.get(SCHEMA_URL)
+  json_response = client.get(SCHEMA_URL, {"format": "json"})
+
+  assert yaml_response["ETag"] != json_response["ETag"]
+  assert "/api/recipe/recipes/" in json.loads(json_response.content)["paths"]
+
+
+@pytest.mark.django_db
+def test_build_schema_file_served(client, tmp_path, settings):
+  path = tmp_path / "schema.json"
+  call_command("build_schema", file=str(path), stdout=open(os.devnull, "w"))
+  settings.SPECTACULAR_SCHEMA_FILE = str(path)
+
+  with patch("src.core.schema.generate_schema") as generate:
+    response = client.get(SCHEMA_URL, {"format": "json"})
+
+  assert response.status_code == 200
+  assert json.loads(response.content) == json.loads(path.read_text())
+  generate.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_schema_cache_ignores_unknown_lang_and_version(client):
+  client.get(SCHEMA_URL)
+  for value in ("xx", "not-a-language", "zz-1"):
+    client.get(SCHEMA_URL, {"lang": value, "version": value})
+
+  assert list(schema._responses) == [(None, None, "application/vnd.oai.openapi")]
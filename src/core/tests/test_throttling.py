@@ -0,0 +1,194 @@
+"""Tests for the request throttles"""
+import base64
+from unittest import mock
+
+import pytest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from src.core.checks import check_shared_cache
+from src.core.throttling import AuthIPThrottle
+
+
+TOKEN_URL = reverse("user:token")
+CREATE_USER_URL = reverse("user:create")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def rates(**scopes):
+  return override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    "DEFAULT_THROTTLE_RATES": {
+      "auth_ip": None, "auth_email": None, "recipe": None, **scopes,
+    },
+  })
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+  cache.clear()
+  yield
+  cache.clear()
+
+
+def throttle_at(now):
+  throttle = AuthIPThrottle()
+  throttle.timer = lambda: now
+  return throttle
+
+
+@rates(auth_ip="4/min")
+def test_sliding_window_weights_previous_window():
+  request = APIRequestFactory().get("/")
+
+  for _ in range(4):
+    assert throttle_at(50).allow_request(request, None)
+  throttle = throttle_at(55)
+  assert not throttle.allow_request(request, None)
+  assert throttle.wait() == pytest.approx(5)
+
+  # Early in the next window most of the previous 4 still count
+  throttle = throttle_at(62)
+  assert not throttle.allow_request(request, None)
+  assert throttle.wait() == pytest.approx(13)
+
+  assert throttle_at(75).allow_request(request, None)
+  assert not throttle_at(75).allow_request(request, None)
+
+
+@rates(auth_ip=None)
+def test_throttle_disabled_without_rate():
+  request = APIRequestFactory().get("/")
+
+  assert all(throttle_at(1).allow_request(request, None) for _ in range(50))
+
+
+@pytest.mark.django_db
+@rates(auth_email="3/min")
+def test_token_throttled_per_email_before_hashing():
+  get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123"
+  )
+  client = APIClient()
+  payload = {"email": "user@example.com", "password": "wrong"}
+
+  with mock.patch(
+    "src.user.serializers.authenticate", return_value=None
+  ) as authenticate:
+    for _ in range(3):
+      res = client.post(TOKEN_URL, payload)
+      assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+    payload["email"] = " USER@example.com"
+    res = client.post(TOKEN_URL, payload, REMOTE_ADDR="10.0.0.2")
+
+  assert res.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+  assert "Retry-After" in res
+  assert authenticate.call_count == 3
+
+
+@pytest.mark.django_db
+@rates(auth_ip="2/min")
+def test_basic_credentials_throttled_before_authentication():
+  get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123"
+  )
+  client = APIClient()
+  client.credentials(HTTP_AUTHORIZATION="Basic " + base64.b64encode(
+    b"user@example.com:wrong"
+  ).decode())
+
+  with mock.patch(
+    "django.contrib.auth.authenticate", return_value=None
+  ) as authenticate:
+    for url in (TOKEN_URL, CREATE_USER_URL, TOKEN_URL):
+      res = client.post(url, {})
+
+  assert res.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+  authenticate.assert_not_called()
+
+
+@pytest.mark.django_db
+@rates(auth_ip="2/min")
+def test_forwarded_for_header_does_not_change_identity():
+  client = APIClient()
+
+  for i in range(3):
+    res = client.post(TOKEN_URL, {
+      "email": "user@example.com", "password": "wrong",
+    }, HTTP_X_FORWARDED_FOR=f"203.0.113.{i}")
+
+  assert res.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+@pytest.mark.django_db
+@rates(auth_ip="2/min")
+def test_create_user_throttled_per_ip():
+  client = APIClient()
+
+  for i in range(2):
+    res = client.post(CREATE_USER_URL, {
+      "email": f"user{i}@example.com", "password": "testpass123",
+      "name": "Test",
+    })
+    assert res.status_code == status.HTTP_201_CREATED
+
+  res = client.post(CREATE_USER_URL, {
+    "email": "user3@example.com", "password": "testpass123",
+    "name": "Test",
+  })
+  assert res.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+  res = client.post(CREATE_USER_URL, {
+    "email": "user3@example.com", "password": "testpass123",
+    "name": "Test",
+  }, REMOTE_ADDR="10.0.0.2")
+  assert res.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+@rates(recipe="2/min")
+def test_recipe_api_throttled_per_user():
+  User = get_user_model()
+  client = APIClient()
+  client.force_authenticate(User.objects.create_user(
+    email="user@example.com", password="testpass123"
+  ))
+  other = APIClient()
+  other.force_authenticate(User.objects.create_user(
+    email="other@example.com", password="testpass123"
+  ))
+
+  assert client.get(RECIPES_URL).status_code == status.HTTP_200_OK
+  assert client.get(RECIPES_URL).status_code == status.HTTP_200_OK
+  assert client.get(RECIPES_URL).status_code == (
+    status.HTTP_429_TOO_MANY_REQUESTS
+  )
+  assert other.get(RECIPES_URL).status_code == status.HTTP_200_OK
+
+
+def test_process_local_cache_warns_without_debug(settings):
+  settings.DEBUG = False
+  settings.CACHES = {"default": {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+  }}
+  assert [error.id for error in check_shared_cache(None)] == ["core.W001"]
+
+  settings.CACHES = {"default": {
+    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+    "LOCATION": "redis://localhost:6379/1",
+  }}
+  assert check_shared_cache(None) == []
+
+  settings.DEBUG = True
+  settings.CACHES = {"default": {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+  }}
+  assert check_shared_cache(None) == []
@@ -0,0 +1,106 @@
+"""
+Request throttles backed by the cache framework
+"""
+import hashlib
+
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+  """
+  Sliding window rate limit.
+
+  Each key keeps one counter per fixed window. The request rate is
+  estimated from the current window plus the previous one weighted by how
+  much of it still overlaps the sliding window, so a key costs two
+  integers in the cache instead of a list of timestamps. Rejected requests
+  are not counted. A scope whose rate is empty is not throttled.
+  """
+
+  def get_rate(self):
+    # Read at call time so rates follow settings overrides, empty disables
+    try:
+      return api_settings.DEFAULT_THROTTLE_RATES[self.scope] or None
+    except KeyError:
+      raise ImproperlyConfigured(
+        f"No default throttle rate set for '{self.scope}' scope"
+      )
+
+  def allow_request(self, request, view):
+    if self.rate is None:
+      return True
+
+    self.key = self.get_cache_key(request, view)
+    if self.key is None:
+      return True
+
+    now = self.timer()
+    window, offset = divmod(now, self.duration)
+    current_key = f"{self.key}:{int(window)}"
+    previous_key = f"{self.key}:{int(window) - 1}"
+    counts = self.cache.get_many([current_key, previous_key])
+    self.previous = counts.get(previous_key, 0)
+    self.current = counts.get(current_key, 0)
+    self.elapsed = offset / self.duration
+
+    if self._estimate(self.elapsed) + 1 > self.num_requests:
+      return False
+
+    if self.cache.add(current_key, 1, timeout=self.duration * 2):
+      return True
+    try:
+      self.cache.incr(current_key)
+    except ValueError:
+      # Expired between add and incr
+      self.cache.set(current_key, 1, timeout=self.duration * 2)
+    return True
+
+  def _estimate(self, elapsed):
+    return self.previous * (1 - elapsed) + self.current
+
+  def wait(self):
+    """Seconds until one more request fits in the window"""
+    if self.current + 1 > self.num_requests or not self.previous:
+      return self.duration * (1 - self.elapsed)
+    # The previous window's share has to shrink by `excess` requests
+    excess = self._estimate(self.elapsed) + 1 - self.num_requests
+    return self.duration * excess / self.previous
+
+
+class AuthIPThrottle(SlidingWindowThrottle):
+  """Limit credential endpoints per client address"""
+  scope = "auth_ip"
+
+  def get_cache_key(self, request, view):
+    return self.cache_format % {
+      "scope": self.scope,
+      "ident": self.get_ident(request),
+    }
+
+
+class AuthEmailThrottle(SlidingWindowThrottle):
+  """Limit credential endpoints per submitted email, from any address"""
+  scope = "auth_email"
+
+  def get_cache_key(self, request, view):
+    email = request.data.get("email") if hasattr(request.data, "get") else None
+    if not isinstance(email, str) or not email.strip():
+      return None
+    # Hashed so arbitrary input stays a valid cache key
+    ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+    return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class RecipeUserThrottle(SlidingWindowThrottle):
+  """Limit the recipe API per user"""
+  scope = "recipe"
+
+  def get_cache_key(self, request, view):
+    if request.user and request.user.is_authenticated:
+      ident = request.user.pk
+    else:
+      ident = self.get_ident(request)
+    return self.cache_format % {"scope": self.scope, "ident": ident}
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete
 
 
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'src.recipe'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from src.core.models import (Recipe, Tag, Ingredient)
+        from src.recipe import similarity
+
+        for through in (Recipe.tags.through, Recipe.ingredients.through):
+            m2m_changed.connect(similarity.recipe_m2m_changed, sender=through)
+        post_delete.connect(similarity.recipe_deleted, sender=Recipe)
+        for model in (Tag, Ingredient):
+            post_delete.connect(similarity.feature_deleted, sender=model)
+        post_delete.connect(similarity.user_deleted, sender=get_user_model())
@@ -1,7 +1,30 @@
+from django.utils.translation import gettext as _
+
 from rest_framework import serializers
 from src.core.models import (Tag, Recipe, Ingredient)
 
-class TagSerializer(serializers.ModelSerializer):
+
+class NameSerializerMixin:
+  """Reject renames clashing with another name of the same user"""
+
+  def validate_name(self, value):
+    # Nested tags and ingredients are looked up by name instead
+    if self.parent is not None:
+      return value
+
+    queryset = self.Meta.model.objects.filter(
+      user=self.context["request"].user
+    ).filter_name(value)
+    if self.instance is not None:
+      queryset = queryset.exclude(id=self.instance.id)
+    if queryset.exists():
+      raise serializers.ValidationError(
+        _("an item with this name already exists."), code="unique"
+      )
+    return value
+
+
+class TagSerializer(NameSerializerMixin, serializers.ModelSerializer):
   """Serializer for tag objects"""
 
   class Meta:
@@ -9,7 +32,7 @@ class TagSerializer(serializers.ModelSerializer):
     fields = ["id", "name"]
     read_only_fields = ["id", "user"]
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(NameSerializerMixin, serializers.ModelSerializer):
   """ Serializer for ingredients objects """
   class Meta:
     model= Ingredient
@@ -31,17 +54,17 @@ class RecipeSerializer(serializers.ModelSerializer):
   def _get_or_create_tags(self, tags, recipe):
     """Handle getting or creating tags as needed"""
     for tag in tags:
-      tag_obj, created = Tag.objects.get_or_create(
+      tag_obj, created = Tag.objects.get_or_create_by_name(
         user=self.context["request"].user,
-        **tag
+        name=tag["name"]
       )
       recipe.tags.add(tag_obj)
 
   def _get_or_create_ingredients(self, ingredients, recipe):
     for ingredient in ingredients:
-      ingredient_obj, created = Ingredient.objects.get_or_create(
+      ingredient_obj, created = Ingredient.objects.get_or_create_by_name(
         user=self.context["request"].user,
-        **ingredient
+        name=ingredient["name"]
       )
       recipe.ingredients.add(ingredient_obj)
 
@@ -79,6 +102,14 @@ class RecipeDetailSerializer(RecipeSerializer):
 
 
 
+class SimilarRecipeSerializer(RecipeSerializer):
+  """Serializer for a recipe with its similarity score"""
+  score = serializers.FloatField(read_only=True)
+
+  class Meta(RecipeSerializer.Meta):
+    fields = RecipeSerializer.Meta.fields + ["score"]
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
   """Serilizer for uploading images to recipe """
   class Meta:
@@ -88,3 +119,80 @@ class RecipeImageSerializer(serializers.ModelSerializer):
     extra_kwargs ={"image":{"required":"True"}}
 
 
+
+
+class FacetCountSerializer(serializers.Serializer):
+  """Number of matching recipes for a tag or ingredient"""
+  id = serializers.IntegerField(source="facet_id")
+  name = serializers.CharField(source="facet_name")
+  count = serializers.IntegerField()
+
+
+class RecipeFacetsSerializer(serializers.Serializer):
+  """Serializer for recipe facet counts"""
+  total = serializers.IntegerField()
+  tags = FacetCountSerializer(many=True)
+  ingredients = FacetCountSerializer(many=True)
+
+
+class ShoppingListRequestSerializer(serializers.Serializer):
+  """Serializer for the recipes to build a shopping list from"""
+  recipes = serializers.ListField(
+    child=serializers.IntegerField(min_value=1),
+    allow_empty=False,
+    max_length=10000,
+  )
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+  """Serializer for the recipes to delete, the list filters apply without"""
+  ids = serializers.ListField(
+    child=serializers.IntegerField(min_value=1),
+    allow_empty=False,
+    max_length=10000,
+    required=False,
+  )
+
+
+class RecipeBulkDeleteResultSerializer(serializers.Serializer):
+  """Serializer for the number of deleted recipes"""
+  deleted = serializers.IntegerField()
+
+
+class ShoppingListSerializer(serializers.Serializer):
+  """Serializer for a merged shopping list"""
+  recipe_count = serializers.IntegerField()
+  total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+  total_time_minutes = serializers.IntegerField()
+  ingredients = FacetCountSerializer(many=True)
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+  """Ids of objects deleted since the sync token"""
+  recipes = serializers.ListField(child=serializers.IntegerField())
+  tags = serializers.ListField(child=serializers.IntegerField())
+  ingredients = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncSerializer(serializers.Serializer):
+  """Serializer for a page of changes since a sync token"""
+  recipes = RecipeDetailSerializer(many=True)
+  tags = TagSerializer(many=True)
+  ingredients = IngredientSerializer(many=True)
+  deleted = SyncDeletedSerializer()
+  next = serializers.CharField()
+  has_more = serializers.BooleanField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+  """Serializer for a user's recipe statistics"""
+  recipe_count = serializers.IntegerField()
+  total_price = serializers.DecimalField(
+    max_digits=14, decimal_places=2, source="price_sum"
+  )
+  average_price = serializers.DecimalField(
+    max_digits=12, decimal_places=2, allow_null=True
+  )
+  average_time_minutes = serializers.FloatField(allow_null=True)
+  tag_count = serializers.IntegerField()
+  ingredient_count = serializers.IntegerField()
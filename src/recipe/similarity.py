@@ -0,0 +1,286 @@
+"""
+Recipe similarity over shared tags and ingredients
+
+Each user gets an in-process index holding the sparse recipe x
+(tag + ingredient) incidence matrix as NumPy posting lists. Scoring a
+recipe only touches the postings of its own features, so the cost grows
+with the number of recipes sharing a feature rather than with the size of
+the collection. Indexes are kept current from m2m_changed and delete
+signals; a version counter in the default cache tells other processes to
+rebuild theirs, which takes a cache shared between them (CACHES).
+
+At most RECIPE_SIMILARITY_MAX_INDEXES indexes are kept per process, least
+recently used first out. A lock serializes changes to them with the
+threads serving requests.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from src.core.models import Recipe
+
+
+METRICS = ("jaccard", "cosine")
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+# user id -> (version, index), least recently used first
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def tag_feature(tag_ids):
+  return np.asarray(tag_ids, dtype=np.int64) * 2
+
+
+def ingredient_feature(ingredient_ids):
+  return np.asarray(ingredient_ids, dtype=np.int64) * 2 + 1
+
+
+class RecipeSimilarityIndex:
+  """Incidence matrix of one user's recipes stored as posting lists"""
+
+  def __init__(self, recipe_ids, features):
+    """
+    Build the index from parallel arrays of recipe ids and feature ids,
+    one entry per non zero cell of the incidence matrix.
+    """
+    recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+    features = np.asarray(features, dtype=np.int64)
+    order = np.lexsort((features, recipe_ids))
+    recipe_ids, features = recipe_ids[order], features[order]
+    distinct = np.ones(len(order), dtype=bool)
+    distinct[1:] = (
+      (recipe_ids[1:] != recipe_ids[:-1]) | (features[1:] != features[:-1])
+    )
+    recipe_ids, features = recipe_ids[distinct], features[distinct]
+
+    self.recipe_ids = np.unique(recipe_ids)
+    self.rows = {
+      int(recipe_id): row for row, recipe_id in enumerate(self.recipe_ids)
+    }
+    rows = np.searchsorted(self.recipe_ids, recipe_ids)
+    self.sizes = np.bincount(rows, minlength=len(self.recipe_ids))
+    self.postings = self._group(features, rows)
+    self.features = self._group(rows, features)
+
+  @staticmethod
+  def _group(keys, values):
+    """Return {key: array of values} without a Python loop over cells"""
+    if not len(keys):
+      return {}
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+    unique, starts = np.unique(keys, return_index=True)
+    return dict(zip(unique.tolist(), np.split(values, starts[1:])))
+
+  def similar(self, recipe_id, k=10, metric="jaccard"):
+    """Return up to k (recipe_id, score) pairs, best first"""
+    row = self.rows.get(recipe_id)
+    if row is None or not self.sizes[row]:
+      return []
+
+    own = self.features[row]
+    candidates, shared = np.unique(
+      np.concatenate([self.postings[f] for f in own.tolist()]),
+      return_counts=True,
+    )
+    keep = candidates != row
+    candidates, shared = candidates[keep], shared[keep]
+    if not len(candidates):
+      return []
+
+    sizes = self.sizes[candidates]
+    if metric == "cosine":
+      scores = shared / np.sqrt(len(own) * sizes)
+    else:
+      scores = shared / (len(own) + sizes - shared)
+
+    ids = self.recipe_ids[candidates]
+    if len(scores) > k:
+      top = np.argpartition(-scores, k - 1)[:k]
+      scores, ids = scores[top], ids[top]
+    # Highest score first, newest recipe first on ties
+    order = np.lexsort((-ids, -scores))
+    return [
+      (int(ids[i]), float(scores[i])) for i in order
+    ]
+
+  def update(self, recipe_id, features):
+    """Replace the feature set of one recipe"""
+    features = np.unique(np.asarray(features, dtype=np.int64))
+    row = self.rows.get(recipe_id)
+    if row is None:
+      if not len(features):
+        return
+      row = len(self.recipe_ids)
+      self.recipe_ids = np.append(self.recipe_ids, recipe_id)
+      self.sizes = np.append(self.sizes, 0)
+      self.rows[recipe_id] = row
+
+    old = self.features.get(row, _EMPTY)
+    for feature in np.setdiff1d(old, features).tolist():
+      posting = self.postings[feature]
+      self.postings[feature] = posting[posting != row]
+    for feature in np.setdiff1d(features, old).tolist():
+      self.postings[feature] = np.append(
+        self.postings.get(feature, _EMPTY), row
+      )
+    self.features[row] = features
+    self.sizes[row] = len(features)
+
+  def remove(self, recipe_id):
+    """Drop a recipe, its row stays allocated but empty"""
+    self.update(recipe_id, _EMPTY)
+
+
+def load_features(recipe_filter):
+  """Return (recipe ids, feature ids) arrays for the matching recipes"""
+  recipe_ids, features = [], []
+  for through, field, to_feature in (
+    (Recipe.tags.through, "tag_id", tag_feature),
+    (Recipe.ingredients.through, "ingredient_id", ingredient_feature),
+  ):
+    rows = np.array(
+      through.objects.filter(**recipe_filter).values_list(
+        "recipe_id", field
+      ),
+      dtype=np.int64,
+    ).reshape(-1, 2)
+    recipe_ids.append(rows[:, 0])
+    features.append(to_feature(rows[:, 1]))
+  return np.concatenate(recipe_ids), np.concatenate(features)
+
+
+def _version_key(user_id):
+  return f"recipe-similarity:{user_id}"
+
+
+def _store(user_id, version, index):
+  """Keep an index, evicting the least recently used ones. Hold _lock."""
+  _indexes[user_id] = (version, index)
+  _indexes.move_to_end(user_id)
+  while len(_indexes) > settings.RECIPE_SIMILARITY_MAX_INDEXES:
+    _indexes.popitem(last=False)
+
+
+def get_index(user_id):
+  """Return the current index for a user, rebuilding it when stale"""
+  version = cache.get(_version_key(user_id), 0)
+  with _lock:
+    cached = _indexes.get(user_id)
+    if cached is not None and cached[0] == version:
+      _indexes.move_to_end(user_id)
+      return cached[1]
+
+  index = RecipeSimilarityIndex(
+    *load_features({
+      "recipe__user_id": user_id, "recipe__deleted_at__isnull": True
+    })
+  )
+  with _lock:
+    _store(user_id, version, index)
+  return index
+
+
+def similar(user_id, recipe_id, k=10, metric="jaccard"):
+  """Score a recipe against the user's other recipes"""
+  index = get_index(user_id)
+  with _lock:
+    return index.similar(recipe_id, k, metric)
+
+
+def _bump_version(user_id):
+  key = _version_key(user_id)
+  cache.add(key, 0, timeout=None)
+  try:
+    return cache.incr(key)
+  except ValueError:
+    cache.set(key, 1, timeout=None)
+    return 1
+
+
+def invalidate(user_id):
+  """Drop a user's index in every process"""
+  with _lock:
+    _indexes.pop(user_id, None)
+  _bump_version(user_id)
+
+
+def evict(user_id):
+  """Forget the index of a deleted user"""
+  with _lock:
+    _indexes.pop(user_id, None)
+  cache.delete(_version_key(user_id))
+
+
+def _apply(user_id, change):
+  """Apply change(index) to the local index and bump the user's version"""
+  with _lock:
+    cached = _indexes.get(user_id)
+    version = _bump_version(user_id)
+    if cached is None:
+      return
+    if cached[0] != version - 1:
+      # Another process changed the index meanwhile, rebuild on next use
+      _indexes.pop(user_id, None)
+      return
+    change(cached[1])
+    _store(user_id, version, cached[1])
+
+
+def refresh_recipes(user_id, recipe_ids):
+  """Reload the features of some recipes into the user's index"""
+  if user_id not in _indexes:
+    _bump_version(user_id)
+    return
+  recipe_col, features = load_features({"recipe_id__in": recipe_ids})
+
+  def change(index):
+    for recipe_id in recipe_ids:
+      index.update(recipe_id, features[recipe_col == recipe_id])
+
+  _apply(user_id, change)
+
+
+def remove_recipe(user_id, recipe_id):
+  _apply(user_id, lambda index: index.remove(recipe_id))
+
+
+def recipe_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+  """Keep indexes current when recipe tags or ingredients change"""
+  if action not in ("post_add", "post_remove", "post_clear"):
+    return
+
+  if not reverse:
+    user_id, recipe_id = instance.user_id, instance.id
+    transaction.on_commit(lambda: refresh_recipes(user_id, [recipe_id]))
+  elif pk_set:
+    user_id = instance.user_id
+    recipe_ids = list(pk_set)
+    transaction.on_commit(lambda: refresh_recipes(user_id, recipe_ids))
+  else:
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate(user_id))
+
+
+def recipe_deleted(sender, instance, **kwargs):
+  user_id, recipe_id = instance.user_id, instance.id
+  transaction.on_commit(lambda: remove_recipe(user_id, recipe_id))
+
+
+def user_deleted(sender, instance, **kwargs):
+  # Batched user deletion removes recipes without delete signals
+  user_id = instance.pk
+  transaction.on_commit(lambda: evict(user_id))
+
+
+def feature_deleted(sender, instance, **kwargs):
+  # Cascaded through rows are deleted without m2m_changed
+  user_id = instance.user_id
+  transaction.on_commit(lambda: invalidate(user_id))
@@ -0,0 +1,124 @@
+"""
+Delta sync of a user's recipes, tags and ingredients
+
+Database triggers stamp every written row with the id of the writing
+transaction (`change_id`) and record deletes as tombstones. A sync pass
+fixes an upper bound, the oldest transaction still running when it
+started, so every row below it is committed and can no longer change
+position. Rows are then paged by (change_id, id) keyset cursors on the
+(user, change_id, id) indexes. The next pass resumes from the bound, so a
+client only ever receives rows written since its token.
+"""
+import base64
+import binascii
+import json
+
+from django.db import connection
+from django.db.models import Q
+
+from src.core.models import (Recipe, Tag, Ingredient, Tombstone)
+
+
+COLLECTIONS = {
+  # Soft deleted recipes get their tombstone when flagged
+  "recipes": Recipe.objects.live().defer(
+    "search_vector", "tag_ids", "ingredient_ids"
+  ).prefetch_related("tags", "ingredients"),
+  "tags": Tag.objects.all(),
+  "ingredients": Ingredient.objects.all(),
+  "deleted": Tombstone.objects.all(),
+}
+
+TOMBSTONE_MODELS = {
+  "recipe": "recipes",
+  "tag": "tags",
+  "ingredient": "ingredients",
+}
+
+_START = [0, 0]
+
+
+class InvalidToken(ValueError):
+  pass
+
+
+def encode_token(bound, cursors):
+  payload = json.dumps({"b": bound, "c": cursors}, separators=(",", ":"))
+  return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_token(token):
+  """Return (bound, cursors) of a token, or of a first sync when empty"""
+  if not token:
+    return None, {name: _START for name in COLLECTIONS}
+  try:
+    payload = json.loads(
+      base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    )
+    bound, cursors = payload["b"], payload["c"]
+    if bound is not None and not isinstance(bound, int):
+      raise InvalidToken(token)
+    cursors = {
+      name: [int(value) for value in cursors[name]] for name in COLLECTIONS
+    }
+  except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+    raise InvalidToken(token) from exc
+  if any(len(cursor) != 2 for cursor in cursors.values()):
+    raise InvalidToken(token)
+  return bound, cursors
+
+
+def current_bound():
+  """Return the oldest transaction id not yet visible to every session"""
+  with connection.cursor() as cursor:
+    cursor.execute(
+      "SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+    )
+    return cursor.fetchone()[0]
+
+
+def _page(queryset, user, cursor, bound, limit):
+  """Return up to limit + 1 rows after cursor and below bound"""
+  change_id, pk = cursor
+  return list(
+    queryset.filter(
+      user=user, change_id__lt=bound
+    ).filter(
+      Q(change_id__gt=change_id) | Q(change_id=change_id, id__gt=pk)
+    ).order_by("change_id", "id")[:limit + 1]
+  )
+
+
+def changes(user, token, limit):
+  """
+  Return the changes after token as a dict of collections plus the next
+  token and whether more pages remain below the same bound.
+  """
+  bound, cursors = decode_token(token)
+  if bound is None:
+    bound = current_bound()
+
+  pages, has_more = {}, False
+  for name, queryset in COLLECTIONS.items():
+    rows = _page(queryset, user, cursors[name], bound, limit)
+    if len(rows) > limit:
+      rows, has_more = rows[:limit], True
+    if rows:
+      cursors[name] = [rows[-1].change_id, rows[-1].id]
+    pages[name] = rows
+
+  if not has_more:
+    # Everything below the bound has been sent, resume from it
+    cursors = {name: [bound, 0] for name in COLLECTIONS}
+    bound = None
+
+  deleted = {name: [] for name in TOMBSTONE_MODELS.values()}
+  for tombstone in pages.pop("deleted"):
+    deleted[TOMBSTONE_MODELS[tombstone.model]].append(tombstone.object_id)
+
+  return {
+    **pages,
+    "deleted": deleted,
+    "next": encode_token(bound, cursors),
+    "has_more": has_more,
+  }
@@ -0,0 +1,160 @@
+"""Tests for Idempotency-Key support on recipe endpoints"""
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.core.models import (IdempotencyKey, Recipe)
+
+
+RECIPE_URL = reverse("recipe:recipe-list")
+
+PAYLOAD = {
+  "title": "Soup",
+  "time_minutes": 10,
+  "price": "2.50",
+  "tags": [{"name": "Vegan"}],
+}
+
+
+@pytest.fixture(autouse=True)
+def cleanup_media():
+  yield
+  if os.path.exists(settings.MEDIA_ROOT):
+    shutil.rmtree(settings.MEDIA_ROOT)
+
+
+@pytest.fixture
+def user_cl(db):
+  return get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123"
+  )
+
+
+@pytest.fixture
+def auth_client(user_cl):
+  client = APIClient()
+  client.force_authenticate(user_cl)
+  return client
+
+
+def create(client, key, payload=PAYLOAD):
+  return client.post(
+    RECIPE_URL, payload, format="json", HTTP_IDEMPOTENCY_KEY=key
+  )
+
+
+def test_retry_replays_created_recipe(
+  auth_client, django_assert_max_num_queries
+):
+  first = create(auth_client, "key-1")
+  assert first.status_code == status.HTTP_201_CREATED
+
+  # Key lookups only, the serializer does not run again
+  with django_assert_max_num_queries(3):
+    retry = create(auth_client, "key-1")
+
+  assert retry.status_code == status.HTTP_201_CREATED
+  assert retry.data == first.data
+  assert retry["Idempotent-Replayed"] == "true"
+  assert Recipe.objects.count() == 1
+
+  assert create(auth_client, "key-2").status_code == status.HTTP_201_CREATED
+  assert Recipe.objects.count() == 2
+
+
+def test_requests_without_key_are_not_deduplicated(auth_client):
+  auth_client.post(RECIPE_URL, PAYLOAD, format="json")
+  auth_client.post(RECIPE_URL, PAYLOAD, format="json")
+
+  assert Recipe.objects.count() == 2
+  assert not IdempotencyKey.objects.exists()
+
+
+def test_key_reused_for_other_request(auth_client):
+  create(auth_client, "key-1")
+
+  response = create(auth_client, "key-1", {**PAYLOAD, "title": "Stew"})
+
+  assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+  assert Recipe.objects.count() == 1
+
+
+def test_keys_are_per_user(auth_client):
+  other = APIClient()
+  other.force_authenticate(get_user_model().objects.create_user(
+    email="other@example.com", password="testpass123"
+  ))
+
+  create(auth_client, "key-1")
+  response = create(other, "key-1")
+
+  assert response.status_code == status.HTTP_201_CREATED
+  assert "Idempotent-Replayed" not in response
+  assert Recipe.objects.count() == 2
+
+
+def test_request_in_progress_conflicts(auth_client, user_cl):
+  create(auth_client, "key-1")
+  IdempotencyKey.objects.update(status_code=None, response=None)
+
+  response = create(auth_client, "key-1")
+
+  assert response.status_code == status.HTTP_409_CONFLICT
+
+  # Until the first request is presumed dead
+  IdempotencyKey.objects.update(
+    created_at=timezone.now() - timedelta(minutes=5)
+  )
+  assert create(auth_client, "key-1").status_code == status.HTTP_201_CREATED
+
+
+def test_expired_keys_run_again_and_are_purged(auth_client):
+  create(auth_client, "key-1")
+  IdempotencyKey.objects.update(expires_at=timezone.now())
+
+  response = create(auth_client, "key-1")
+
+  assert "Idempotent-Replayed" not in response
+  assert Recipe.objects.count() == 2
+
+  IdempotencyKey.objects.update(expires_at=timezone.now())
+  call_command("purge_idempotency_keys", stdout=open(os.devnull, "w"))
+  assert not IdempotencyKey.objects.exists()
+
+
+def test_retried_upload_is_stored_once(auth_client, user_cl):
+  recipe = Recipe.objects.create(
+    user=user_cl, title="Soup", time_minutes=10, price=Decimal("2.50")
+  )
+  url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+
+  with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+    Image.new("RGB", (10, 10)).save(image_file, format="JPEG")
+    responses = []
+    for _ in range(2):
+      image_file.seek(0)
+      responses.append(auth_client.post(
+        url, {"image": image_file}, format="multipart",
+        HTTP_IDEMPOTENCY_KEY="upload-1",
+      ))
+
+  assert responses[1].data == responses[0].data
+  assert responses[1]["Idempotent-Replayed"] == "true"
+  assert len(os.listdir(os.path.dirname(
+    Recipe.objects.get(pk=recipe.pk).image.path
+  ))) == 1
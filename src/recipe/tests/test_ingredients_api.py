@@ -8,6 +8,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from src.core.deletion import soft_delete_recipes
 from src.core.models import (Ingredient, Recipe)
 from src.recipe.serializers import IngredientSerializer
 
@@ -163,3 +164,61 @@ def test_filtered_ingredients_unique(auth_client, user_cl):
   response = auth_client.get(INGREDIENT_URL, {"assigned_only" : 1})
 
   assert len(response.data) == 1
+
+
+def test_prefix_autocomplete_by_usage(auth_client, user_cl):
+  """ Test prefix lookup is case insensitive and ordered by usage """
+
+  saffron = Ingredient.objects.create(user=user_cl, name="Saffron")
+  salt = Ingredient.objects.create(user=user_cl, name="salt")
+  sage = Ingredient.objects.create(user=user_cl, name="SAGE")
+  Ingredient.objects.create(user=user_cl, name="Pepper")
+  other_user = create_user(email="other@example.com")
+  Ingredient.objects.create(user=other_user, name="Sardine")
+
+  for title in ["Soup", "Stew"]:
+    recipe = Recipe.objects.create(
+      title=title, time_minutes=5, price=Decimal("1.00"), user=user_cl
+    )
+    recipe.ingredients.add(salt)
+  recipe.ingredients.add(sage)
+
+  response = auth_client.get(INGREDIENT_URL, {"prefix": "Sa"})
+
+  assert response.status_code == status.HTTP_200_OK
+  assert [i["id"] for i in response.data] == [salt.id, sage.id, saffron.id]
+
+
+def test_prefix_autocomplete_ignores_soft_deleted_recipes(auth_client, user_cl):
+  salt = Ingredient.objects.create(user=user_cl, name="Salt")
+  sage = Ingredient.objects.create(user=user_cl, name="Sage")
+  for title in ["Soup", "Stew"]:
+    recipe = Recipe.objects.create(
+      title=title, time_minutes=5, price=Decimal("1.00"), user=user_cl
+    )
+    recipe.ingredients.add(salt)
+  Recipe.objects.create(
+    title="Roast", time_minutes=5, price=Decimal("1.00"), user=user_cl
+  ).ingredients.add(sage)
+  soft_delete_recipes(Recipe.objects.filter(ingredients=salt))
+
+  response = auth_client.get(INGREDIENT_URL, {"prefix": "sa"})
+
+  assert [i["id"] for i in response.data] == [sage.id, salt.id]
+
+
+def test_prefix_autocomplete_limit(auth_client, user_cl):
+  for i in range(5):
+    Ingredient.objects.create(user=user_cl, name=f"Chili {i}")
+
+  response = auth_client.get(INGREDIENT_URL, {"prefix": "chi", "limit": 2})
+
+  assert len(response.data) == 2
+
+
+def test_prefix_autocomplete_escapes_wildcards(auth_client, user_cl):
+  Ingredient.objects.create(user=user_cl, name="Salt")
+
+  response = auth_client.get(INGREDIENT_URL, {"prefix": "%"})
+
+  assert response.data == []
@@ -8,12 +8,16 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import override_settings
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from src.core.deletion import purge_deleted_recipes, wait_for_files
 from src.core.models import (Recipe, Tag, Ingredient)
+from src.core.stats import rebuild_recipe_stats
 
 from src.recipe.serializers import (
   RecipeSerializer,
@@ -25,6 +29,7 @@ User= get_user_model()
 
 
 RECIPE_URL = reverse("recipe:recipe-list")
+BULK_DELETE_URL = reverse("recipe:recipe-bulk-delete")
 
 
 def detail_url(reciept_id):
@@ -220,13 +225,16 @@ def test_changing_user_on_update_recipe(authenticated_user, user_cl):
   assert recipe.user != new_user
 
 
-def test_delete_recipe(authenticated_user, user_cl):
+def test_delete_recipe(
+  authenticated_user, user_cl, django_capture_on_commit_callbacks
+):
   """ Test deleting a recipe successful """
   recipe = create_recipe(user=user_cl)
 
-  response = authenticated_user.delete(
-    detail_url(recipe.id)
-  )
+  with django_capture_on_commit_callbacks(execute=True):
+    response = authenticated_user.delete(
+      detail_url(recipe.id)
+    )
 
   assert response.status_code == status.HTTP_204_NO_CONTENT
   assert not Recipe.objects.filter(id=recipe.id).exists()
@@ -537,6 +545,54 @@ def test_filter_by_tags(authenticated_user,user_cl):
   assert s3.data not in response.data
 
 
+def test_filter_by_all_tags(authenticated_user, user_cl):
+  r1 = create_recipe(user=user_cl, title="Thai vegetable curry")
+  r2 = create_recipe(user=user_cl, title="Indian curry")
+  vegan = Tag.objects.create(user=user_cl, name="vegan")
+  spicy = Tag.objects.create(user=user_cl, name="spicy")
+  r1.tags.add(vegan, spicy)
+  r2.tags.add(vegan)
+
+  params = {"tags": f"{vegan.id},{spicy.id}", "match": "all"}
+  response = authenticated_user.get(RECIPE_URL, params)
+
+  assert [recipe["id"] for recipe in response.data] == [r1.id]
+
+
+def test_filter_invalid_match(authenticated_user):
+  response = authenticated_user.get(RECIPE_URL, {"match": "some"})
+
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_recipe_id_arrays_follow_m2m_changes(authenticated_user, user_cl):
+  """ Arrays are maintained by the database whatever writes the M2M """
+  vegan = Tag.objects.create(user=user_cl, name="vegan")
+  payload = {
+    "title": "Curry", "time_minutes": 30, "price": Decimal("5.50"),
+    "tags": [{"name": "Spicy"}, {"name": "vegan"}],
+    "ingredients": [{"name": "Rice"}],
+  }
+  response = authenticated_user.post(RECIPE_URL, payload, format="json")
+  recipe = Recipe.objects.get(id=response.data["id"])
+  spicy = Tag.objects.get(name="Spicy")
+  rice = Ingredient.objects.get(name="Rice")
+  assert recipe.tag_ids == sorted([vegan.id, spicy.id])
+  assert recipe.ingredient_ids == [rice.id]
+
+  authenticated_user.patch(detail_url(recipe.id), {"tags": []}, format="json")
+  recipe.refresh_from_db()
+  assert recipe.tag_ids == []
+
+  # Stale values saved from Django are ignored
+  recipe.tag_ids = [vegan.id]
+  recipe.save()
+  rice.delete()
+  recipe.refresh_from_db()
+  assert recipe.tag_ids == []
+  assert recipe.ingredient_ids == []
+
+
 def test_filter_by_ingredients(authenticated_user,user_cl):
   """ Test filtering recipe by ingredients """
 
@@ -562,3 +618,421 @@ def test_filter_by_ingredients(authenticated_user,user_cl):
   assert s3.data not in response.data
 
 
+
+
+def test_search_title_and_description(authenticated_user, user_cl):
+  """ Test full text search over title and description """
+
+  r1 = create_recipe(user=user_cl, title="Thai vegetable curry")
+  r2 = create_recipe(
+    user=user_cl, title="Weeknight dinner", description="A mild curry"
+  )
+  r3 = create_recipe(
+    user=user_cl, title="Fish and chips", description="Crispy fish"
+  )
+
+  response = authenticated_user.get(RECIPE_URL, {"q": "curries"})
+
+  ids = [recipe["id"] for recipe in response.data]
+  assert response.status_code == status.HTTP_200_OK
+  assert ids == [r1.id, r2.id]
+  assert r3.id not in ids
+
+
+def test_search_tolerates_typos(authenticated_user, user_cl):
+  """ Test misspelled searches fall back to trigram similarity """
+
+  r1 = create_recipe(user=user_cl, title="Spaghetti carbonara")
+  create_recipe(user=user_cl, title="Fish and chips")
+
+  response = authenticated_user.get(RECIPE_URL, {"q": "spagetti"})
+
+  assert [recipe["id"] for recipe in response.data] == [r1.id]
+
+
+def test_search_limited_to_user(authenticated_user, user_cl):
+  other_user = User.objects.create_user("other@example.com", "password123")
+  create_recipe(user=other_user, title="Thai vegetable curry")
+
+  response = authenticated_user.get(RECIPE_URL, {"q": "curry"})
+
+  assert response.data == []
+
+
+def test_create_recipe_reuses_tag_ignoring_case(authenticated_user, user_cl):
+  """ Test tags differing only in case map to the existing tag """
+  tag = Tag.objects.create(user=user_cl, name="Indian")
+  payload = {
+    "title": "Curry",
+    "time_minutes": 30,
+    "price": Decimal("2.50"),
+    "tags": [{"name": "indian "}, {"name": "INDIAN"}],
+  }
+
+  response = authenticated_user.post(RECIPE_URL, payload, format="json")
+
+  assert response.status_code == status.HTTP_201_CREATED
+  recipe = Recipe.objects.get(id=response.data["id"])
+  assert list(recipe.tags.all()) == [tag]
+  assert Tag.objects.filter(user=user_cl).count() == 1
+
+
+FACETS_URL = reverse("recipe:recipe-facets")
+
+
+def test_facets_counts(authenticated_user, user_cl, django_assert_max_num_queries):
+  """ Test facet counts per tag and ingredient """
+  vegan = Tag.objects.create(user=user_cl, name="Vegan")
+  quick = Tag.objects.create(user=user_cl, name="Quick")
+  rice = Ingredient.objects.create(user=user_cl, name="Rice")
+  r1 = create_recipe(user=user_cl, title="Rice bowl")
+  r2 = create_recipe(user=user_cl, title="Fried rice")
+  r3 = create_recipe(user=user_cl, title="Toast")
+  r1.tags.add(vegan, quick)
+  r2.tags.add(vegan)
+  r3.tags.add(quick)
+  r1.ingredients.add(rice)
+  r2.ingredients.add(rice)
+
+  other_user = User.objects.create_user("other@example.com", "password123")
+  create_recipe(user=other_user).tags.add(
+    Tag.objects.create(user=other_user, name="Vegan")
+  )
+
+  with django_assert_max_num_queries(3):
+    response = authenticated_user.get(FACETS_URL)
+
+  assert response.status_code == status.HTTP_200_OK
+  assert response.data["total"] == 3
+  assert response.data["tags"] == [
+    {"id": quick.id, "name": "Quick", "count": 2},
+    {"id": vegan.id, "name": "Vegan", "count": 2},
+  ]
+  assert response.data["ingredients"] == [
+    {"id": rice.id, "name": "Rice", "count": 2},
+  ]
+
+
+def test_facets_respect_filters(authenticated_user, user_cl):
+  vegan = Tag.objects.create(user=user_cl, name="Vegan")
+  quick = Tag.objects.create(user=user_cl, name="Quick")
+  r1 = create_recipe(user=user_cl)
+  r2 = create_recipe(user=user_cl)
+  r1.tags.add(vegan, quick)
+  r2.tags.add(quick)
+
+  response = authenticated_user.get(FACETS_URL, {"tags": f"{vegan.id}"})
+
+  assert response.data["total"] == 1
+  assert response.data["tags"] == [
+    {"id": quick.id, "name": "Quick", "count": 1},
+    {"id": vegan.id, "name": "Vegan", "count": 1},
+  ]
+
+
+SHOPPING_LIST_URL = reverse("recipe:recipe-shopping-list")
+
+
+def test_shopping_list(authenticated_user, user_cl, django_assert_max_num_queries):
+  """ Test merging ingredients of selected recipes """
+  rice = Ingredient.objects.create(user=user_cl, name="Rice")
+  egg = Ingredient.objects.create(user=user_cl, name="Egg")
+  salt = Ingredient.objects.create(user=user_cl, name="Salt")
+  r1 = create_recipe(user=user_cl, price=Decimal("2.50"), time_minutes=10)
+  r2 = create_recipe(user=user_cl, price=Decimal("4.00"), time_minutes=25)
+  r3 = create_recipe(user=user_cl)
+  r1.ingredients.add(rice, egg)
+  r2.ingredients.add(rice)
+  r3.ingredients.add(salt)
+
+  other_user = User.objects.create_user("other@example.com", "password123")
+  other = create_recipe(user=other_user)
+
+  payload = {"recipes": [r1.id, r2.id, r2.id, other.id]}
+  with django_assert_max_num_queries(3):
+    response = authenticated_user.post(
+      SHOPPING_LIST_URL, payload, format="json"
+    )
+
+  assert response.status_code == status.HTTP_200_OK
+  assert response.data["recipe_count"] == 2
+  assert response.data["total_price"] == "6.50"
+  assert response.data["total_time_minutes"] == 35
+  assert response.data["ingredients"] == [
+    {"id": egg.id, "name": "Egg", "count": 1},
+    {"id": rice.id, "name": "Rice", "count": 2},
+  ]
+
+
+def test_shopping_list_requires_recipes(authenticated_user):
+  response = authenticated_user.post(
+    SHOPPING_LIST_URL, {"recipes": []}, format="json"
+  )
+
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+STATS_URL = reverse("recipe:recipe-stats")
+
+
+def test_stats(authenticated_user, user_cl, django_assert_num_queries):
+  recipe = create_recipe(user=user_cl, time_minutes=10, price=Decimal("2.00"))
+  create_recipe(user=user_cl, time_minutes=20, price=Decimal("3.00"))
+  create_recipe(user=user_cl, time_minutes=60, price=Decimal("7.00"))
+  other_user = User.objects.create_user("other@example.com", "password123")
+  create_recipe(user=other_user)
+  Tag.objects.create(user=user_cl, name="Vegan")
+  Ingredient.objects.create(user=user_cl, name="Salt")
+  Ingredient.objects.create(user=user_cl, name="Egg")
+  recipe.price = Decimal("5.00")
+  recipe.save()
+  Recipe.objects.filter(time_minutes=60).delete()
+
+  with django_assert_num_queries(1):
+    response = authenticated_user.get(STATS_URL)
+
+  assert response.status_code == status.HTTP_200_OK
+  assert response.data == {
+    "recipe_count": 2,
+    "total_price": "8.00",
+    "average_price": "4.00",
+    "average_time_minutes": 15.0,
+    "tag_count": 1,
+    "ingredient_count": 2,
+  }
+
+
+def test_stats_leave_out_soft_deleted_recipes(authenticated_user, user_cl):
+  """ Test flagged recipes stop counting before they are purged """
+  flagged = create_recipe(user=user_cl, price=Decimal("2.00"))
+  create_recipe(user=user_cl, price=Decimal("3.00"))
+
+  with override_settings(JOBS_EAGER=False):
+    response = authenticated_user.delete(detail_url(flagged.id))
+  assert response.status_code == status.HTTP_204_NO_CONTENT
+
+  response = authenticated_user.get(STATS_URL)
+  assert response.data["recipe_count"] == 1
+  assert response.data["total_price"] == "3.00"
+
+  purge_deleted_recipes(user_cl.id)
+  assert authenticated_user.get(STATS_URL).data == response.data
+  rebuild_recipe_stats([user_cl.id])
+  assert authenticated_user.get(STATS_URL).data == response.data
+
+
+def test_stats_without_recipes(authenticated_user):
+  response = authenticated_user.get(STATS_URL)
+
+  assert response.data["recipe_count"] == 0
+  assert response.data["average_price"] is None
+
+
+def test_filter_by_price_and_time_range(authenticated_user, user_cl):
+  quick = create_recipe(user=user_cl, time_minutes=20, price=Decimal("8.00"))
+  create_recipe(user=user_cl, time_minutes=45, price=Decimal("8.00"))
+  create_recipe(user=user_cl, time_minutes=20, price=Decimal("12.00"))
+
+  response = authenticated_user.get(
+    RECIPE_URL, {"max_time": 30, "max_price": "10", "min_price": "5"}
+  )
+
+  assert [recipe["id"] for recipe in response.data] == [quick.id]
+
+
+def test_filter_by_invalid_range(authenticated_user):
+  response = authenticated_user.get(RECIPE_URL, {"max_price": "cheap"})
+
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+  assert "max_price" in response.data
+
+
+def test_ordering_by_price_then_time(authenticated_user, user_cl):
+  r1 = create_recipe(user=user_cl, time_minutes=30, price=Decimal("4.00"))
+  r2 = create_recipe(user=user_cl, time_minutes=10, price=Decimal("4.00"))
+  r3 = create_recipe(user=user_cl, time_minutes=5, price=Decimal("2.00"))
+
+  response = authenticated_user.get(
+    RECIPE_URL, {"ordering": "price,time_minutes"}
+  )
+  assert [recipe["id"] for recipe in response.data] == [r3.id, r2.id, r1.id]
+
+  response = authenticated_user.get(RECIPE_URL, {"ordering": "-time_minutes"})
+  assert [recipe["id"] for recipe in response.data] == [r1.id, r2.id, r3.id]
+
+
+@pytest.mark.parametrize("param", ["tags", "ingredients"])
+def test_filter_rejects_invalid_ids(authenticated_user, user_cl, param):
+  """ Test non numeric tag and ingredient ids give 400, not 500 """
+  create_recipe(user=user_cl)
+
+  for response in (
+    authenticated_user.get(RECIPE_URL, {param: "1,abc"}),
+    authenticated_user.get(FACETS_URL, {param: "abc"}),
+    authenticated_user.post(
+      f"{BULK_DELETE_URL}?{param}=abc", {}, format="json"
+    ),
+  ):
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert param in response.data
+  assert Recipe.objects.live().count() == 1
+
+
+def test_ordering_rejects_unknown_fields(authenticated_user):
+  response = authenticated_user.get(RECIPE_URL, {"ordering": "title"})
+
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+  assert "ordering" in response.data
+
+
+@pytest.mark.parametrize("ordering", ["price", "-time_minutes", ""])
+def test_keyset_pages_cover_ordering(authenticated_user, user_cl, ordering):
+  for i in range(7):
+    create_recipe(
+      user=user_cl, time_minutes=10 + i % 3, price=Decimal(i % 2 + 1)
+    )
+  expected = [
+    recipe["id"]
+    for recipe in authenticated_user.get(
+      RECIPE_URL, {"ordering": ordering}
+    ).data
+  ]
+
+  seen = []
+  response = authenticated_user.get(
+    RECIPE_URL, {"ordering": ordering, "page_size": 3}
+  )
+  while True:
+    assert response.status_code == status.HTTP_200_OK
+    seen += [recipe["id"] for recipe in response.data["results"]]
+    if not response.data["next"]:
+      break
+    response = authenticated_user.get(response.data["next"])
+
+  assert seen == expected
+
+
+def test_keyset_pages_keep_ties_added_between_pages(
+  authenticated_user, user_cl
+):
+  """ Test rows sharing the cursor price are paged by id, both ways """
+  for _ in range(4):
+    create_recipe(user=user_cl, price=Decimal("2.00"))
+
+  first = authenticated_user.get(
+    RECIPE_URL, {"ordering": "price", "page_size": 2}
+  )
+  added = create_recipe(user=user_cl, price=Decimal("2.00"))
+  second = authenticated_user.get(first.data["next"])
+  third = authenticated_user.get(second.data["next"])
+  back = authenticated_user.get(third.data["previous"])
+
+  ids = [
+    recipe["id"]
+    for page in (first, second, third) for recipe in page.data["results"]
+  ]
+  assert ids == sorted(ids)
+  assert len(ids) == 5 and added.id in ids
+  assert back.data["results"] == second.data["results"]
+
+
+def test_keyset_pages_through_search(authenticated_user, user_cl):
+  """ Test a ranked search can be paged to the end by its cursor """
+  titles = [
+    "Curry", "Chicken curry", "Egg curry with rice", "Curry curry",
+    "Green curry soup",
+  ]
+  for title in titles:
+    create_recipe(user=user_cl, title=title, description="Dinner")
+  create_recipe(user=user_cl, title="Toast")
+  expected = [
+    recipe["id"]
+    for recipe in authenticated_user.get(RECIPE_URL, {"q": "curry"}).data
+  ]
+
+  seen = []
+  response = authenticated_user.get(
+    RECIPE_URL, {"q": "curry", "page_size": 2}
+  )
+  for _ in range(len(titles)):
+    seen += [recipe["id"] for recipe in response.data["results"]]
+    if not response.data["next"]:
+      break
+    response = authenticated_user.get(response.data["next"])
+
+  assert len(expected) == len(titles)
+  assert seen == expected
+  assert response.data["next"] is None
+
+
+def test_keyset_invalid_cursor(authenticated_user):
+  response = authenticated_user.get(
+    RECIPE_URL, {"page_size": 2, "cursor": "cD1ub3QtanNvbg=="}
+  )
+
+  assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_bulk_delete_by_ids(
+  authenticated_user, user_cl, django_capture_on_commit_callbacks
+):
+  """ Test bulk delete removes the listed recipes with their images """
+  other_user = User.objects.create_user("other@example.com", "testpass123")
+  recipes = [create_recipe(user=user_cl) for _ in range(3)]
+  other = create_recipe(user=other_user)
+  recipes[0].image.save("a.jpg", ContentFile(b"x"))
+  image_path = recipes[0].image.path
+
+  with django_capture_on_commit_callbacks(execute=True):
+    response = authenticated_user.post(
+      BULK_DELETE_URL,
+      {"ids": [recipes[0].id, recipes[1].id, other.id]},
+      format="json",
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {"deleted": 2}
+    # Hidden at once, removed by the purge after commit
+    listed = [
+      recipe["id"] for recipe in authenticated_user.get(RECIPE_URL).data
+    ]
+    assert listed == [recipes[2].id]
+    assert Recipe.objects.deleted().count() == 2
+
+  wait_for_files()
+  assert set(Recipe.objects.values_list("id", flat=True)) == {
+    recipes[2].id, other.id
+  }
+  assert not os.path.exists(image_path)
+
+
+@override_settings(RECIPE_SOFT_DELETE=False)
+def test_bulk_delete_by_filter(authenticated_user, user_cl):
+  """ Test bulk delete without ids removes the recipes matching filters """
+  cheap = create_recipe(user=user_cl, price=Decimal("2.00"))
+  create_recipe(user=user_cl, price=Decimal("9.00"))
+  create_recipe(user=user_cl, price=Decimal("12.00"))
+
+  response = authenticated_user.post(
+    f"{BULK_DELETE_URL}?min_price=5", {}, format="json"
+  )
+
+  assert response.data == {"deleted": 2}
+  assert list(Recipe.objects.values_list("id", flat=True)) == [cheap.id]
+
+
+@pytest.mark.parametrize(
+  "query", ["", "?q=%20", "?q=&min_price=", "?match=all"]
+)
+def test_bulk_delete_requires_ids_or_filter(
+  authenticated_user, user_cl, query
+):
+  """ Test bulk delete refuses to run without ids or an effective filter """
+  create_recipe(user=user_cl)
+
+  response = authenticated_user.post(
+    f"{BULK_DELETE_URL}{query}", {}, format="json"
+  )
+
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
+  assert Recipe.objects.live().count() == 1
@@ -0,0 +1,151 @@
+""" Tests for similar recipe recommendations """
+import random
+from decimal import Decimal
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.core.models import (Recipe, Tag, Ingredient)
+from src.recipe import similarity
+from src.recipe.similarity import RecipeSimilarityIndex
+
+
+def similar_url(recipe_id):
+  return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
+def brute_force(cells, recipe_id, metric):
+  """ Reference scores computed pair by pair """
+  features = {}
+  for rid, feature in cells:
+    features.setdefault(rid, set()).add(feature)
+  own = features[recipe_id]
+  scores = {}
+  for rid, other in features.items():
+    shared = len(own & other)
+    if rid == recipe_id or not shared:
+      continue
+    if metric == "cosine":
+      scores[rid] = shared / (len(own) * len(other)) ** 0.5
+    else:
+      scores[rid] = shared / len(own | other)
+  return scores
+
+
+@pytest.mark.parametrize("metric", similarity.METRICS)
+def test_index_matches_brute_force(metric):
+  rng = random.Random(3)
+  cells = {
+    (rid, feature)
+    for rid in range(1, 200)
+    for feature in rng.sample(range(40), rng.randint(1, 8))
+  }
+  index = RecipeSimilarityIndex(*zip(*cells))
+
+  result = index.similar(7, k=500, metric=metric)
+
+  expected = brute_force(cells, 7, metric)
+  assert dict(result) == pytest.approx(expected)
+  assert [score for _, score in result] == sorted(expected.values(), reverse=True)
+
+
+def test_index_top_k():
+  cells = [(1, 1), (1, 2), (2, 1), (2, 2), (3, 1), (4, 3)]
+  index = RecipeSimilarityIndex(*zip(*cells))
+
+  assert index.similar(1, k=1) == [(2, 1.0)]
+  assert index.similar(4) == []
+  assert index.similar(99) == []
+
+
+def test_index_incremental_update_matches_rebuild():
+  cells = [(1, 1), (1, 2), (2, 1), (3, 2), (3, 3)]
+  index = RecipeSimilarityIndex(*zip(*cells))
+
+  index.update(2, [2, 3])
+  index.update(4, [1])
+  index.remove(3)
+
+  rebuilt = RecipeSimilarityIndex(*zip(*[(1, 1), (1, 2), (2, 2), (2, 3), (4, 1)]))
+  for recipe_id in (1, 2, 4):
+    assert index.similar(recipe_id) == rebuilt.similar(recipe_id)
+
+
+@pytest.fixture
+def user_cl(db):
+  return get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123"
+  )
+
+
+@pytest.fixture
+def auth_client(user_cl):
+  client = APIClient()
+  client.force_authenticate(user_cl)
+  return client
+
+
+def create_recipe(user, title):
+  return Recipe.objects.create(
+    user=user, title=title, time_minutes=10, price=Decimal("1.00")
+  )
+
+
+def test_similar_recipes_endpoint(auth_client, user_cl,
+                                  django_capture_on_commit_callbacks):
+  curry = Tag.objects.create(user=user_cl, name="Curry")
+  rice = Ingredient.objects.create(user=user_cl, name="Rice")
+  egg = Ingredient.objects.create(user=user_cl, name="Egg")
+  r1 = create_recipe(user_cl, "Chicken curry")
+  r2 = create_recipe(user_cl, "Egg curry")
+  r3 = create_recipe(user_cl, "Fried rice")
+  create_recipe(user_cl, "Toast")
+  r1.tags.add(curry)
+  r1.ingredients.add(rice)
+  r2.tags.add(curry)
+  r2.ingredients.add(rice, egg)
+  r3.ingredients.add(rice)
+
+  response = auth_client.get(similar_url(r1.id))
+
+  assert response.status_code == status.HTTP_200_OK
+  assert [r["id"] for r in response.data] == [r2.id, r3.id]
+  assert response.data[0]["score"] == pytest.approx(2 / 3)
+
+  # The cached index follows later changes
+  with django_capture_on_commit_callbacks(execute=True):
+    r3.tags.add(curry)
+  response = auth_client.get(similar_url(r1.id), {"k": 1})
+
+  assert [r["id"] for r in response.data] == [r3.id]
+
+
+def test_indexes_evicted_least_recently_used(settings, user_cl):
+  settings.RECIPE_SIMILARITY_MAX_INDEXES = 2
+  users = [user_cl] + [
+    get_user_model().objects.create_user(
+      email=f"user{i}@example.com", password="testpass123"
+    )
+    for i in range(2)
+  ]
+  similarity._indexes.clear()
+
+  similarity.get_index(users[0].id)
+  similarity.get_index(users[1].id)
+  similarity.get_index(users[0].id)
+  similarity.get_index(users[2].id)
+
+  assert list(similarity._indexes) == [users[0].id, users[2].id]
+
+
+def test_similar_recipes_invalid_metric(auth_client, user_cl):
+  recipe = create_recipe(user_cl, "Toast")
+
+  response = auth_client.get(similar_url(recipe.id), {"metric": "euclid"})
+
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,140 @@
+""" Tests for the delta sync endpoint """
+from decimal import Decimal
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from src.core.models import (Recipe, Tag, Ingredient)
+
+
+SYNC_URL = reverse("recipe:sync")
+
+
+# Change ids are transaction ids, so rows have to be committed to be synced
+@pytest.fixture
+def user_cl(transactional_db):
+  return get_user_model().objects.create_user(
+    email="user@example.com", password="testpass123"
+  )
+
+
+@pytest.fixture
+def auth_client(user_cl):
+  client = APIClient()
+  client.force_authenticate(user_cl)
+  return client
+
+
+def create_recipe(user, title="Soup"):
+  return Recipe.objects.create(
+    user=user, title=title, time_minutes=10, price=Decimal("1.00")
+  )
+
+
+def sync(client, since=None, **params):
+  if since:
+    params["since"] = since
+  res = client.get(SYNC_URL, params)
+  assert res.status_code == status.HTTP_200_OK
+  return res.data
+
+
+def ids(rows):
+  return [row["id"] for row in rows]
+
+
+def test_sync_requires_auth(transactional_db):
+  res = APIClient().get(SYNC_URL)
+
+  assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_full_then_delta_sync(auth_client, user_cl):
+  other = get_user_model().objects.create_user(
+    email="other@example.com", password="testpass123"
+  )
+  create_recipe(other)
+  recipe = create_recipe(user_cl)
+  tag = Tag.objects.create(user=user_cl, name="Vegan")
+
+  first = sync(auth_client)
+  assert ids(first["recipes"]) == [recipe.id]
+  assert ids(first["tags"]) == [tag.id]
+  assert first["has_more"] is False
+
+  unchanged = sync(auth_client, first["next"])
+  assert unchanged["recipes"] == unchanged["tags"] == []
+
+  new = create_recipe(user_cl, "Salad")
+  tag.name = "Vegetarian"
+  tag.save()
+
+  second = sync(auth_client, unchanged["next"])
+  assert ids(second["recipes"]) == [new.id]
+  assert second["tags"][0]["name"] == "Vegetarian"
+
+
+def test_sync_reports_m2m_changes_and_deletes(auth_client, user_cl):
+  recipe = create_recipe(user_cl)
+  tag = Tag.objects.create(user=user_cl, name="Vegan")
+  ingredient = Ingredient.objects.create(user=user_cl, name="Salt")
+  token = sync(auth_client)["next"]
+
+  recipe.ingredients.add(ingredient)
+  res = sync(auth_client, token)
+  assert ids(res["recipes"]) == [recipe.id]
+  assert ids(res["recipes"][0]["ingredients"]) == [ingredient.id]
+
+  token = res["next"]
+  recipe_id, tag_id = recipe.id, tag.id
+  recipe.delete()
+  tag.delete()
+  res = sync(auth_client, token)
+  assert res["recipes"] == []
+  assert res["deleted"] == {
+    "recipes": [recipe_id], "tags": [tag_id], "ingredients": [],
+  }
+
+
+def test_sync_reports_soft_deletes_when_flagged(auth_client, user_cl):
+  from django.utils import timezone
+
+  from src.core.deletion import purge_deleted_recipes
+
+  recipe = create_recipe(user_cl)
+  token = sync(auth_client)["next"]
+
+  Recipe.objects.filter(pk=recipe.pk).update(deleted_at=timezone.now())
+  res = sync(auth_client, token)
+  assert res["recipes"] == []
+  assert res["deleted"]["recipes"] == [recipe.id]
+
+  purge_deleted_recipes(user_cl.id)
+  res = sync(auth_client, res["next"])
+  assert res["deleted"]["recipes"] == []
+
+
+def test_sync_pages_by_limit(auth_client, user_cl):
+  recipes = [create_recipe(user_cl, f"Recipe {i}") for i in range(5)]
+
+  seen, token = [], None
+  for _ in range(5):
+    res = sync(auth_client, token, limit=2)
+    seen += ids(res["recipes"])
+    token = res["next"]
+    if not res["has_more"]:
+      break
+
+  assert seen == [recipe.id for recipe in recipes]
+  assert sync(auth_client, token)["recipes"] == []
+
+
+def test_sync_rejects_invalid_token(auth_client):
+  res = auth_client.get(SYNC_URL, {"since": "not-a-token"})
+
+  assert res.status_code == status.HTTP_400_BAD_REQUEST
@@ -5,6 +5,7 @@ from decimal import Decimal
 from django.urls import reverse
 
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import (APIClient)
 
@@ -152,3 +153,46 @@ def test_filtered_ingredients_unique(auth_client, user_cl):
   response = auth_client.get(TAGS_URL, {"assigned_only" : 1})
 
   assert len(response.data) == 1
+
+
+def test_assigned_only_ignores_soft_deleted_recipes(auth_client, user_cl):
+  """ Test tags of flagged recipes no longer count as assigned """
+  tag = Tag.objects.create(user=user_cl, name="Masala")
+  recipe = Recipe.objects.create(
+    title="Apple pie", time_minutes=4, price=Decimal("4.50"), user=user_cl
+  )
+  recipe.tags.add(tag)
+  Recipe.objects.filter(pk=recipe.pk).update(deleted_at=timezone.now())
+
+  response = auth_client.get(TAGS_URL, {"assigned_only": 1})
+
+  assert response.data == []
+
+
+@pytest.mark.django_db
+def test_prefix_autocomplete_tags(auth_client, user_cl):
+  """ Test tag prefix lookup """
+
+  vegan = Tag.objects.create(user=user_cl, name="Vegan")
+  veggie = Tag.objects.create(user=user_cl, name="veggie")
+  Tag.objects.create(user=user_cl, name="Dessert")
+
+  recipe = Recipe.objects.create(
+    title="Salad", time_minutes=5, price=Decimal("1.00"), user=user_cl
+  )
+  recipe.tags.add(veggie)
+
+  response = auth_client.get(TAGS_URL, {"prefix": "VEG"})
+
+  assert response.status_code == status.HTTP_200_OK
+  assert [t["id"] for t in response.data] == [veggie.id, vegan.id]
+
+
+@pytest.mark.django_db
+def test_update_tag_to_existing_name_rejected(auth_client, user_cl):
+  Tag.objects.create(user=user_cl, name="Vegan")
+  tag = Tag.objects.create(user=user_cl, name="Dessert")
+
+  response = auth_client.patch(detail_url(tag.id), {"name": "VEGAN"})
+
+  assert response.status_code == status.HTTP_400_BAD_REQUEST
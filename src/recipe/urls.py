@@ -14,6 +14,7 @@ router.register("ingredients", views.IngredientViewSet)
 app_name = "recipe"
 
 urlpatterns = [
+  path("sync/", views.SyncView.as_view(), name="sync"),
   path('', include(router.urls))
 ]
 
@@ -1,3 +1,6 @@
+import json
+from decimal import Decimal
+
 from drf_spectacular.utils import (
   extend_schema_view,
   extend_schema,
@@ -5,43 +8,248 @@ from drf_spectacular.utils import (
   OpenApiTypes
 
 )
+from django.contrib.postgres.search import (
+  SearchQuery,
+  SearchRank,
+  TrigramWordSimilarity,
+)
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Lower
+
 from rest_framework import (viewsets, mixins, status)
+from rest_framework.views import APIView
 
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
 
 from rest_framework.response import Response
 
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from src.core.models import (Recipe, Tag, Ingredient)
-from src.recipe import serializers
+from src.core.models import (Recipe, RecipeStats, Tag, Ingredient)
+from src.core.authentication import ExpiringTokenAuthentication
+from src.core.deletion import delete_recipes, soft_delete_recipes
+from src.core.idempotency import idempotent
+from src.core.throttling import RecipeUserThrottle
+from src.recipe import serializers, similarity, sync
+
+RECIPE_FILTER_PARAMETERS = [
+  OpenApiParameter(
+    'tags',
+    OpenApiTypes.STR,
+    description="Comma seperated list of ids to filter"
+  ),
+  OpenApiParameter(
+    'ingredients',
+    OpenApiTypes.STR,
+    description="Comma seperated list of ids to filter"
+  ),
+  OpenApiParameter(
+    'match',
+    OpenApiTypes.STR,
+    enum=["any", "all"],
+    description="Whether recipes need any or all of the tags and "
+                "ingredients, defaults to any"
+  ),
+  OpenApiParameter(
+    'q',
+    OpenApiTypes.STR,
+    description="Search titles and descriptions, best matches first"
+  ),
+  OpenApiParameter(
+    'min_price',
+    OpenApiTypes.DECIMAL,
+    description="Only recipes costing at least this much"
+  ),
+  OpenApiParameter(
+    'max_price',
+    OpenApiTypes.DECIMAL,
+    description="Only recipes costing at most this much"
+  ),
+  OpenApiParameter(
+    'min_time',
+    OpenApiTypes.INT,
+    description="Only recipes taking at least this many minutes"
+  ),
+  OpenApiParameter(
+    'max_time',
+    OpenApiTypes.INT,
+    description="Only recipes taking at most this many minutes"
+  ),
+]
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+  'Idempotency-Key',
+  OpenApiTypes.STR,
+  location=OpenApiParameter.HEADER,
+  description="Unique per request, a retry with the same key returns the "
+              "first response instead of running again"
+)
+
+RECIPE_MATCH_LOOKUPS = {"any": "overlap", "all": "contains"}
+
+RECIPE_ORDERING_FIELDS = ("price", "time_minutes", "id")
+
+RECIPE_RANGE_FILTERS = {
+  "min_price": ("price__gte", Decimal),
+  "max_price": ("price__lte", Decimal),
+  "min_time": ("time_minutes__gte", int),
+  "max_time": ("time_minutes__lte", int),
+}
+
+
+class RecipeCursorPagination(CursorPagination):
+  """
+  Keyset pagination, enabled by passing `page_size`.
+
+  Pages follow the ordering built by the view, which always ends with the
+  id. A cursor holds the value of every ordering field of a row and the
+  next page starts strictly after that tuple, so rows sharing a price or
+  time are neither skipped nor repeated when rows are added between pages.
+  Cursors never carry an offset.
+  """
+  page_size = None
+  page_size_query_param = "page_size"
+  max_page_size = 100
+
+  def get_ordering(self, request, queryset, view):
+    return tuple(queryset.query.order_by)
+
+  def decode_cursor(self, request):
+    cursor = super().decode_cursor(request)
+    if cursor is None or cursor.position is None:
+      return cursor
+    try:
+      values = json.loads(cursor.position)
+    except ValueError:
+      raise NotFound(self.invalid_cursor_message)
+    if (not isinstance(values, list) or len(values) != len(self.ordering)
+        or not all(isinstance(value, str) for value in values)):
+      raise NotFound(self.invalid_cursor_message)
+    return cursor._replace(offset=0)
+
+  def _get_position_from_instance(self, instance, ordering):
+    return json.dumps([
+      str(getattr(instance, term.lstrip("-"))) for term in ordering
+    ])
+
+  @staticmethod
+  def _after(ordering, values):
+    """Q matching the rows after values in ordering"""
+    condition = None
+    for term, value in reversed(list(zip(ordering, values))):
+      field = term.lstrip("-")
+      lookup = "lt" if term.startswith("-") else "gt"
+      after = Q(**{f"{field}__{lookup}": value})
+      if condition is not None:
+        after |= Q(**{field: value}) & condition
+      condition = after
+    return condition
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self.request = request
+    self.page_size = self.get_page_size(request)
+    if not self.page_size:
+      return None
+
+    self.base_url = request.build_absolute_uri()
+    self.ordering = self.get_ordering(request, queryset, view)
+    self.cursor = self.decode_cursor(request)
+    reverse = self.cursor is not None and self.cursor.reverse
+    position = self.cursor.position if self.cursor else None
+
+    ordering = self.ordering
+    if reverse:
+      ordering = tuple(
+        term[1:] if term.startswith("-") else f"-{term}" for term in ordering
+      )
+    queryset = queryset.order_by(*ordering)
+    if position is not None:
+      queryset = queryset.filter(
+        self._after(ordering, json.loads(position))
+      )
+
+    results = list(queryset[:self.page_size + 1])
+    self.page = results[:self.page_size]
+    following = None
+    if len(results) > self.page_size:
+      following = self._get_position_from_instance(results[-1], self.ordering)
+
+    if reverse:
+      self.page.reverse()
+      self.has_next, self.next_position = position is not None, position
+      self.has_previous, self.previous_position = (
+        following is not None, following
+      )
+    else:
+      self.has_next, self.next_position = following is not None, following
+      self.has_previous, self.previous_position = (
+        position is not None, position
+      )
+
+    if (self.has_previous or self.has_next) and self.template is not None:
+      self.display_page_controls = True
+    return self.page
+
 
 @extend_schema_view(
+  create=extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER]),
+  upload_image=extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER]),
   list=extend_schema(
-    parameters=[
+    parameters=RECIPE_FILTER_PARAMETERS + [
       OpenApiParameter(
-        'tags',
+        'ordering',
         OpenApiTypes.STR,
-        description="Comma seperated list of ids to filter"
+        description="Comma separated fields to sort by, prefix with - for "
+                    "descending: " + ", ".join(RECIPE_ORDERING_FIELDS)
+      ),
+    ]
+  ),
+  facets=extend_schema(parameters=RECIPE_FILTER_PARAMETERS),
+  similar=extend_schema(
+    parameters=[
+      OpenApiParameter(
+        'k',
+        OpenApiTypes.INT,
+        description="Number of recipes to return, defaults to 10"
       ),
       OpenApiParameter(
-        'ingredients',
+        'metric',
         OpenApiTypes.STR,
-        description="Comma seperated list of ids to filter"
-      )
+        enum=list(similarity.METRICS),
+        description="Similarity measure, defaults to jaccard"
+      ),
     ]
-  )
+  ),
+  shopping_list=extend_schema(
+    request=serializers.ShoppingListRequestSerializer,
+    responses=serializers.ShoppingListSerializer,
+  ),
+  bulk_delete=extend_schema(
+    parameters=RECIPE_FILTER_PARAMETERS,
+    request=serializers.RecipeBulkDeleteSerializer,
+    responses=serializers.RecipeBulkDeleteResultSerializer,
+  ),
 )
 class RecipeViewSet(viewsets.ModelViewSet):
   serializer_class = serializers.RecipeDetailSerializer
-  queryset = Recipe.objects.all()
-  authentication_classes = [TokenAuthentication]
+  queryset = Recipe.objects.live().defer(
+    "search_vector", "tag_ids", "ingredient_ids"
+  )
+  authentication_classes = [ExpiringTokenAuthentication]
   permission_classes = [IsAuthenticated]
+  throttle_classes = [RecipeUserThrottle]
+  pagination_class = RecipeCursorPagination
 
-  def _params_to_ints(self, qs):
+  def _params_to_ints(self, qs, param):
     """ convert a list of strings to integers """
-    return [int(str_id) for str_id in qs.split(",")]
+    try:
+      return [int(str_id) for str_id in qs.split(",")]
+    except ValueError:
+      raise ValidationError({param: ["A comma separated list of ids."]})
 
 
   def get_queryset(self):
@@ -51,17 +259,91 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     ingredients = self.request.query_params.get("ingredients")
 
+    match = self.request.query_params.get("match", "any")
+    if match not in RECIPE_MATCH_LOOKUPS:
+      raise ValidationError({"match": ["Must be any or all."]})
+    lookup = RECIPE_MATCH_LOOKUPS[match]
+
     queryset = self.queryset
+    # Parameters that narrowed the queryset, bulk_delete requires one
+    self.applied_filters = set()
 
+    # Array lookups on the GIN indexed id copies, no join or distinct needed
     if tags:
-      tag_ids = self._params_to_ints(tags)
-      queryset = queryset.filter(tags__id__in=tag_ids)
+      tag_ids = self._params_to_ints(tags, "tags")
+      queryset = queryset.filter(**{f"tag_ids__{lookup}": tag_ids})
+      self.applied_filters.add("tags")
 
     if ingredients:
-      ingredient_ids = self._params_to_ints(ingredients)
-      queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-
-    return queryset.filter(user=self.request.user).order_by("-id").distinct()
+      ingredient_ids = self._params_to_ints(ingredients, "ingredients")
+      queryset = queryset.filter(
+        **{f"ingredient_ids__{lookup}": ingredient_ids}
+      )
+      self.applied_filters.add("ingredients")
+
+    queryset = queryset.filter(user=self.request.user)
+
+    for param, (lookup, convert) in RECIPE_RANGE_FILTERS.items():
+      value = self.request.query_params.get(param)
+      if value:
+        try:
+          queryset = queryset.filter(**{lookup: convert(value)})
+        except (ValueError, ArithmeticError):
+          raise ValidationError({param: ["A valid number is required."]})
+        self.applied_filters.add(param)
+
+    ordering = self._ordering(self.request.query_params.get("ordering"))
+
+    search = self.request.query_params.get("q", "").strip()
+    if search:
+      queryset = self._search(queryset, search)
+      self.applied_filters.add("q")
+      if ordering is None:
+        return queryset
+
+    return queryset.order_by(*(ordering or ["-id"]))
+
+  def _ordering(self, param):
+    """
+    Validate an `ordering` parameter and return the order_by fields.
+
+    The id is appended in the direction of the first field, so keyset
+    pages stay unique and (user, field, id) indexes can be scanned.
+    """
+    if not param:
+      return None
+    ordering, fields = [], set()
+    for term in param.split(","):
+      term = term.strip()
+      field = term.removeprefix("-")
+      if field not in RECIPE_ORDERING_FIELDS or field in fields:
+        raise ValidationError({
+          "ordering": [
+            f"Invalid field {term!r}, choose from "
+            + ", ".join(RECIPE_ORDERING_FIELDS)
+          ]
+        })
+      fields.add(field)
+      ordering.append(term)
+    if "id" not in fields:
+      ordering.append("-id" if ordering[0].startswith("-") else "id")
+    return ordering
+
+  def _search(self, queryset, search):
+    """
+    Full text search over title and description, ranked.
+
+    Titles within trigram distance of the search also match so typos
+    still find the recipe.
+    """
+    query = SearchQuery(search, search_type="websearch", config="english")
+    # Both return real, float8 values survive the keyset cursor unchanged
+    return queryset.annotate(
+      rank=Cast(SearchRank(F("search_vector"), query), FloatField()),
+      similarity=Cast(TrigramWordSimilarity(search, "title"), FloatField()),
+    ).filter(
+      Q(search_vector=query) | Q(title__trigram_word_similar=search)
+    ).order_by("-rank", "-similarity", "-id")
 
 
   def get_serializer_class(self):
@@ -70,15 +352,49 @@ class RecipeViewSet(viewsets.ModelViewSet):
       return serializers.RecipeSerializer
     elif self.action == "upload_image":
       return serializers.RecipeImageSerializer
+    elif self.action == "facets":
+      return serializers.RecipeFacetsSerializer
+    elif self.action == "shopping_list":
+      return serializers.ShoppingListRequestSerializer
+    elif self.action == "similar":
+      return serializers.SimilarRecipeSerializer
+    elif self.action == "stats":
+      return serializers.RecipeStatsSerializer
+    elif self.action == "bulk_delete":
+      return serializers.RecipeBulkDeleteSerializer
 
     return self.serializer_class
 
+  @idempotent
+  def create(self, request, *args, **kwargs):
+    return super().create(request, *args, **kwargs)
+
   def perform_create(self, serializer):
     """ Create a new recipe """
     serializer.save(user=self.request.user)
 
+  def perform_destroy(self, instance):
+    self._delete(Recipe.objects.filter(pk=instance.pk))
+
+  def _delete(self, queryset):
+    """
+    Delete recipes and their images, return how many.
+
+    With RECIPE_SOFT_DELETE they are only flagged here and purged in the
+    background.
+    """
+    if settings.RECIPE_SOFT_DELETE:
+      count = soft_delete_recipes(queryset)
+    else:
+      count = delete_recipes(queryset)
+    # Set based deletes send no post_delete for the similarity index
+    user_id = self.request.user.id
+    transaction.on_commit(lambda: similarity.invalidate(user_id))
+    return count
+
 
   @action(methods=["POST"], detail=True, url_path="upload-image")
+  @idempotent
   def upload_image(self, request, pk=None):
     """ upload an image to recipe """
 
@@ -91,6 +407,116 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+  @action(methods=["POST"], detail=False, url_path="bulk-delete")
+  def bulk_delete(self, request):
+    """ Delete the listed recipes, or every recipe matching the filters """
+
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    queryset = self.get_queryset()
+    ids = serializer.validated_data.get("ids")
+    if ids is not None:
+      queryset = queryset.filter(id__in=set(ids))
+    elif not self.applied_filters:
+      raise ValidationError({
+        "ids": ["Pass ids or at least one filter."]
+      })
+
+    deleted = self._delete(queryset)
+    return Response(
+      serializers.RecipeBulkDeleteResultSerializer({"deleted": deleted}).data
+    )
+
+  @action(methods=["GET"], detail=False)
+  def facets(self, request):
+    """ Count matching recipes per tag and per ingredient """
+
+    recipe_ids = self.get_queryset().order_by().values("id")
+
+    def counts(through, field):
+      # One grouped query over the through table per facet
+      return through.objects.filter(
+        recipe_id__in=recipe_ids
+      ).values(
+        facet_id=F(f"{field}_id"),
+        facet_name=F(f"{field}__name"),
+      ).annotate(
+        count=Count("recipe_id")
+      ).order_by("-count", "facet_name")
+
+    serializer = self.get_serializer({
+      "total": recipe_ids.count(),
+      "tags": counts(Recipe.tags.through, "tag"),
+      "ingredients": counts(Recipe.ingredients.through, "ingredient"),
+    })
+    return Response(serializer.data)
+
+  @action(methods=["GET"], detail=False)
+  def stats(self, request):
+    """ Recipe count, totals and averages from the per-user summary row """
+
+    stats = RecipeStats.objects.filter(user=request.user).first()
+    serializer = self.get_serializer(stats or RecipeStats(user=request.user))
+    return Response(serializer.data)
+
+  @action(methods=["GET"], detail=True)
+  def similar(self, request, pk=None):
+    """ Recipes sharing the most tags and ingredients with this one """
+
+    recipe = self.get_object()
+    try:
+      k = max(1, min(int(request.query_params.get("k", 10)), 100))
+    except ValueError:
+      k = 10
+    metric = request.query_params.get("metric", "jaccard")
+    if metric not in similarity.METRICS:
+      return Response(
+        {"metric": [f"must be one of {', '.join(similarity.METRICS)}"]},
+        status=status.HTTP_400_BAD_REQUEST,
+      )
+
+    scores = dict(similarity.similar(request.user.id, recipe.id, k, metric))
+    recipes = Recipe.objects.live().filter(
+      user=request.user, id__in=scores
+    ).prefetch_related("tags", "ingredients")
+    for similar_recipe in recipes:
+      similar_recipe.score = scores[similar_recipe.id]
+    recipes = sorted(recipes, key=lambda r: (-r.score, -r.id))
+
+    serializer = self.get_serializer(recipes, many=True)
+    return Response(serializer.data)
+
+  @action(methods=["POST"], detail=False, url_path="shopping-list")
+  def shopping_list(self, request):
+    """ Merge the ingredients of the selected recipes """
+
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    recipes = Recipe.objects.live().filter(
+      user=request.user,
+      id__in=set(serializer.validated_data["recipes"]),
+    )
+    totals = recipes.aggregate(
+      recipe_count=Count("id"),
+      total_price=Sum("price", default=0),
+      total_time_minutes=Sum("time_minutes", default=0),
+    )
+    ingredients = Recipe.ingredients.through.objects.filter(
+      recipe_id__in=recipes.values("id")
+    ).values(
+      facet_id=F("ingredient_id"),
+      facet_name=F("ingredient__name"),
+    ).annotate(
+      count=Count("recipe_id")
+    ).order_by("facet_name")
+
+    return Response(serializers.ShoppingListSerializer({
+      **totals,
+      "ingredients": ingredients,
+    }).data)
+
 
 @extend_schema_view(
   list=extend_schema(
@@ -101,22 +527,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
         enum=[0,1],
         description="Filter by items assigned to recipe"
       ),
+      OpenApiParameter(
+        'prefix',
+        OpenApiTypes.STR,
+        description="Case insensitive name prefix, returns the most used "
+                    "matches first"
+      ),
+      OpenApiParameter(
+        'limit',
+        OpenApiTypes.INT,
+        description="Maximum number of prefix matches, defaults to 10"
+      ),
     ]
   )
 )
-class TagViewSet(mixins.DestroyModelMixin,
-                 mixins.UpdateModelMixin,
-                 mixins.ListModelMixin,
-                 viewsets.GenericViewSet
-  ):
-  """ Manage tags in the database """
-  serializer_class = serializers.TagSerializer
-  queryset = Tag.objects.all()
-  authentication_classes = [TokenAuthentication]
+class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+                            mixins.UpdateModelMixin,
+                            mixins.ListModelMixin,
+                            viewsets.GenericViewSet):
+  """ Base viewset for recipe attributes """
+  authentication_classes = [ExpiringTokenAuthentication]
   permission_classes = [IsAuthenticated]
+  throttle_classes = [RecipeUserThrottle]
+  default_prefix_limit = 10
+  max_prefix_limit = 50
 
   def get_queryset(self):
-    """ Return tags for the authenticated user """
+    """ Return objects for the authenticated user """
 
     assigned_only = bool(
       int(self.request.query_params.get('assigned_only', 0))
@@ -124,45 +561,97 @@ class TagViewSet(mixins.DestroyModelMixin,
 
     queryset = self.queryset
     if assigned_only:
-      queryset = queryset.filter(recipe__isnull=False)
+      # Soft deleted recipes no longer count as assignments
+      queryset = queryset.filter(
+        recipe__isnull=False, recipe__deleted_at__isnull=True
+      )
 
-    return queryset.filter(
-      user=self.request.user
-      ).order_by("-name").distinct()
+    queryset = queryset.filter(user=self.request.user)
 
-@extend_schema_view(
-  list=extend_schema(
+    prefix = self.request.query_params.get("prefix")
+    if prefix is not None and self.action == "list":
+      return self._autocomplete(queryset, prefix)
+
+    return queryset.order_by("-name").distinct()
+
+  def _autocomplete(self, queryset, prefix):
+    """
+    Return the most used names starting with prefix.
+
+    `lower(name) LIKE 'prefix%'` is served by the (user, lower(name)
+    text_pattern_ops) index.
+    """
+    try:
+      limit = int(
+        self.request.query_params.get("limit", self.default_prefix_limit)
+      )
+    except ValueError:
+      limit = self.default_prefix_limit
+    limit = max(1, min(limit, self.max_prefix_limit))
+
+    return queryset.annotate(
+      name_lower=Lower("name")
+    ).filter(
+      name_lower__startswith=prefix.strip().lower()
+    ).annotate(
+      usage=Count("recipe", filter=Q(recipe__deleted_at__isnull=True))
+    ).order_by("-usage", "name_lower", "id")[:limit]
+
+
+class TagViewSet(BaseRecipeAttrViewSet):
+  """ Manage tags in the database """
+  serializer_class = serializers.TagSerializer
+  queryset = Tag.objects.all()
+
+
+class IngredientViewSet(BaseRecipeAttrViewSet):
+  """ Manage ingredients in the Database """
+  serializer_class = serializers.IngredientSerializer
+  queryset = Ingredient.objects.all()
+
+
+class SyncView(APIView):
+  """ Changes to the user's recipes, tags and ingredients since a token """
+  authentication_classes = [ExpiringTokenAuthentication]
+  permission_classes = [IsAuthenticated]
+  throttle_classes = [RecipeUserThrottle]
+  default_limit = 500
+  max_limit = 1000
+
+  @extend_schema(
     parameters=[
       OpenApiParameter(
-        'assigned_only',
+        'since',
+        OpenApiTypes.STR,
+        description="`next` token of the previous response, omit for a "
+                    "full sync"
+      ),
+      OpenApiParameter(
+        'limit',
         OpenApiTypes.INT,
-        enum=[0,1],
-        description="Filter by items assigned to recipe"
+        description="Maximum number of rows per collection, defaults to 500"
       ),
-    ]
+    ],
+    responses=serializers.SyncSerializer,
   )
-)
-class IngredientViewSet(mixins.DestroyModelMixin,
-                        mixins.UpdateModelMixin,
-                        mixins.ListModelMixin ,
-                        viewsets.GenericViewSet):
-  """ Manage ingredients in the Database """
-  serializer_class = serializers.IngredientSerializer
-  queryset = Ingredient.objects.all()
-  authentication_classes = [TokenAuthentication]
-  permission = [TokenAuthentication]
-  permission_classes = [IsAuthenticated]
+  def get(self, request):
+    try:
+      limit = int(request.query_params.get("limit", self.default_limit))
+    except ValueError:
+      limit = self.default_limit
+    limit = max(1, min(limit, self.max_limit))
+
+    try:
+      page = sync.changes(
+        request.user, request.query_params.get("since"), limit
+      )
+    except sync.InvalidToken:
+      return Response(
+        {"since": ["Invalid sync token."]},
+        status=status.HTTP_400_BAD_REQUEST,
+      )
 
-  def get_queryset(self):
-    """ Return tags for the authenticated user """
-    assigned_only = bool(
-      int(self.request.query_params.get('assigned_only', 0))
+    serializer = serializers.SyncSerializer(
+      page, context={"request": request}
     )
-
-    queryset = self.queryset
-    if assigned_only:
-      queryset = queryset.filter(recipe__isnull=False)
-
-    return queryset.filter(
-      user=self.request.user
-      ).order_by("-name").distinct()
+    return Response(serializer.data)
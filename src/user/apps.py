@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 
 
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'src.user'
+
+    def ready(self):
+        from src.user import cache
+
+        # Also covers saves from the admin and other code paths
+        for signal in (post_save, post_delete):
+            signal.connect(cache.user_saved, sender=settings.AUTH_USER_MODEL)
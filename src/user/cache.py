@@ -0,0 +1,55 @@
+"""
+Cached /api/user/me/ payloads
+
+The serialized profile and its ETag are kept per user until the user is
+saved again. Saving only clears the entry in a shared cache; with a
+process local one other workers would keep serving the old profile, so
+entries then expire after LOCAL_CACHE_TIMEOUT seconds at most.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from src.core.checks import is_process_local_cache
+
+
+LOCAL_CACHE_TIMEOUT = 5
+
+
+def _key(user_id):
+  return f"user-profile:{user_id}"
+
+
+def _timeout():
+  if is_process_local_cache():
+    return min(settings.USER_PROFILE_CACHE_TIMEOUT, LOCAL_CACHE_TIMEOUT)
+  return settings.USER_PROFILE_CACHE_TIMEOUT
+
+
+def get_profile(user_id, serialize):
+  """Return (data, etag) of a user, calling serialize() on a miss"""
+  key = _key(user_id)
+  cached = cache.get(key)
+  if cached is None:
+    data = serialize()
+    content = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    etag = '"{}"'.format(hashlib.sha256(content).hexdigest()[:32])
+    cached = (data, etag)
+    cache.set(key, cached, _timeout())
+  return cached
+
+
+def invalidate_profile(user_id):
+  key = _key(user_id)
+  cache.delete(key)
+  # Again once committed, a concurrent request may have cached the old one
+  transaction.on_commit(lambda: cache.delete(key))
+
+
+def user_saved(sender, instance, **kwargs):
+  invalidate_profile(instance.pk)
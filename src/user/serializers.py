@@ -9,6 +9,8 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from src.core.authentication import revoke_tokens
+
 class UserSerializer(serializers.ModelSerializer):
 
   """  Serializer for ther user object """
@@ -29,6 +31,7 @@ class UserSerializer(serializers.ModelSerializer):
     if password:
       user.set_password(password)
       user.save()
+      revoke_tokens(user)
 
     return user
 
@@ -65,5 +68,7 @@ class AuthTokenSerializer(serializers.Serializer):
     return attrs
 
 
-
-
+class TokenSerializer(serializers.Serializer):
+  """Serializer for an issued auth token"""
+  token = serializers.CharField()
+  expires = serializers.DateTimeField()
@@ -9,6 +9,9 @@ from rest_framework.test import APIClient
 from rest_framework  import status
 from faker import Faker
 
+from src.recipe import similarity
+from src.user import cache as profile_cache
+
 User = get_user_model()
 
 CREATE_USER_URL = reverse("user:create")
@@ -180,3 +183,66 @@ class TestPrivateUser:
 
     assert response.status_code  == status.HTTP_200_OK
 
+
+  def test_retrieve_profile_cached_with_etag(
+    self, private_user, authenticated_user, django_assert_num_queries
+  ):
+    """ Test the profile is served from cache and revalidated by ETag """
+    response = authenticated_user.get(ME_URL)
+    etag = response["ETag"]
+
+    with django_assert_num_queries(0):
+      response = authenticated_user.get(ME_URL)
+      assert response.data["email"] == private_user.email
+
+      response = authenticated_user.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+      assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+  def test_retrieve_profile_if_none_match_any(self, authenticated_user):
+    """ Test If-None-Match: * revalidates any cached profile """
+    response = authenticated_user.get(ME_URL, HTTP_IF_NONE_MATCH="*")
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response["ETag"]
+
+  def test_profile_cache_timeout_capped_when_process_local(self, settings):
+    """ Test other processes cannot serve a stale profile for long """
+    settings.USER_PROFILE_CACHE_TIMEOUT = 3600
+
+    assert profile_cache._timeout() == profile_cache.LOCAL_CACHE_TIMEOUT
+
+    settings.CACHES = {"default": {
+      "BACKEND": "django.core.cache.backends.redis.RedisCache",
+      "LOCATION": "redis://localhost:6379/1",
+    }}
+    assert profile_cache._timeout() == 3600
+
+  def test_update_invalidates_cached_profile(
+    self, authenticated_user, django_capture_on_commit_callbacks
+  ):
+    """ Test updating the profile drops the cached payload """
+    etag = authenticated_user.get(ME_URL)["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+      authenticated_user.patch(ME_URL, {"name": "updated name"})
+
+    response = authenticated_user.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["name"] == "updated name"
+    assert response["ETag"] != etag
+
+  def test_delete_user(
+    self, private_user, authenticated_user, django_capture_on_commit_callbacks
+  ):
+    """ Test deleting the account deactivates it then removes it """
+    similarity.get_index(private_user.pk)
+
+    with django_capture_on_commit_callbacks(execute=True):
+      response = authenticated_user.delete(ME_URL)
+
+      assert response.status_code == status.HTTP_202_ACCEPTED
+      private_user.refresh_from_db()
+      assert not private_user.is_active
+
+    assert not get_user_model().objects.filter(pk=private_user.pk).exists()
+    assert private_user.pk not in similarity._indexes
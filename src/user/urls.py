@@ -11,6 +11,13 @@ app_name = "user"
 urlpatterns = [
     path("create/", views.CreateUserView.as_view(), name="create"),
     path("token/", views.CreateTokenView.as_view(), name="token"),
+    path(
+        "token/refresh/", views.RefreshTokenView.as_view(),
+        name="token-refresh"
+    ),
+    path(
+        "token/revoke/", views.RevokeTokenView.as_view(), name="token-revoke"
+    ),
     path("me/", views.ManageUserview.as_view(), name="me")
 ]
 
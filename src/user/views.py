@@ -1,34 +1,111 @@
 """ views for the user api """
 
-from rest_framework import (generics, authentication, permissions)
+from drf_spectacular.utils import extend_schema
+
+from rest_framework import (generics, permissions, status)
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from django.contrib.auth import get_user_model
+
+from rest_framework.views import APIView
 
+from src.core.deletion import schedule_user_deletion
+from src.core.schema import etag_matches
+from src.core.authentication import (
+  ExpiringTokenAuthentication,
+  issue_token,
+  revoke_tokens,
+)
+from src.core.throttling import (AuthIPThrottle, AuthEmailThrottle)
+from src.user.cache import get_profile
 from src.user.serializers import (
   UserSerializer,
-  AuthTokenSerializer
+  AuthTokenSerializer,
+  TokenSerializer,
 )
 
 
 class CreateUserView(generics.CreateAPIView):
   serializer_class = UserSerializer
+  # Authentication runs before throttling, a Basic header would hash a
+  # password on every request however many were rejected
+  authentication_classes = []
+  throttle_classes = [AuthIPThrottle, AuthEmailThrottle]
 
 
 class CreateTokenView(ObtainAuthToken):
   serializer_class = AuthTokenSerializer
   renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+  authentication_classes = []
+  throttle_classes = [AuthIPThrottle, AuthEmailThrottle]
 
+  @extend_schema(responses=TokenSerializer)
+  def post(self, request, *args, **kwargs):
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    token, expires = issue_token(serializer.validated_data["user"])
+    return Response(TokenSerializer({"token": token, "expires": expires}).data)
 
 
+class RefreshTokenView(APIView):
+  """ Exchange a valid token for a new one """
+  authentication_classes = [ExpiringTokenAuthentication]
+  permission_classes = [permissions.IsAuthenticated]
+
+  @extend_schema(request=None, responses=TokenSerializer)
+  def post(self, request):
+    token, expires = issue_token(request.user, rotate=True)
+    return Response(TokenSerializer({"token": token, "expires": expires}).data)
 
 
-class ManageUserview(generics.RetrieveUpdateAPIView):
+class RevokeTokenView(APIView):
+  """ Invalidate every token of the authenticated user """
+  authentication_classes = [ExpiringTokenAuthentication]
+  permission_classes = [permissions.IsAuthenticated]
+
+  @extend_schema(request=None, responses={204: None})
+  def post(self, request):
+    revoke_tokens(request.user)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserview(generics.RetrieveUpdateDestroyAPIView):
   """ manage the authenticated user """
   serializer_class = UserSerializer
-  authentication_classes = [authentication.TokenAuthentication]
+  authentication_classes = [ExpiringTokenAuthentication]
   permission_classes = [permissions.IsAuthenticated]
 
 
   def get_object(self):
     """ Retrieve and return the authenticated user """
-    return self.request.user
+    user = self.request.user
+    deferred = user.get_deferred_fields()
+    if deferred:
+      # Signed tokens authenticate a user holding only its id, load the
+      # rest in one query rather than one per field
+      user.refresh_from_db(fields=deferred)
+    return user
+
+  def retrieve(self, request, *args, **kwargs):
+    """ Serve the cached profile, or 304 when the client has it """
+    data, etag = get_profile(
+      request.user.pk,
+      lambda: self.get_serializer(self.get_object()).data,
+    )
+    if etag_matches(request.headers.get("If-None-Match", ""), etag):
+      response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+      response = Response(data)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+  @extend_schema(responses={202: None})
+  def destroy(self, request, *args, **kwargs):
+    """ Deactivate the user now and delete its data in the background """
+    user = request.user
+    get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+    revoke_tokens(user)
+    schedule_user_deletion(user)
+    return Response(status=status.HTTP_202_ACCEPTED)